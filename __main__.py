@@ -1,3 +1,5 @@
+import logging
+
 from discordtakbot import DiscordTakBot
 from readconfig import Config
 
@@ -7,17 +9,19 @@ CONFIG_FILES = ["botsettings.dev.json", "botsettings.json"]
 
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s", level=logging.INFO)
     config = None
     for config_file in CONFIG_FILES:
-        print(f"Attempting to read config from '{config_file}'")
+        logging.info("reading config file=%r", config_file)
         try:
             config = Config.load(config_file)
-            print(f"Successfully read config from '{config_file}'")
+            logging.info("read config file=%r", config_file)
             break
         except FileNotFoundError:
-            print(f"Cannot read config from '{config_file}' because it does not exist'")
+            logging.info("config does not exist file=%r", config_file)
     if not config:
         exit("Failed read configuration")
+    logging.getLogger().setLevel(config.discord.log_level)
 
     initial_moves = [
         "a2", "a1",
@@ -28,5 +32,6 @@ if __name__ == "__main__":
         "3a1>111"
     ]
 
-    bot = DiscordTakBot(config.tak, initial_moves=initial_moves)
+    bot = DiscordTakBot(config.tak, initial_moves=initial_moves, render_config=config.render, store_config=config.store,
+                        engine_config=config.engine, metrics_config=config.metrics)
     bot.run(config.discord.token)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import logging
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+from board import Board
+from discordtakbot import DiscordTakBot
+from discordtakbot.fakes import (FakeGuild, FakeMember, FakeMessage,
+                                 FakeTextChannel)
+from discordtakbot.metrics import Histogram
+from mytypes import PlayerType
+from readconfig import RenderConfig, StoreConfig, TakConfig
+
+LAG_INTERVAL = 0.01  # seconds between looks at the event loop's lag
+
+
+class LoadResult():
+    def __init__(self, games: int, messages: int, seconds: float, latency: Histogram, lag: Histogram, bytes_per_game: Optional[float], errors: int,
+                 stats: str):
+        """
+        latency: of handling a message, from on_message until the bot answered
+        lag: how much later than scheduled the event loop woke up a sleeping task
+        bytes_per_game: memory of the bot per game, None if not measured
+        errors: error messages the bot sent back
+        stats: the bot's per-stage latencies, as $stats shows them
+        """
+        self.games = games
+        self.messages = messages
+        self.seconds = seconds
+        self.latency = latency
+        self.lag = lag
+        self.bytes_per_game = bytes_per_game
+        self.errors = errors
+        self.stats = stats
+
+    def __str__(self):
+        def quantiles(histogram: Histogram) -> str:
+            return " ".join(f"p{q * 100:g}={histogram.quantile(q) * 1000:.1f}ms" for q in [0.5, 0.95, 0.99]) + f" max={histogram.max * 1000:.1f}ms"
+        memory = f"{self.bytes_per_game / 1024:.1f}KiB" if self.bytes_per_game is not None else "not measured"
+        return "\n".join([
+            f"games={self.games} messages={self.messages} errors={self.errors} seconds={self.seconds:.2f} messages/s={self.messages / max(self.seconds, 1e-9):.0f}",
+            f"message latency: {quantiles(self.latency)}",
+            f"event loop lag:  {quantiles(self.lag)}",
+            f"memory per game: {memory}",
+        ])
+
+
+class LoadGenerator():
+    """
+    Plays games of random legal moves against DiscordTakBot with fakes instead of Discord. Every game is created with $create
+    in a lobby channel, then its two players take turns in the game's channel until the game ends or has max_moves moves.
+    All games run concurrently on one event loop, like the bot's real traffic.
+    """
+
+    def __init__(self, bot: DiscordTakBot, tak_config: TakConfig, board_size: int, max_moves: int, think_time: float, latency: float, seed: int):
+        """
+        think_time: players wait up to this many seconds before each move
+        latency: seconds every call of the bot to the fakes takes
+        """
+        self.bot = bot
+        self.tak_config = tak_config
+        self.board_size = board_size
+        self.max_moves = max_moves
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.guild = FakeGuild(latency=latency)
+        self.lobby = FakeTextChannel(self.guild, "lobby", latency)
+        self.latency = Histogram()
+        self.messages = 0
+
+    async def send(self, channel: FakeTextChannel, author: FakeMember, content: str, mentions: Optional[List[FakeMember]] = None) -> None:
+        start = time.perf_counter()
+        await self.bot.on_message(FakeMessage(channel, author, content, mentions))  # type: ignore
+        self.latency.observe(time.perf_counter() - start)
+        self.messages += 1
+
+    async def play_game(self, index: int) -> None:
+        rng = random.Random(self.rng.random())
+        white = self.guild.add_member(FakeMember(f"white{index}"))
+        black = self.guild.add_member(FakeMember(f"black{index}"))
+        await self.send(self.lobby, white, f"$create -s{self.board_size} -white {black.mention}", [black])
+        channel = next(channel for channel in self.guild.channels if channel.name == f"game_{white.display_name}_vs_{black.display_name}")
+
+        board = Board(self.tak_config, self.board_size)  # the players' view of the game
+        for _ in range(self.max_moves):
+            if board.result:
+                break
+            await asyncio.sleep(rng.random() * self.think_time)
+            move = rng.choice(board.generate_moves(board.next_player))
+            author = white if board.next_player == PlayerType.WHITE else black
+            board.do_move(board.next_player, move)
+            await self.send(channel, author, f"${move.to_ptn()}")
+
+    async def run(self, games: int, measure_memory: bool) -> LoadResult:
+        lag = Histogram()
+        running = True
+
+        async def watch_lag():
+            while running:
+                start = time.perf_counter()
+                await asyncio.sleep(LAG_INTERVAL)
+                lag.observe(max(time.perf_counter() - start - LAG_INTERVAL, 0))
+
+        if measure_memory:
+            # Fills what every process has once, like the move tables and sprites, so that only the games are measured
+            await self.play_game(games)
+            self.latency = Histogram()
+            self.messages = 0
+            gc.collect()
+            tracemalloc.start()
+        watcher = asyncio.ensure_future(watch_lag())
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*[self.play_game(index) for index in range(games)])
+        finally:
+            running = False
+            await watcher
+        seconds = time.perf_counter() - start
+
+        channels = self.guild.channels + [self.lobby]
+        errors = sum(1 for channel in channels for message in channel.sent if message.content.startswith("Error"))
+        bytes_per_game = None
+        if measure_memory:
+            # The games are still resident in the bot. What the fakes kept of the bot's messages, like the images, isn't the bot's.
+            for channel in channels:
+                channel.sent.clear()
+                channel.deleted.clear()
+            gc.collect()
+            bytes_per_game = tracemalloc.get_traced_memory()[0] / max(games, 1)
+            tracemalloc.stop()
+        return LoadResult(games, self.messages, seconds, self.latency, lag, bytes_per_game, errors, self.bot.metrics.format_table())
+
+
+async def run_load(tak_config: TakConfig, games: int, board_size: int = 5, max_moves: int = 30, think_time: float = 0.5, latency: float = 0.05,
+                   rate_limits: bool = True, measure_memory: bool = False, seed: int = 1, directory: Optional[str] = None) -> LoadResult:
+    """
+      rate_limits=False lifts the outbox's pacing, e.g. to find the bot's own limits
+      directory: of the game store, a temporary one by default
+    """
+    with tempfile.TemporaryDirectory(prefix="loadgen-games-") as temporary:
+        bot = DiscordTakBot(tak_config, render_config=RenderConfig(), store_config=StoreConfig(directory if directory else temporary,
+                                                                                               max_resident=games + 1))  # and the warm-up game
+        if not rate_limits:
+            bot.outbox.route_limits = {route: (sys.maxsize, 1.0) for route in bot.outbox.route_limits}
+        try:
+            return await LoadGenerator(bot, tak_config, board_size, max_moves, think_time, latency, seed).run(games, measure_memory)
+        finally:
+            bot.outbox.close()
+            bot.render_pool.shutdown()
+            bot.engine_pool.shutdown()
+            bot.store.shutdown()
+
+
+if __name__ == "__main__":
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Plays many concurrent games against the bot with fake Discord objects and reports its throughput")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=5, help="board size")
+    parser.add_argument("--moves", type=int, default=30, help="maximum moves per game")
+    parser.add_argument("--think-time", type=float, default=0.5, help="maximum seconds a player waits before moving")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every simulated Discord call takes")
+    parser.add_argument("--no-rate-limits", action="store_true", help="don't pace the calls to Discord")
+    parser.add_argument("--memory", action="store_true", help="measure memory per game with tracemalloc, which slows everything down")
+    parser.add_argument("--stats", action="store_true", help="print the bot's per-stage latencies as $stats would")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--config", default="botsettings.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    tak_config = Config.load(args.config).tak
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = asyncio.run(run_load(tak_config, args.games, args.size, args.moves, args.think_time, args.latency, not args.no_rate_limits, args.memory, args.seed))
+    print(result)
+    if args.stats:
+        print(result.stats)
+    print(f"peak RSS grew by {(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024:.1f}MiB")
@@ -0,0 +1,19 @@
+import asyncio
+
+from readconfig import BoardConfig, TakConfig
+
+from .loadgen import run_load
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+})
+
+
+def test_plays_concurrent_games():
+    result = asyncio.run(run_load(tak_config, games=3, board_size=3, max_moves=6, think_time=0, latency=0, rate_limits=False, measure_memory=True))
+    assert result.errors == 0
+    assert result.messages == result.latency.count
+    assert 3 + 3 * 3 <= result.messages <= 3 + 3 * 6  # a $create per game, then its moves until it's over
+    assert result.bytes_per_game is not None and result.bytes_per_game > 0
+    assert "command_create" in result.stats
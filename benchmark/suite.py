@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from board import Board
+from board.render import RENDER_PROFILES, encode_png
+from moves import Move, get_move_table, parse_move
+from readconfig import Config, RenderConfig, StoreConfig, TakConfig
+
+SEED = 1
+RENDERS = 20  # per run, a single one is too short to measure reliably
+UNIT = "ops/s"  # every scenario reports operations per second, higher is better
+CALIBRATION = "calibration"
+
+
+class Scenario():
+    def __init__(self, name: str, operations: int, run: Callable[[], None]):
+        """
+        operations: what one run does, e.g. parsed tokens, so that results are in operations per second
+        run: does the work once, everything it needs is prepared before
+        """
+        self.name = name
+        self.operations = operations
+        self.run = run
+
+
+class Result():
+    def __init__(self, name: str, ops_per_second: float, seconds: float, repeat: int, relative: Optional[float] = None):
+        """
+        seconds: of the fastest run, the others were disturbed by something else
+        relative: ops_per_second divided by the calibration's of the same run, compared instead of ops_per_second
+        """
+        self.name = name
+        self.ops_per_second = ops_per_second
+        self.seconds = seconds
+        self.repeat = repeat
+        self.relative = relative
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"ops_per_second": self.ops_per_second, "unit": UNIT, "seconds": self.seconds, "repeat": self.repeat, "relative": self.relative}
+
+    def __str__(self):
+        relative = f" {self.relative:.3g}x calibration" if self.relative is not None else ""
+        return f"{self.name:<32} {self.ops_per_second:>12.0f} {UNIT}{relative} ({self.seconds * 1000:.1f}ms best of {self.repeat})"
+
+
+def play_random_game(tak_config: TakConfig, board_size: int, rng: random.Random, max_moves: int) -> Tuple[Board, List[Move]]:
+    """
+      Plays seeded random moves, standing stones rarely, so that games get long and stacks tall
+    """
+    board = Board(tak_config, board_size)
+    moves: List[Move] = []
+    while not board.result and len(moves) < max_moves:
+        candidates = board.generate_moves(board.next_player)
+        move = rng.choice(candidates)
+        if "S" in move.to_ptn() and rng.random() < 0.8:
+            move = rng.choice(candidates)
+        board.do_move(board.next_player, move)
+        moves.append(move)
+    return board, moves
+
+
+def calibration_scenario(rng: random.Random) -> Scenario:
+    """
+      Plain Python without any code of the bot, the other scenarios are compared relative to it so that a baseline holds on faster or slower machines
+    """
+    numbers = [rng.random() for _ in range(50000)]
+
+    def run():
+        sums: Dict[int, float] = {}
+        for index, number in enumerate(numbers):
+            sums[index % 101] = sums.get(index % 101, 0.0) + number * number
+        sorted(numbers)
+
+    return Scenario(CALIBRATION, len(numbers), run)
+
+
+def parse_scenarios(tak_config: TakConfig, rng: random.Random) -> List[Scenario]:
+    corpus: List[Tuple[int, str]] = []  # board size, token
+    while len(corpus) < 10000:
+        board_size = rng.choice(sorted(tak_config.boards.keys()))
+        _, moves = play_random_game(tak_config, board_size, rng, 120)
+        corpus += [(board_size, move.to_ptn()) for move in moves]
+    corpus = corpus[:10000]
+    move_tables = {board_size: get_move_table(board_size) for board_size, _ in corpus}  # built once, not measured
+
+    def run():
+        for _, token in corpus:
+            parse_move(token)
+
+    def run_move_table():
+        for board_size, token in corpus:
+            move_tables[board_size].parse(token)
+
+    return [Scenario("parse_move", len(corpus), run), Scenario("parse_move/move_table", len(corpus), run_move_table)]
+
+
+def do_move_scenarios(tak_config: TakConfig, rng: random.Random) -> List[Scenario]:
+    scenarios = []
+    for board_size in sorted(tak_config.boards.keys()):
+        games = [play_random_game(tak_config, board_size, rng, 300)[1] for _ in range(5)]
+
+        def run(board_size=board_size, games=games):
+            for moves in games:
+                board = Board(tak_config, board_size)
+                for move in moves:
+                    board.do_move(board.next_player, move)
+
+        scenarios.append(Scenario(f"do_move/{board_size}x{board_size}", sum(len(moves) for moves in games), run))
+    return scenarios
+
+
+def render_scenarios(tak_config: TakConfig, rng: random.Random) -> List[Scenario]:
+    scenarios = []
+    profile = RENDER_PROFILES[RenderConfig().profile]
+
+    def render(board: Board):
+        for _ in range(RENDERS):
+            encode_png(board, profile)
+
+    for board_size in [size for size in [3, 5, 8] if size in tak_config.boards]:
+        mid, _ = play_random_game(tak_config, board_size, rng, board_size * 3)
+        # The position with the tallest stack of a few long games
+        stacked = max((play_random_game(tak_config, board_size, rng, 200)[0] for _ in range(5)), key=lambda board: max(len(stack) for stack in board.board))
+        for name, board in [("empty", Board(tak_config, board_size)), ("mid", mid), ("stacked", stacked)]:
+            scenarios.append(Scenario(f"render/{board_size}x{board_size}/{name}", RENDERS, lambda board=board: render(board)))
+    return scenarios
+
+
+def message_scenarios(tak_config: TakConfig, rng: random.Random) -> List[Scenario]:
+    """
+      Moves sent as messages to DiscordTakBot.on_message, with fakes instead of Discord and without its rate limits
+    """
+    from discordtakbot import DiscordTakBot
+    from discordtakbot.fakes import FakeGuild, FakeMember, FakeMessage
+    from discordtakbot.game import Game
+    from discordtakbot.outbox import Outbox
+
+    _, moves = play_random_game(tak_config, 5, rng, 40)
+
+    async def play(directory: str):
+        bot = DiscordTakBot(tak_config, render_config=RenderConfig(cache_bytes=0), store_config=StoreConfig(directory))
+        bot.outbox = Outbox(route_limits={"send": (sys.maxsize, 1), "delete": (sys.maxsize, 1), "bulk_delete": (sys.maxsize, 1)}, batch_delay=0,
+                            metrics=bot.metrics)
+        guild = FakeGuild()
+        white, black = guild.add_member(FakeMember("white")), guild.add_member(FakeMember("black"))
+        channel = await guild.create_text_channel("benchmark")
+        bot.games.add(channel.id, Game(white, black, Board(tak_config, 5)))  # type: ignore
+        bot.store.create_game(channel.id, white.id, black.id, 5)
+        try:
+            for ply, move in enumerate(moves):
+                await bot.on_message(FakeMessage(channel, white if ply % 2 == 0 else black, f"${move.to_ptn()}"))  # type: ignore
+            await bot.outbox.drain()
+        finally:
+            bot.outbox.close()  # the board images would only be deleted after a minute
+            bot.render_pool.shutdown()
+            bot.engine_pool.shutdown()
+            bot.store.shutdown()
+        if len(channel.sent) != len(moves):
+            raise RuntimeError(f"Expected {len(moves)} board images but the bot sent {len(channel.sent)}: {[message.content for message in channel.sent]}")
+
+    def run():
+        with tempfile.TemporaryDirectory(prefix="benchmark-games-") as directory:
+            asyncio.run(play(directory))
+
+    return [Scenario("on_message/5x5", len(moves), run)]
+
+
+SCENARIOS: Dict[str, Callable[[TakConfig, random.Random], List[Scenario]]] = {
+    "parse": parse_scenarios,
+    "do_move": do_move_scenarios,
+    "render": render_scenarios,
+    "message": message_scenarios,
+}
+
+
+def time_run(scenario: Scenario) -> float:
+    start = time.perf_counter()
+    scenario.run()
+    return time.perf_counter() - start
+
+
+def measure(scenario: Scenario, repeat: int, calibration: Optional[Scenario] = None) -> Result:
+    """
+      Runs the calibration before every run of the scenario, so that both see the same speed of the machine even if it changes
+    """
+    best = calibration_best = float("inf")
+    for _ in range(repeat):
+        if calibration:
+            calibration_best = min(calibration_best, time_run(calibration))
+        best = min(best, time_run(scenario))
+    ops_per_second = scenario.operations / max(best, 1e-9)
+    relative = ops_per_second / (calibration.operations / max(calibration_best, 1e-9)) if calibration else None
+    return Result(scenario.name, ops_per_second, best, repeat, relative)
+
+
+def run_suite(tak_config: TakConfig, groups: List[str], repeat: int, seed: int = SEED, only: Optional[str] = None) -> List[Result]:
+    """
+      Every result is also measured relative to the calibration, in the same process
+    """
+    calibration = calibration_scenario(random.Random(f"{seed}/{CALIBRATION}"))
+    results = [measure(calibration, repeat)]
+    results[0].relative = 1.0
+    for group in groups:
+        # Every group gets its own generator, so its scenarios don't change when other groups are skipped
+        for scenario in SCENARIOS[group](tak_config, random.Random(f"{seed}/{group}")):
+            if only and only not in scenario.name:
+                continue
+            results.append(measure(scenario, repeat, calibration))
+    return results
+
+
+def to_json(results: List[Result], seed: int) -> Dict[str, Any]:
+    return {
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {result.name: result.to_json() for result in results},
+    }
+
+
+def compare(results: List[Result], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+      Returns the scenarios that got slower than the baseline by more than tolerance, e.g. 0.2 for 20%.
+      Compares the results relative to the calibration if both have them, so the baseline can come from another machine.
+    """
+    regressions = []
+    for result in results:
+        expected = baseline["results"].get(result.name)
+        if not expected or result.name == CALIBRATION:
+            continue
+        if result.relative is not None and expected.get("relative") is not None:
+            ratio = result.relative / expected["relative"]
+            if ratio < 1 - tolerance:
+                regressions.append(f"{result.name}: {result.relative:.3g}x calibration is {1 - ratio:.0%} slower than the baseline's {expected['relative']:.3g}x")
+            continue
+        ratio = result.ops_per_second / expected["ops_per_second"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{result.name}: {result.ops_per_second:.0f} {UNIT} is {1 - ratio:.0%} slower than the baseline's {expected['ops_per_second']:.0f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs seeded benchmarks and compares them to a baseline")
+    parser.add_argument("groups", nargs="*", help=f"some of {', '.join(SCENARIOS.keys())}, all by default")
+    parser.add_argument("--config", default="botsettings.json")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario, the fastest counts")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--only", help="only scenarios whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare with, exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown that is still accepted, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    unknown = [group for group in args.groups if group not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown groups {unknown}, choose from {list(SCENARIOS.keys())}")
+
+    results = run_suite(Config.load(args.config).tak, args.groups if args.groups else list(SCENARIOS.keys()), args.repeat, args.seed, args.only)
+    for result in results:
+        print(result)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(to_json(results, args.seed), fp, indent=2)
+            fp.write("\n")
+    if args.baseline:
+        with open(args.baseline, "r") as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} of {len(results)} scenarios regressed by more than {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
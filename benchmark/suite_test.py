@@ -0,0 +1,47 @@
+import random
+
+from readconfig import BoardConfig, TakConfig
+
+from .suite import (Result, compare, message_scenarios, play_random_game,
+                    run_suite, to_json)
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+})
+
+
+def test_scenarios_are_reproducible():
+    _, first = play_random_game(tak_config, 5, random.Random("1/do_move"), 50)
+    _, second = play_random_game(tak_config, 5, random.Random("1/do_move"), 50)
+    assert [move.to_ptn() for move in first] == [move.to_ptn() for move in second]
+
+
+def test_runs_scenarios():
+    results = run_suite(tak_config, ["do_move", "render"], repeat=1, only="5x5")
+    assert [result.name for result in results] == ["calibration", "do_move/5x5", "render/5x5/empty", "render/5x5/mid", "render/5x5/stacked"]
+    assert all(result.ops_per_second > 0 for result in results)
+    assert results[0].relative == 1.0
+
+
+def test_message_scenario_answers_every_move():
+    # Raises if the bot didn't send a board for every move
+    for scenario in message_scenarios(tak_config, random.Random(1)):
+        scenario.run()
+
+
+def test_reports_regressions_beyond_the_tolerance():
+    baseline = to_json([Result("fast", 1000, 1, 1), Result("slow", 1000, 1, 1), Result("gone", 1000, 1, 1)], seed=1)
+    results = [Result("fast", 900, 1, 1), Result("slow", 700, 1, 1), Result("new", 5, 1, 1)]
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow:")
+
+
+def test_compares_relative_to_the_calibration():
+    # Measured on a machine twice as fast, but do_move got slower than the calibration
+    baseline = to_json([Result("calibration", 2000, 1, 1, 1.0), Result("do_move", 1000, 1, 1, 0.5), Result("render", 100, 1, 1, 0.05)], seed=1)
+    results = [Result("calibration", 1000, 1, 1, 1.0), Result("do_move", 300, 1, 1, 0.3), Result("render", 50, 1, 1, 0.05)]
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("do_move:")
@@ -1 +1,2 @@
+from .bitboard import BitBoard
 from .board import Board
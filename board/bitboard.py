@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from board.helpers.stone import Stone
+from moves import Move, MoveStack, PlaceStone
+from mytypes import (GameResult, InvalidMoveError, PlayerType, StoneType,
+                     WinType, get_opponent)
+from readconfig import TakConfig
+
+from .board import Board, apply_direction
+from .helpers import PieceReserve
+from .helpers.zobrist import get_zobrist_keys
+
+# Stack words store one bit per stone, bottom stone in bit 0. A set bit is a black stone.
+OWNER_BITS: Dict[PlayerType, int] = {
+    PlayerType.WHITE: 0,
+    PlayerType.BLACK: 1,
+}
+OWNERS = [PlayerType.WHITE, PlayerType.BLACK]
+FLATS = [Stone(owner, StoneType.FLAT) for owner in OWNERS]  # by owner bit
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+@lru_cache(maxsize=None)
+def get_edge_masks(board_size: int) -> Tuple[int, int, int, int]:
+    """
+      Returns the bitboards of the left column, right column, bottom row and top row
+    """
+    left = sum(1 << (y * board_size) for y in range(board_size))
+    bottom = (1 << board_size) - 1
+    return left, left << (board_size - 1), bottom, bottom << (board_size * (board_size - 1))
+
+
+class BitUndoRecord():
+    """
+    Everything BitBoard.undo_move needs to revert a move. The bitboards are plain integers, so they are saved as they were,
+    of the stacks only those the move touched.
+    """
+    __slots__ = ("player", "reserve", "owned", "standing", "caps", "stacks", "next_player", "initial_moves", "hash")
+
+    def __init__(self, bitboard: BitBoard, player: PlayerType):
+        reserve = bitboard.player_reserves[player]
+        self.player = player  # owner of the moved/placed stones, only their reserve can change
+        self.reserve = reserve.flats, reserve.caps
+        self.owned = bitboard.owned[PlayerType.WHITE], bitboard.owned[PlayerType.BLACK]
+        self.standing = bitboard.standing
+        self.caps = bitboard.caps
+        self.stacks: Tuple[Tuple[int, int, int], ...] = ()  # index, word and height of every touched stack
+        self.next_player = bitboard.next_player
+        self.initial_moves = bitboard.initial_moves
+        self.hash = bitboard.hash
+
+
+class BitBoard():
+    """
+    Compact engine with the same rules and public interface as Board.
+
+    Ownership of the top stones as well as standing stones and capstones are kept as integer bitboards
+    (bit index = x + y * board_size). The content of every stack is a packed integer word with one owner bit
+    per stone. Only the top stone of a stack can be a standing stone or capstone, everything below is flat.
+
+    Hashes positions with the same Zobrist keys as Board, so both have the same hash for the same position. Roads and the
+    counters for the end of the game are computed from the bitboards when needed instead of being tracked per move.
+    """
+
+    def __init__(self, tak_config: TakConfig, board_size: int) -> None:
+        self.board_size = board_size
+        self.tak_config = tak_config
+
+        square_count = board_size * board_size
+        self.heights: List[int] = [0] * square_count
+        self.stacks: List[int] = [0] * square_count
+
+        # bitboards
+        self.owned: Dict[PlayerType, int] = {PlayerType.WHITE: 0, PlayerType.BLACK: 0}
+        self.standing = 0
+        self.caps = 0
+
+        piece_count = Board._get_piece_count(self.tak_config, self.board_size)
+        self.player_reserves: Dict[PlayerType, PieceReserve] = {
+            PlayerType.WHITE: PieceReserve(PlayerType.WHITE, flats=piece_count.flats, caps=piece_count.caps),
+            PlayerType.BLACK: PieceReserve(PlayerType.BLACK, flats=piece_count.flats, caps=piece_count.caps),
+        }
+
+        self.zobrist = get_zobrist_keys(board_size)
+        self.hash = self._hash_reserve(PlayerType.WHITE) ^ self._hash_reserve(PlayerType.BLACK) ^ self.zobrist.initial_moves
+
+        self._next_player = PlayerType.WHITE
+        self._initial_moves = True  # The first two pieces are played with opponent's pieces
+
+        self.result: Optional[GameResult] = None  # set once the game is over
+        self.history: List[BitUndoRecord] = []  # moves done with do_move, latest last
+        self.keep_history = True  # see discard_history
+        self.ply = 0
+
+    @property
+    def next_player(self) -> PlayerType:
+        return self._next_player
+
+    @next_player.setter
+    def next_player(self, player: PlayerType) -> None:
+        if player != self._next_player:
+            self.hash ^= self.zobrist.black_to_move
+        self._next_player = player
+
+    @property
+    def initial_moves(self) -> bool:
+        return self._initial_moves
+
+    @initial_moves.setter
+    def initial_moves(self, initial_moves: bool) -> None:
+        if initial_moves != self._initial_moves:
+            self.hash ^= self.zobrist.initial_moves
+        self._initial_moves = initial_moves
+
+    @property
+    def flat_counts(self) -> Dict[PlayerType, int]:
+        """
+          Flats on top of a stack per player
+        """
+        flats = ~(self.standing | self.caps)
+        return {player: popcount(owned & flats) for player, owned in self.owned.items()}
+
+    @property
+    def empty_fields(self) -> int:
+        return self.board_size * self.board_size - popcount(self.owned[PlayerType.WHITE] | self.owned[PlayerType.BLACK])
+
+    @staticmethod
+    def from_board(board: Board) -> BitBoard:
+        bitboard = BitBoard(board.tak_config, board.board_size)
+        for y in range(board.board_size):
+            for x in range(board.board_size):
+                bitboard.set_stack(x, y, board.get_stack(x, y))
+        for player, reserve in board.player_reserves.items():
+            bitboard.player_reserves[player].flats = reserve.flats
+            bitboard.player_reserves[player].caps = reserve.caps
+        bitboard.next_player = board.next_player
+        bitboard.initial_moves = board.initial_moves
+        bitboard.ply = board.ply
+        bitboard._update_derived_state()
+        return bitboard
+
+    def to_board(self) -> Board:
+        board = Board(self.tak_config, self.board_size)
+        for y in range(self.board_size):
+            for x in range(self.board_size):
+                board.set_stack(x, y, self.get_stack(x, y))
+        for player, reserve in self.player_reserves.items():
+            board.player_reserves[player].flats = reserve.flats
+            board.player_reserves[player].caps = reserve.caps
+        board.next_player = self.next_player
+        board.initial_moves = self.initial_moves
+        board.ply = self.ply
+        board._update_derived_state()
+        return board
+
+    def discard_history(self) -> None:
+        """
+          Stops keeping the history of moves, after that moves can't be undone
+        """
+        self.keep_history = False
+        self.history.clear()
+
+    def _hash_reserve(self, player: PlayerType) -> int:
+        reserve = self.player_reserves[player]
+        return self.zobrist.reserve(player, reserve.flats, reserve.caps)
+
+    def _hash_stones(self, index: int, word: int, first: int, count: int) -> int:
+        """
+          Returns the keys of n=count flats from the height first up, their owners are the lowest bits of word
+        """
+        hash = 0
+        for height in range(first, first + count):
+            hash ^= self.zobrist.stone(index, height, FLATS[word & 1])
+            word >>= 1
+        return hash
+
+    def _hash_top_type(self, index: int) -> int:
+        top_type = self._get_top_type(1 << index)
+        return self.zobrist.top_types[index][top_type] if top_type != StoneType.FLAT else 0
+
+    def _compute_hash(self) -> int:
+        """
+          Hashes the position from scratch. do_move and friends update self.hash incrementally instead.
+        """
+        hash = self._hash_reserve(PlayerType.WHITE) ^ self._hash_reserve(PlayerType.BLACK)
+        if self.next_player == PlayerType.BLACK:
+            hash ^= self.zobrist.black_to_move
+        if self.initial_moves:
+            hash ^= self.zobrist.initial_moves
+        for index in range(len(self.stacks)):
+            hash ^= self._hash_stones(index, self.stacks[index], 0, self.heights[index]) ^ self._hash_top_type(index)
+        return hash
+
+    def _update_derived_state(self) -> None:
+        """
+          Recomputes hash and result after the stacks or reserves were written directly
+        """
+        self.hash = self._compute_hash()
+        # If both players have a road, the one who moved last wins
+        self.result = self._check_roads(get_opponent(self.next_player)) or self._check_end()
+
+    def has_road(self, player: PlayerType) -> bool:
+        """
+          Flood fills the player's flats and capstones from the left and bottom edges until they reach the opposite edge or stop growing
+        """
+        left, right, bottom, top = get_edge_masks(self.board_size)
+        road = self.owned[player] & ~self.standing
+        for start, goal in [(left, right), (bottom, top)]:
+            reached = road & start
+            while reached:
+                if reached & goal:
+                    return True
+                grown = (reached | (reached << 1) & ~left | (reached >> 1) & ~right | reached << self.board_size | reached >> self.board_size) & road
+                if grown == reached:
+                    break
+                reached = grown
+        return False
+
+    def _check_roads(self, acting_player: PlayerType) -> Optional[GameResult]:
+        """
+          If a move completes roads for both players, the acting player wins
+        """
+        if self.has_road(acting_player):
+            return GameResult(acting_player, WinType.ROAD)
+        opponent = get_opponent(acting_player)
+        if self.has_road(opponent):
+            return GameResult(opponent, WinType.ROAD)
+        return None
+
+    def _check_end(self) -> Optional[GameResult]:
+        """
+          The game ends once the board is full or one player placed all their pieces. The player with more flats on top wins.
+        """
+        if self.empty_fields > 0 and not any(reserve.is_empty() for reserve in self.player_reserves.values()):
+            return None
+        flat_counts = self.flat_counts
+        white, black = flat_counts[PlayerType.WHITE], flat_counts[PlayerType.BLACK]
+        if white == black:
+            return GameResult(None, WinType.FLAT)
+        return GameResult(PlayerType.WHITE if white > black else PlayerType.BLACK, WinType.FLAT)
+
+    def _get_index(self, x: int, y: int) -> int:
+        if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
+            raise InvalidMoveError(f"{x}/{y} is not on the board (board size {self.board_size})")
+        return x + y * self.board_size
+
+    def _get_top_type(self, bit: int) -> StoneType:
+        if self.caps & bit:
+            return StoneType.CAPSTONE
+        if self.standing & bit:
+            return StoneType.STANDING
+        return StoneType.FLAT
+
+    def _update_top(self, index: int) -> None:
+        """
+          Updates the ownership bitboards for the stack at index. Stone types have to be maintained by the caller.
+        """
+        bit = 1 << index
+        height = self.heights[index]
+        self.owned[PlayerType.WHITE] &= ~bit
+        self.owned[PlayerType.BLACK] &= ~bit
+        if height > 0:
+            owner = OWNERS[(self.stacks[index] >> (height - 1)) & 1]
+            self.owned[owner] |= bit
+
+    def get_stack(self, x: int, y: int) -> List[Stone]:
+        """
+          Returns a copy of the stack on x/y, bottom stone first. Changing the list does not affect the board.
+        """
+        index = self._get_index(x, y)
+        height = self.heights[index]
+        word = self.stacks[index]
+        stones = [Stone(OWNERS[(word >> i) & 1], StoneType.FLAT) for i in range(height)]
+        if height > 0:
+            top_type = self._get_top_type(1 << index)
+            if top_type != StoneType.FLAT:
+                stones[-1] = Stone(stones[-1].player, top_type)
+        return stones
+
+    def set_stack(self, x: int, y: int, stones: List[Stone]) -> None:
+        index = self._get_index(x, y)
+        if any(stone.type != StoneType.FLAT for stone in stones[:-1]):
+            raise ValueError(f"Only the top stone of a stack can be a standing stone or capstone but got {stones}")
+
+        word = 0
+        for i, stone in enumerate(stones):
+            word |= OWNER_BITS[stone.player] << i
+        self.hash ^= self._hash_stones(index, self.stacks[index], 0, self.heights[index]) ^ self._hash_top_type(index)
+        self.hash ^= self._hash_stones(index, word, 0, len(stones))
+        self.stacks[index] = word
+        self.heights[index] = len(stones)
+
+        bit = 1 << index
+        self.standing &= ~bit
+        self.caps &= ~bit
+        if stones and stones[-1].type == StoneType.STANDING:
+            self.standing |= bit
+        if stones and stones[-1].type == StoneType.CAPSTONE:
+            self.caps |= bit
+        self.hash ^= self._hash_top_type(index)
+        self._update_top(index)
+
+    def place_stone(self, player: PlayerType, x: int, y: int, stoneType: StoneType) -> None:
+        if self.initial_moves and stoneType != StoneType.FLAT:
+            raise InvalidMoveError("Only flats can be placed during the first turn.")
+
+        index = self._get_index(x, y)
+        if self.heights[index] > 0:
+            raise InvalidMoveError("Stones can only be placed on empty fields")
+
+        # take() raises if the reserve is empty, so the hash only changes after it succeeded
+        reserve_before = self._hash_reserve(player)
+        stone = self.player_reserves[player].take(stone_type=stoneType)
+        self.hash ^= reserve_before ^ self._hash_reserve(player) ^ self.zobrist.stone(index, 0, stone)
+
+        bit = 1 << index
+        self.stacks[index] = OWNER_BITS[player]
+        self.heights[index] = 1
+        self.owned[player] |= bit
+        if stoneType == StoneType.STANDING:
+            self.standing |= bit
+        if stoneType == StoneType.CAPSTONE:
+            self.caps |= bit
+
+    def _move_stack(self, player: PlayerType, move: MoveStack, undo: BitUndoRecord) -> None:
+        x, y = move.get_xy()
+        start = self._get_index(x, y)
+        start_bit = 1 << start
+        height = self.heights[start]
+
+        if height == 0:
+            raise InvalidMoveError(f"There is no stack on {x}/{y} to move")
+        if not self.owned[player] & start_bit:
+            raise InvalidMoveError(f"Stack on {x}/{y} belongs to {get_opponent(player)} and not to {player}")
+
+        # If no stack was defined, pick up as much as the carry limit allows
+        pickup = move.pickup if move.pickup else min(height, self.board_size)
+        if pickup > self.board_size:
+            raise InvalidMoveError(f"The carry limit is {self.board_size} (tried to pick up {move.pickup})")
+        if pickup > height:
+            raise InvalidMoveError(f"Stack on {x}/{y} has only {height} pieces (tried to pick up {move.pickup})")
+
+        # If no droppings were defined, drop all at once
+        droppings = move.droppings if move.droppings else (pickup,)
+        if pickup != sum(droppings):
+            raise InvalidMoveError(f"Cannot pickup {pickup} stones and drop a total of {droppings}")
+
+        moving_type = self._get_top_type(start_bit)
+
+        # Validate the whole path before touching any stack
+        targets: List[int] = []
+        flatten = False
+        for i, count in enumerate(droppings):
+            target = self._get_index(*apply_direction(x, y, move.direction, i + 1))
+            target_bit = 1 << target
+            if self.caps & target_bit:
+                raise InvalidMoveError(f"Can't drop stones on a {StoneType.CAPSTONE}")
+            if self.standing & target_bit:
+                dropping_capstone_only = count == 1 and i == len(droppings) - 1 and moving_type == StoneType.CAPSTONE
+                if not dropping_capstone_only:
+                    raise InvalidMoveError("Standing stones can only be flattened with a capstone alone")
+                flatten = True
+            targets.append(target)
+
+        undo.stacks = tuple((index, self.stacks[index], self.heights[index]) for index in [start] + targets)
+        last = targets[-1]
+        carried = self.stacks[start] >> (height - pickup)
+        self.hash ^= self._hash_stones(start, carried, height - pickup, pickup)
+        if moving_type != StoneType.FLAT:
+            self.hash ^= self.zobrist.top_types[start][moving_type] ^ self.zobrist.top_types[last][moving_type]
+        if flatten:
+            self.hash ^= self.zobrist.top_types[last][StoneType.STANDING]
+
+        self.stacks[start] &= (1 << (height - pickup)) - 1
+        self.heights[start] = height - pickup
+        self.standing &= ~start_bit
+        self.caps &= ~start_bit
+        self._update_top(start)
+
+        for target, count in zip(targets, droppings):
+            self.hash ^= self._hash_stones(target, carried, self.heights[target], count)
+            self.stacks[target] |= (carried & ((1 << count) - 1)) << self.heights[target]
+            self.heights[target] += count
+            carried >>= count
+            self._update_top(target)
+
+        last_bit = 1 << last
+        if flatten:
+            self.standing &= ~last_bit
+        if moving_type == StoneType.STANDING:
+            self.standing |= last_bit
+        if moving_type == StoneType.CAPSTONE:
+            self.caps |= last_bit
+
+    def do_move(self, acting_player: PlayerType, move: Move) -> Optional[GameResult]:
+        """
+          Applies the move entirely or, if it is invalid, not at all. Returns the result of the game if the move ended it.
+        """
+        if self.result:
+            raise InvalidMoveError(f"The game is over ({self.result})")
+        if acting_player != self.next_player:
+            raise InvalidMoveError(f"It's {self.next_player}'s turn")
+
+        # switch to opponent stones if still in the initial move sequence
+        player = acting_player if not self.initial_moves else get_opponent(acting_player)
+
+        undo = BitUndoRecord(self, player)
+        if isinstance(move, PlaceStone):
+            x, y = move.get_xy()
+            self.place_stone(player, x, y, move.stoneType)
+            undo.stacks = ((x + y * self.board_size, 0, 0),)
+        if isinstance(move, MoveStack):
+            self._move_stack(player, move, undo)
+        if self.keep_history:
+            self.history.append(undo)
+        self.ply += 1
+
+        if self.initial_moves and acting_player == PlayerType.BLACK:
+            self.initial_moves = False
+        self.next_player = get_opponent(self.next_player)
+
+        self.result = self._check_roads(acting_player) or self._check_end()
+        return self.result
+
+    def undo_move(self) -> None:
+        """
+          Reverts the last move done with do_move
+        """
+        if not self.history:
+            raise InvalidMoveError("There is no move to undo")
+        undo = self.history.pop()
+
+        for index, word, height in undo.stacks:
+            self.stacks[index] = word
+            self.heights[index] = height
+        self.owned[PlayerType.WHITE], self.owned[PlayerType.BLACK] = undo.owned
+        self.standing = undo.standing
+        self.caps = undo.caps
+        reserve = self.player_reserves[undo.player]
+        reserve.flats, reserve.caps = undo.reserve
+        self.hash = undo.hash
+        self._next_player = undo.next_player
+        self._initial_moves = undo.initial_moves
+        self.result = None
+        self.ply -= 1
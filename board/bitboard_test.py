@@ -0,0 +1,174 @@
+import random
+
+import pytest
+
+from board.helpers import Stone
+from moves.moves import parse_move
+from mytypes import GameResult, InvalidMoveError, PlayerType, StoneType, WinType
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from . import BitBoard, Board
+
+tak_config = TakConfig({
+    4: BoardConfig(15, 0),
+    5: BoardConfig(21, 1),
+    6: BoardConfig(30, 1),
+})
+
+GAME = [
+    "a2", "a1",
+    "b1", "a2-",
+    "b1<", "b1",
+    "Ca2", "b2",
+    "a2-", "b3",
+    "3a1>111",
+]
+
+
+def play(board, moves):
+    for move in moves:
+        board.do_move(board.next_player, parse_move(move))
+
+
+def assert_same_position(board: Board, bitboard: BitBoard):
+    for y in range(board.board_size):
+        for x in range(board.board_size):
+            assert bitboard.get_stack(x, y) == board.get_stack(x, y)
+    for player in [PlayerType.WHITE, PlayerType.BLACK]:
+        assert bitboard.player_reserves[player].flats == board.player_reserves[player].flats
+        assert bitboard.player_reserves[player].caps == board.player_reserves[player].caps
+    assert bitboard.next_player == board.next_player
+    assert bitboard.initial_moves == board.initial_moves
+
+
+@pytest.mark.parametrize("moves", [GAME[:i] for i in range(len(GAME) + 1)])
+def test_plays_like_board(moves):
+    board = Board(tak_config, 5)
+    bitboard = BitBoard(tak_config, 5)
+    play(board, moves)
+    play(bitboard, moves)
+    assert_same_position(board, bitboard)
+
+
+@pytest.mark.parametrize("moves", [GAME[:i] for i in range(len(GAME) + 1)])
+def test_conversion_round_trip(moves):
+    board = Board(tak_config, 5)
+    play(board, moves)
+
+    bitboard = BitBoard.from_board(board)
+    assert_same_position(board, bitboard)
+    assert_same_position(bitboard.to_board(), bitboard)
+
+
+def test_get_stack_returns_a_copy():
+    bitboard = BitBoard(tak_config, 4)
+    play(bitboard, ["a1"])
+    bitboard.get_stack(0, 0).append(Stone(PlayerType.WHITE, StoneType.FLAT))
+    assert bitboard.get_stack(0, 0) == [Stone(PlayerType.BLACK, StoneType.FLAT)]
+
+
+def test_set_stack_rejects_non_flat_stones_below_the_top():
+    bitboard = BitBoard(tak_config, 4)
+    with pytest.raises(ValueError):
+        bitboard.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.STANDING), Stone(PlayerType.WHITE, StoneType.FLAT)])
+
+
+def test_capstone_flattens_standing_stone():
+    bitboard = BitBoard(tak_config, 5)
+    bitboard.initial_moves = False
+    bitboard.set_stack(0, 0, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)])
+    bitboard.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+    bitboard.do_move(PlayerType.WHITE, parse_move("2a1>11"))
+    assert bitboard.get_stack(0, 0) == []
+    assert bitboard.get_stack(1, 0) == [Stone(PlayerType.BLACK, StoneType.FLAT)]
+    assert bitboard.get_stack(2, 0) == [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)]
+
+
+def test_invalid_move_leaves_board_untouched():
+    bitboard = BitBoard(tak_config, 5)
+    bitboard.initial_moves = False
+    bitboard.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)])
+    bitboard.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.CAPSTONE)])
+    with pytest.raises(InvalidMoveError):
+        bitboard.do_move(PlayerType.WHITE, parse_move("2a1>11"))
+    assert bitboard.get_stack(0, 0) == [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)]
+    assert bitboard.get_stack(1, 0) == []
+
+
+@pytest.mark.parametrize("moves", [GAME[:i] for i in range(len(GAME) + 1)])
+def test_to_board_restores_hash(moves):
+    board = Board(tak_config, 5)
+    play(board, moves)
+    assert BitBoard.from_board(board).to_board().hash == board.hash
+
+
+def test_to_board_updates_counters_and_result():
+    bitboard = BitBoard(tak_config, 4)
+    bitboard.initial_moves = False
+    for x in range(4):
+        bitboard.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+    bitboard.set_stack(0, 1, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+    board = bitboard.to_board()
+    assert board.flat_counts == {PlayerType.WHITE: 4, PlayerType.BLACK: 0}
+    assert board.empty_fields == 11
+    assert board.roads[PlayerType.WHITE].has_road
+    assert board.result == GameResult(PlayerType.WHITE, WinType.ROAD)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_games_end_like_on_board(seed: int):
+    rng = random.Random(seed)
+    board = Board(tak_config, rng.choice([4, 5, 6]))
+    bitboard = BitBoard(tak_config, board.board_size)
+    while not board.result:
+        move = rng.choice(board.generate_moves(board.next_player))
+        assert bitboard.do_move(bitboard.next_player, move) == board.do_move(board.next_player, move)
+        assert bitboard.hash == board.hash == bitboard._compute_hash()
+        assert bitboard.flat_counts == board.flat_counts
+        assert bitboard.empty_fields == board.empty_fields
+        for player in [PlayerType.WHITE, PlayerType.BLACK]:
+            assert bitboard.has_road(player) == board.roads[player].has_road
+    with pytest.raises(InvalidMoveError):
+        bitboard.do_move(bitboard.next_player, parse_move("a1"))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_undoing_a_game_restores_every_position(seed: int):
+    rng = random.Random(seed)
+    board = Board(tak_config, rng.choice([4, 5, 6]))
+    bitboard = BitBoard(tak_config, board.board_size)
+    positions = []
+    while not board.result:
+        positions.append(board.copy())
+        move = rng.choice(board.generate_moves(board.next_player))
+        board.do_move(board.next_player, move)
+        bitboard.do_move(bitboard.next_player, move)
+    while positions:
+        bitboard.undo_move()
+        expected = positions.pop()
+        assert_same_position(expected, bitboard)
+        assert bitboard.hash == expected.hash
+        assert bitboard.result is None
+    with pytest.raises(InvalidMoveError):
+        bitboard.undo_move()
+
+
+def test_from_board_takes_the_result():
+    board = Board(tak_config, 4)
+    board.initial_moves = False
+    for x in range(3):
+        board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+    board.do_move(PlayerType.WHITE, parse_move("d1"))
+    bitboard = BitBoard.from_board(board)
+    assert bitboard.result == board.result == GameResult(PlayerType.WHITE, WinType.ROAD)
+    assert bitboard.hash == board.hash
+    assert bitboard.ply == board.ply
+
+
+def test_discarded_history_keeps_no_undo_records():
+    bitboard = BitBoard(tak_config, 5)
+    bitboard.discard_history()
+    play(bitboard, ["a1", "b1"])
+    assert bitboard.history == []
+    with pytest.raises(InvalidMoveError):
+        bitboard.undo_move()
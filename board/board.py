@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple, TypeVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
 
 from PIL import ImageDraw
 
 from moves import Move, MoveStack, PlaceStone
-from mytypes import (Direction, InvalidMoveError, PlayerType, StoneType,
-                     get_opponent)
+from moves.movetable import compositions, drop_sequences, get_move_table
+from mytypes import (Direction, GameResult, InvalidMoveError, PlayerType,
+                     StoneType, WinType, get_opponent)
 from readconfig import BoardConfig, TakConfig
 
-from .helpers import PieceReserve, Stone
+from .helpers import PieceReserve, RoadTracker, Stone
+from .helpers.zobrist import get_zobrist_keys
 
 BOARD_SIZE = 6  # choose from 3-8
 
@@ -32,7 +34,7 @@ def apply_direction(x: int, y: int, direction: Direction, delta: int = 1) -> Tup
 T = TypeVar('T')
 
 
-def split_by_counts(array: List[T], counts: List[int]) -> List[List[T]]:
+def split_by_counts(array: List[T], counts: Sequence[int]) -> List[List[T]]:
     if sum(counts) != len(array):
         raise ValueError(f"Cannot split list with {len(array)} items into {len(counts)} groups with an accumulated size of {sum(counts)}")
 
@@ -44,6 +46,31 @@ def split_by_counts(array: List[T], counts: List[int]) -> List[List[T]]:
     return groups
 
 
+class UndoRecord():
+    """
+    Everything undo_move needs to revert a move. The stacks are restored from the move itself, the small derived state
+    (counters, hash) is saved as it was before the move and the road trackers are rolled back to their journals' marks.
+    A board keeps one per move, so they are slotted and hold nothing that grows with the board.
+    """
+    __slots__ = ("move", "player", "next_player", "initial_moves", "flat_counts", "empty_fields", "hash", "road_marks", "start_index", "drop_indices",
+                 "droppings", "flattened")
+
+    def __init__(self, board: Board, move: Move, player: PlayerType):
+        self.move = move
+        self.player = player  # owner of the moved/placed stones
+        self.next_player = board.next_player
+        self.initial_moves = board.initial_moves
+        self.flat_counts = board.flat_counts[PlayerType.WHITE], board.flat_counts[PlayerType.BLACK]
+        self.empty_fields = board.empty_fields
+        self.hash = board.hash
+        self.road_marks = board.roads[PlayerType.WHITE].mark(), board.roads[PlayerType.BLACK].mark()
+        # only set for stack moves
+        self.start_index = 0
+        self.drop_indices: List[int] = []
+        self.droppings: Tuple[int, ...] = ()
+        self.flattened: Optional[Stone] = None  # standing stone that was flattened by a capstone
+
+
 class Board():
     def __init__(self, tak_config: TakConfig, board_size: int) -> None:
         self.board: List[List[Stone]] = [[] for _ in range(board_size * board_size)]
@@ -61,8 +88,79 @@ class Board():
             PlayerType.BLACK: PieceReserve(PlayerType.BLACK, flats=piece_count.flats, caps=piece_count.caps),
         }
 
-        self.next_player = PlayerType.WHITE
-        self.initial_moves = True  # The first two pieces are played with opponent's pieces
+        # 64 bit Zobrist hash of the position, kept up to date by every change of the board
+        self.zobrist = get_zobrist_keys(board_size)
+        self.hash = self._hash_reserve(PlayerType.WHITE) ^ self._hash_reserve(PlayerType.BLACK) ^ self.zobrist.initial_moves
+
+        self._next_player = PlayerType.WHITE
+        self._initial_moves = True  # The first two pieces are played with opponent's pieces
+
+        self.roads: Dict[PlayerType, RoadTracker] = {
+            PlayerType.WHITE: RoadTracker(board_size, journal=True),
+            PlayerType.BLACK: RoadTracker(board_size, journal=True),
+        }
+        self.result: Optional[GameResult] = None  # set once the game is over
+        self.history: List[UndoRecord] = []  # moves done with do_move, latest last
+        self.keep_history = True  # see discard_history
+        self.ply = 0  # moves since the start of the game, including those before a position was loaded
+
+        # Running counters so that scoring the end of the game doesn't require a scan of the board
+        self.flat_counts: Dict[PlayerType, int] = {PlayerType.WHITE: 0, PlayerType.BLACK: 0}  # flats on top of a stack
+        self.empty_fields = board_size * board_size
+
+    @property
+    def next_player(self) -> PlayerType:
+        return self._next_player
+
+    @next_player.setter
+    def next_player(self, player: PlayerType) -> None:
+        if player != self._next_player:
+            self.hash ^= self.zobrist.black_to_move
+        self._next_player = player
+
+    @property
+    def initial_moves(self) -> bool:
+        return self._initial_moves
+
+    @initial_moves.setter
+    def initial_moves(self, initial_moves: bool) -> None:
+        if initial_moves != self._initial_moves:
+            self.hash ^= self.zobrist.initial_moves
+        self._initial_moves = initial_moves
+
+    def _hash_reserve(self, player: PlayerType) -> int:
+        reserve = self.player_reserves[player]
+        return self.zobrist.reserve(player, reserve.flats, reserve.caps)
+
+    def _hash_stack(self, index: int) -> int:
+        hash = 0
+        for height, stone in enumerate(self.board[index]):
+            hash ^= self.zobrist.stone(index, height, stone)
+        return hash
+
+    def _compute_hash(self) -> int:
+        """
+          Hashes the position from scratch. do_move and friends update self.hash incrementally instead.
+        """
+        hash = self._hash_reserve(PlayerType.WHITE) ^ self._hash_reserve(PlayerType.BLACK)
+        if self.next_player == PlayerType.BLACK:
+            hash ^= self.zobrist.black_to_move
+        if self.initial_moves:
+            hash ^= self.zobrist.initial_moves
+        for index in range(len(self.board)):
+            hash ^= self._hash_stack(index)
+        return hash
+
+    def get_stacks_hash(self) -> int:
+        """
+          Returns a hash of the stacks only, leaving out reserves and whose turn it is. Positions that look the same have the same hash.
+        """
+        hash = self.hash ^ self._hash_reserve(PlayerType.WHITE) ^ self._hash_reserve(PlayerType.BLACK)
+        if self.next_player == PlayerType.BLACK:
+            hash ^= self.zobrist.black_to_move
+        if self.initial_moves:
+            hash ^= self.zobrist.initial_moves
+        return hash
 
     @staticmethod
     def _get_piece_count(tak_config: TakConfig, board_size: int) -> BoardConfig:
@@ -71,6 +169,37 @@ class Board():
             return piece_count
         raise ValueError(f"Board size '{board_size}' is not supported. Supported board sizes are: {list(tak_config.boards.keys())}")
 
+    def copy(self) -> Board:
+        """
+          Returns an independent copy of the position. The copy starts without history, so it can't undo earlier moves.
+        """
+        board = Board(self.tak_config, self.board_size)
+        board.board = [list(stack) for stack in self.board]
+        for player, reserve in self.player_reserves.items():
+            board.player_reserves[player].flats = reserve.flats
+            board.player_reserves[player].caps = reserve.caps
+        board.next_player = self.next_player
+        board.initial_moves = self.initial_moves
+        board.roads = {player: tracker.copy() for player, tracker in self.roads.items()}
+        for tracker in board.roads.values():
+            tracker.start_journal()
+        board.result = self.result
+        board.flat_counts = dict(self.flat_counts)
+        board.empty_fields = self.empty_fields
+        board.hash = self.hash
+        board.ply = self.ply
+        return board
+
+    def discard_history(self) -> None:
+        """
+          Stops keeping the history of moves, after that moves can't be undone. For boards that are only played on, like the bot's games,
+          which would otherwise keep an undo record per move for as long as the game lives.
+        """
+        self.keep_history = False
+        self.history.clear()
+        for tracker in self.roads.values():
+            tracker.stop_journal()
+
     def get_dimensions(self) -> Tuple[int, int]:
         return self.board_size * TILE_WIDTH, self.board_size * TILE_WIDTH
 
@@ -79,6 +208,78 @@ class Board():
             raise InvalidMoveError(f"{x}/{y} is not on the board (board size {self.board_size})")
         return self.board[x + y * self.board_size]
 
+    def set_stack(self, x: int, y: int, stones: List[Stone]) -> None:
+        stack = self.get_stack(x, y)
+        index = x + y * self.board_size
+        self._count_stack(stack, -1)
+        self.hash ^= self._hash_stack(index)
+        stack[:] = stones
+        self.hash ^= self._hash_stack(index)
+        self._count_stack(stack, 1)
+        self._update_roads([index])
+
+    def _update_derived_state(self) -> None:
+        """
+          Recomputes counters, road trackers, hash and result after the stacks or reserves were written directly
+        """
+        self.flat_counts = {PlayerType.WHITE: 0, PlayerType.BLACK: 0}
+        self.empty_fields = 0
+        for stack in self.board:
+            self._count_stack(stack, 1)
+        for player, tracker in self.roads.items():
+            tracker.rebuild(index for index in range(len(self.board)) if self._is_road(index, player))
+        self.hash = self._compute_hash()
+        # If both players have a road, the one who moved last wins
+        self.result = self._check_roads(get_opponent(self.next_player)) or self._check_end()
+
+    def _count_stack(self, stack: List[Stone], sign: int) -> None:
+        """
+          Adds (sign=1) or removes (sign=-1) the stack to/from the empty field and flat counters
+        """
+        if len(stack) == 0:
+            self.empty_fields += sign
+        elif stack[-1].type == StoneType.FLAT:
+            self.flat_counts[stack[-1].player] += sign
+
+    def _check_end(self) -> Optional[GameResult]:
+        """
+          The game ends once the board is full or one player placed all their pieces. The player with more flats on top wins.
+        """
+        if self.empty_fields > 0 and not any(reserve.is_empty() for reserve in self.player_reserves.values()):
+            return None
+        white, black = self.flat_counts[PlayerType.WHITE], self.flat_counts[PlayerType.BLACK]
+        if white == black:
+            return GameResult(None, WinType.FLAT)
+        return GameResult(PlayerType.WHITE if white > black else PlayerType.BLACK, WinType.FLAT)
+
+    def _is_road(self, index: int, player: PlayerType) -> bool:
+        stack = self.board[index]
+        return len(stack) > 0 and stack[-1].player == player and stack[-1].type != StoneType.STANDING
+
+    def _update_roads(self, indices: Iterable[int]) -> None:
+        """
+          Updates the road trackers after the top stones of the given fields changed.
+          Fields that became part of a road are added incrementally. Lost fields are removed, which rebuilds only the groups
+          that contained them, since a stack move may have split them.
+        """
+        indices = list(indices)
+        for player, tracker in self.roads.items():
+            tracker.remove(index for index in indices if tracker.contains(index) and not self._is_road(index, player))
+            for index in indices:
+                if self._is_road(index, player):
+                    tracker.add(index)
+
+    def _check_roads(self, acting_player: PlayerType) -> Optional[GameResult]:
+        """
+          If a move completes roads for both players, the acting player wins
+        """
+        if self.roads[acting_player].has_road:
+            return GameResult(acting_player, WinType.ROAD)
+        opponent = get_opponent(acting_player)
+        if self.roads[opponent].has_road:
+            return GameResult(opponent, WinType.ROAD)
+        return None
+
     def get_stacks(self, x: int, y: int, direction: Direction, count: int) -> List[List[Stone]]:
         """
           Returns the n=count stacks that start next to x/y in direction. The first one is the direct neighbour of x/y
@@ -93,65 +294,216 @@ class Board():
         if len(stack) > 0:
             raise InvalidMoveError("Stones can only be placed on empty fields")
 
+        # take() raises if the reserve is empty, so the hash only changes after it succeeded
+        reserve_before = self._hash_reserve(player)
         stone = self.player_reserves[player].take(stone_type=stoneType)
+        self.hash ^= reserve_before ^ self._hash_reserve(player) ^ self.zobrist.stone(x + y * self.board_size, 0, stone)
+        self._count_stack(stack, -1)
         stack.append(stone)
+        self._count_stack(stack, 1)
+        if stoneType != StoneType.STANDING:
+            self.roads[player].add(x + y * self.board_size)
 
-    def do_move(self, acting_player: PlayerType, move: Move) -> None:
+    def do_move(self, acting_player: PlayerType, move: Move) -> Optional[GameResult]:
+        """
+          Applies the move entirely or, if it is invalid, not at all. Returns the result of the game if the move ended it.
+        """
+        if self.result:
+            raise InvalidMoveError(f"The game is over ({self.result})")
         if acting_player != self.next_player:
             raise InvalidMoveError(f"It's {self.next_player}'s turn")
 
         # switch to opponent stones if still in the initial move sequence
         player = acting_player if not self.initial_moves else get_opponent(acting_player)
 
+        undo = UndoRecord(self, move, player)
         if isinstance(move, PlaceStone):
             self.place_stone(player, *move.get_xy(), move.stoneType)
         if isinstance(move, MoveStack):
-            x, y = move.get_xy()
-            start_stack = self.get_stack(x, y)
-            top_stone = start_stack[-1] if len(start_stack) > 0 else None
-
-            if not top_stone:
-                raise InvalidMoveError(f"There is no stack on {x}/{y} to move")
-            if top_stone.player != player:
-                raise InvalidMoveError(f"Stack on {x}/{y} belongs to {top_stone.player} and not to {player}")
-
-            # If no stack was defined, pick up as much as the carry limit allows
-            pickup = move.pickup if move.pickup else min(len(start_stack), self.board_size)
-            if pickup > self.board_size:
-                raise InvalidMoveError(f"The carry limit is {self.board_size} (tried to pick up {move.pickup})")
-            if pickup > len(start_stack):
-                raise InvalidMoveError(f"Stack on {x}/{y} has only {len(start_stack)} pieces (tried to pick up {move.pickup})")
-
-            carried_stones = start_stack[-pickup:]
-            for _ in range(pickup):  # remove stones from stack
-                start_stack.pop()
-
-            # If no droppings were defined, drop all at once
-            droppings = move.droppings if move.droppings else [pickup]
-
-            if pickup != sum(droppings):
-                raise InvalidMoveError(f"Cannot pickup {pickup} stones and drop a total of {droppings}")
-
-            dropped_stones = split_by_counts(carried_stones, droppings)
-
-            drop_reach = len(droppings)  # number of fields stones will be dropped on
-            drop_stacks = self.get_stacks(x, y, move.direction, drop_reach)
-            for stack, stones in zip(drop_stacks, dropped_stones):
-                top_stone = stack[-1] if len(stack) > 0 else None
-                dropping_capstone_only = stones[0].type == StoneType.CAPSTONE
-                if top_stone and top_stone.type == StoneType.CAPSTONE:
-                    raise InvalidMoveError("Can't drop stones on a {top_stone.stoneType}")
-                if top_stone and top_stone.type == StoneType.STANDING:
-                    if dropping_capstone_only:
-                        stack[-1] = top_stone.flatten()
-                    else:
-                        raise InvalidMoveError("Standing stones can only be flattened with a capstone alone")
-                stack.extend(stones)
+            self._move_stack(player, move, undo)
+        if self.keep_history:
+            self.history.append(undo)
+        self.ply += 1
 
         if self.initial_moves and acting_player == PlayerType.BLACK:
             self.initial_moves = False
         self.next_player = get_opponent(self.next_player)
 
+        self.result = self._check_roads(acting_player) or self._check_end()
+        return self.result
+
+    def _move_stack(self, player: PlayerType, move: MoveStack, undo: UndoRecord) -> None:
+        x, y = move.get_xy()
+        start_stack = self.get_stack(x, y)
+        top_stone = start_stack[-1] if len(start_stack) > 0 else None
+
+        if not top_stone:
+            raise InvalidMoveError(f"There is no stack on {x}/{y} to move")
+        if top_stone.player != player:
+            raise InvalidMoveError(f"Stack on {x}/{y} belongs to {top_stone.player} and not to {player}")
+
+        # If no stack was defined, pick up as much as the carry limit allows
+        pickup = move.pickup if move.pickup else min(len(start_stack), self.board_size)
+        if pickup > self.board_size:
+            raise InvalidMoveError(f"The carry limit is {self.board_size} (tried to pick up {move.pickup})")
+        if pickup > len(start_stack):
+            raise InvalidMoveError(f"Stack on {x}/{y} has only {len(start_stack)} pieces (tried to pick up {move.pickup})")
+
+        # If no droppings were defined, drop all at once
+        droppings = move.droppings if move.droppings else (pickup,)
+
+        if pickup != sum(droppings):
+            raise InvalidMoveError(f"Cannot pickup {pickup} stones and drop a total of {droppings}")
+
+        carried_stones = start_stack[-pickup:]
+        dropped_stones = split_by_counts(carried_stones, droppings)
+
+        # Validate every field stones are dropped on before changing anything
+        drop_reach = len(droppings)  # number of fields stones will be dropped on
+        drop_stacks = self.get_stacks(x, y, move.direction, drop_reach)
+        for stack, stones in zip(drop_stacks, dropped_stones):
+            top_stone = stack[-1] if len(stack) > 0 else None
+            dropping_capstone_only = stones[0].type == StoneType.CAPSTONE
+            if top_stone and top_stone.type == StoneType.CAPSTONE:
+                raise InvalidMoveError(f"Can't drop stones on a {top_stone.type}")
+            if top_stone and top_stone.type == StoneType.STANDING and not dropping_capstone_only:
+                raise InvalidMoveError("Standing stones can only be flattened with a capstone alone")
+
+        start_index = x + y * self.board_size
+        self._count_stack(start_stack, -1)
+        del start_stack[-pickup:]
+        for height, stone in enumerate(carried_stones, len(start_stack)):
+            self.hash ^= self.zobrist.stone(start_index, height, stone)
+        self._count_stack(start_stack, 1)
+
+        drop_fields = [apply_direction(x, y, move.direction, i + 1) for i in range(drop_reach)]
+        drop_indices = [drop_x + drop_y * self.board_size for drop_x, drop_y in drop_fields]
+        for index, stack, stones in zip(drop_indices, drop_stacks, dropped_stones):
+            self._count_stack(stack, -1)
+            if stack and stack[-1].type == StoneType.STANDING:
+                undo.flattened = stack[-1]
+                stack[-1] = stack[-1].flatten()
+                self.hash ^= self.zobrist.stone(index, len(stack) - 1, undo.flattened) ^ self.zobrist.stone(index, len(stack) - 1, stack[-1])
+            for height, stone in enumerate(stones, len(stack)):
+                self.hash ^= self.zobrist.stone(index, height, stone)
+            stack.extend(stones)
+            self._count_stack(stack, 1)
+
+        undo.start_index = start_index
+        undo.drop_indices = drop_indices
+        undo.droppings = droppings
+        self._update_roads([start_index] + drop_indices)
+
+    def undo_move(self) -> None:
+        """
+          Reverts the last move done with do_move
+        """
+        if not self.history:
+            raise InvalidMoveError("There is no move to undo")
+        undo = self.history.pop()
+
+        if isinstance(undo.move, PlaceStone):
+            x, y = undo.move.get_xy()
+            stone = self.get_stack(x, y).pop()
+            self.player_reserves[undo.player].put_back(stone.type)
+        if isinstance(undo.move, MoveStack):
+            carried_stones: List[Stone] = []
+            for index, count in zip(undo.drop_indices, undo.droppings):
+                stack = self.board[index]
+                carried_stones.extend(stack[-count:])
+                del stack[-count:]
+            if undo.flattened:
+                self.board[undo.drop_indices[-1]][-1] = undo.flattened
+            self.board[undo.start_index].extend(carried_stones)
+
+        self.roads[PlayerType.WHITE].rollback(undo.road_marks[0])
+        self.roads[PlayerType.BLACK].rollback(undo.road_marks[1])
+        self.flat_counts[PlayerType.WHITE], self.flat_counts[PlayerType.BLACK] = undo.flat_counts
+        self.empty_fields = undo.empty_fields
+        self.hash = undo.hash
+        self._next_player = undo.next_player
+        self._initial_moves = undo.initial_moves
+        self.result = None
+        self.ply -= 1
+
+    def generate_moves(self, acting_player: PlayerType) -> List[Move]:
+        """
+          Returns every move acting_player can legally do with do_move. Stack moves always state pickup and droppings explicitly.
+          The moves are the shared ones of the board size's MoveTable.
+        """
+        if acting_player != self.next_player or self.result:
+            return []
+
+        # switch to opponent stones if still in the initial move sequence
+        player = acting_player if not self.initial_moves else get_opponent(acting_player)
+        reserve = self.player_reserves[player]
+
+        stone_types: List[StoneType] = []
+        if reserve.has(StoneType.FLAT):
+            stone_types.append(StoneType.FLAT)
+            if not self.initial_moves:
+                stone_types.append(StoneType.STANDING)
+        if reserve.has(StoneType.CAPSTONE) and not self.initial_moves:
+            stone_types.append(StoneType.CAPSTONE)
+
+        move_table = get_move_table(self.board_size)
+        moves: List[Move] = []
+        for index, stack in enumerate(self.board):
+            x, y = index % self.board_size, index // self.board_size
+
+            if len(stack) == 0:
+                placements = move_table.placements[index]
+                moves.extend(placements[stone_type] for stone_type in stone_types)
+                continue
+
+            top_stone = stack[-1]
+            if self.initial_moves or top_stone.player != player:
+                continue
+
+            max_pickup = min(len(stack), self.board_size)
+            for direction, spreads in move_table.stack_moves[index].items():
+                # Count the fields stones can be dropped on before leaving the board or hitting a standing stone/capstone
+                reach = 0
+                can_flatten = False
+                while True:
+                    tx, ty = apply_direction(x, y, direction, reach + 1)
+                    if tx < 0 or tx >= self.board_size or ty < 0 or ty >= self.board_size:
+                        break
+                    target = self.board[tx + ty * self.board_size]
+                    if target and target[-1].type != StoneType.FLAT:
+                        can_flatten = target[-1].type == StoneType.STANDING and top_stone.type == StoneType.CAPSTONE
+                        break
+                    reach += 1
+
+                for pickup in range(1, max_pickup + 1):
+                    for droppings in drop_sequences(pickup, reach):
+                        moves.append(spreads[droppings])
+                    if not can_flatten:
+                        continue
+                    # The capstone alone flattens the standing stone after all fields in front of it received stones
+                    if reach == 0 and pickup == 1:
+                        moves.append(spreads[(1,)])
+                    for droppings in compositions(pickup - 1, reach) if reach > 0 else ():
+                        moves.append(spreads[droppings + (1,)])
+        return moves
+
+    def perft(self, depth: int) -> int:
+        """
+          Counts the positions reachable in exactly n=depth moves
+        """
+        if depth == 0:
+            return 1
+        moves = self.generate_moves(self.next_player)
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.do_move(self.next_player, move)
+            nodes += self.perft(depth - 1)
+            self.undo_move()
+        return nodes
+
     def draw(self, draw: ImageDraw.ImageDraw, offset: Tuple[int, int] = (0, 0)):
         for iy in range(self.board_size):
             for ix in range(self.board_size):
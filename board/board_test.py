@@ -1,12 +1,15 @@
+import random
+
 import pytest
-from _pytest.fixtures import get_parametrized_fixture_keys
 
 from board.helpers import Stone
 from moves.moves import PlaceStone, parse_move
-from mytypes import InvalidMoveError, ParseMoveError, PlayerType, StoneType
+from moves.movetable import get_move_table
+from mytypes import (GameResult, InvalidMoveError, ParseMoveError, PlayerType,
+                     StoneType, WinType)
 from readconfig.readconfig import BoardConfig, TakConfig
 
-from . import Board
+from . import BitBoard, Board
 
 tak_config = TakConfig({
     3: BoardConfig(33, 3),
@@ -18,18 +21,23 @@ tak_config = TakConfig({
 })
 
 
+@pytest.fixture(params=[Board, BitBoard], ids=["list", "bitboard"])
+def board_type(request):
+    return request.param
+
+
 class TestBoardSize:
     @pytest.mark.parametrize("board_size", [4, 5, 6])
-    def test_valid_board_sizes(self, board_size):
-        assert Board(tak_config, board_size).board_size == board_size
+    def test_valid_board_sizes(self, board_type, board_size):
+        assert board_type(tak_config, board_size).board_size == board_size
 
     @pytest.mark.parametrize("board_size, flats, caps", [
         (4, 44, 4),
         (5, 55, 5),
         (6, 66, 6)]
     )
-    def test_infers_caps_and_flats_from_board_size_and_config(self, board_size, flats, caps):
-        board = Board(tak_config, board_size)
+    def test_infers_caps_and_flats_from_board_size_and_config(self, board_type, board_size, flats, caps):
+        board = board_type(tak_config, board_size)
         assert board.player_reserves[PlayerType.WHITE].flats == flats
         assert board.player_reserves[PlayerType.WHITE].caps == caps
         assert board.player_reserves[PlayerType.BLACK].flats == flats
@@ -38,8 +46,8 @@ class TestBoardSize:
 
 class TestFirstMovesRule:
     @pytest.fixture(autouse=True)
-    def init_board(self):
-        self.board = Board(tak_config, 4)
+    def init_board(self, board_type):
+        self.board = board_type(tak_config, 4)
 
     @pytest.mark.parametrize("player, move", [
         (PlayerType.BLACK, "a1"),  # Black can't move first
@@ -80,8 +88,8 @@ class TestFirstMovesRule:
 
 class TestPlacingIsOnlyAllowedOnEmptyFields:
     @pytest.fixture(autouse=True)
-    def init_board(self):
-        self.board = Board(tak_config, 4)
+    def init_board(self, board_type):
+        self.board = board_type(tak_config, 4)
         self.board.do_move(PlayerType.WHITE, parse_move("b1"))
         self.board.do_move(PlayerType.BLACK, parse_move("a1"))
         self.board.do_move(PlayerType.WHITE, parse_move("Sa2"))
@@ -190,9 +198,9 @@ class TestPlacingIsOnlyAllowedOnEmptyFields:
 
 class TestMovingStacks:
     @pytest.mark.parametrize("board_size", [3, 4, 5, 6, 7, 8])
-    def test_move_more_than_carry_limit_fails(self, board_size):
-        board = Board(tak_config, board_size=board_size)
-        board.get_stack(0, 0).extend([
+    def test_move_more_than_carry_limit_fails(self, board_type, board_size):
+        board = board_type(tak_config, board_size=board_size)
+        board.set_stack(0, 0, [
             Stone(PlayerType.WHITE, StoneType.FLAT),
             Stone(PlayerType.BLACK, StoneType.FLAT),
             Stone(PlayerType.WHITE, StoneType.FLAT),
@@ -207,7 +215,7 @@ class TestMovingStacks:
             board.do_move(PlayerType.WHITE, parse_move(f"{board_size+1}a1>1{board_size}"))
 
     @pytest.mark.parametrize("carry", [1, 2, 3, 4, 5, 6])
-    def test_move_less_than_carry_limit(self, carry):
+    def test_move_less_than_carry_limit(self, board_type, carry):
         stack = [
             Stone(PlayerType.WHITE, StoneType.FLAT),
             Stone(PlayerType.BLACK, StoneType.FLAT),
@@ -217,17 +225,17 @@ class TestMovingStacks:
             Stone(PlayerType.BLACK, StoneType.FLAT),
             Stone(PlayerType.WHITE, StoneType.FLAT),
         ]
-        board = Board(tak_config, board_size=6)
+        board = board_type(tak_config, board_size=6)
         board.initial_moves = False
-        board.get_stack(0, 0).extend(stack)
+        board.set_stack(0, 0, stack)
         board.do_move(PlayerType.WHITE, parse_move(f"{carry}a1>{carry}"))
         assert board.get_stack(0, 0) == stack[:-carry]  # except last n
         assert board.get_stack(1, 0) == stack[-carry:]  # last n
 
-    def test_move_works_as_expected(self):
-        board = Board(tak_config, board_size=6)
+    def test_move_works_as_expected(self, board_type):
+        board = board_type(tak_config, board_size=6)
         board.initial_moves = False
-        board.get_stack(0, 0).extend([
+        board.set_stack(0, 0, [
             Stone(PlayerType.BLACK, StoneType.FLAT),
             Stone(PlayerType.BLACK, StoneType.FLAT),
             Stone(PlayerType.WHITE, StoneType.FLAT),
@@ -236,10 +244,10 @@ class TestMovingStacks:
             Stone(PlayerType.BLACK, StoneType.FLAT),
             Stone(PlayerType.WHITE, StoneType.CAPSTONE),
         ])
-        board.get_stack(0, 1).extend([Stone(PlayerType.BLACK, StoneType.FLAT)])
-        board.get_stack(0, 2).extend([Stone(PlayerType.WHITE, StoneType.FLAT)])
-        board.get_stack(0, 3).extend([Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.BLACK, StoneType.FLAT)])
-        board.get_stack(0, 4).extend([Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.STANDING)])
+        board.set_stack(0, 1, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+        board.set_stack(0, 2, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        board.set_stack(0, 3, [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.BLACK, StoneType.FLAT)])
+        board.set_stack(0, 4, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.STANDING)])
         board.do_move(PlayerType.WHITE, parse_move(f"6a1+2211"))
         assert board.get_stack(0, 0) == [Stone(PlayerType.BLACK, StoneType.FLAT)]
         assert board.get_stack(0, 1) == [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)]
@@ -253,3 +261,359 @@ class TestMovingStacks:
 #  - cant move over caps/standings
 #  - can't move out of board
 # - flattening works
+
+
+def has_road_by_flood_fill(board: Board, player: PlayerType) -> bool:
+    n = board.board_size
+    roads = {(x, y) for y in range(n) for x in range(n) if board._is_road(x + y * n, player)}
+    for starts, is_goal in [
+        ([(0, y) for y in range(n)], lambda x, y: x == n - 1),
+        ([(x, 0) for x in range(n)], lambda x, y: y == n - 1),
+    ]:
+        todo = [field for field in starts if field in roads]
+        seen = set(todo)
+        while todo:
+            x, y = todo.pop()
+            if is_goal(x, y):
+                return True
+            for neighbour in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+                if neighbour in roads and neighbour not in seen:
+                    seen.add(neighbour)
+                    todo.append(neighbour)
+    return False
+
+
+class TestRoads:
+    @pytest.fixture(autouse=True)
+    def init_board(self):
+        self.board = Board(tak_config, 4)
+        self.board.initial_moves = False
+
+    def test_no_result_without_road(self):
+        assert self.board.do_move(PlayerType.WHITE, parse_move("a1")) is None
+        assert self.board.result is None
+
+    def test_placing_the_last_stone_of_a_road_ends_the_game(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("d1")) == GameResult(PlayerType.WHITE, WinType.ROAD)
+        assert self.board.result == GameResult(PlayerType.WHITE, WinType.ROAD)
+
+    def test_no_moves_after_the_game_is_over(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.do_move(PlayerType.WHITE, parse_move("d1"))
+        assert self.board.generate_moves(PlayerType.BLACK) == []
+        with pytest.raises(InvalidMoveError):
+            self.board.do_move(PlayerType.BLACK, parse_move("a4"))
+
+    def test_standing_stones_are_no_road(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("Sd1")) is None
+
+    def test_capstones_are_road(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("Cd1")) == GameResult(PlayerType.WHITE, WinType.ROAD)
+
+    def test_moving_a_stack_away_breaks_the_connection(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.do_move(PlayerType.WHITE, parse_move("b1+"))
+        self.board.do_move(PlayerType.BLACK, parse_move("a4"))
+        assert self.board.do_move(PlayerType.WHITE, parse_move("d1")) is None
+
+    def test_covering_a_stone_breaks_the_connection(self):
+        for x in range(3):
+            self.board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.set_stack(1, 1, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+        self.board.do_move(PlayerType.WHITE, parse_move("a4"))
+        self.board.do_move(PlayerType.BLACK, parse_move("b2-"))
+        assert self.board.do_move(PlayerType.WHITE, parse_move("d1")) is None
+
+    def test_stack_move_can_complete_a_road(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)] * 4)
+        assert self.board.do_move(PlayerType.WHITE, parse_move("3a1+111")) == GameResult(PlayerType.WHITE, WinType.ROAD)
+
+    def test_acting_player_wins_if_both_players_complete_a_road(self):
+        # Moving the white stone from a1 up uncovers a black road on row 1 and completes a white one on row 2
+        self.board.set_stack(0, 0, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)])
+        for x in range(1, 4):
+            self.board.set_stack(x, 0, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+            self.board.set_stack(x, 1, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("1a1+")) == GameResult(PlayerType.WHITE, WinType.ROAD)
+        assert self.board.roads[PlayerType.BLACK].has_road
+
+    def test_uncovering_an_opponent_road_loses(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)])
+        for x in range(1, 4):
+            self.board.set_stack(x, 0, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("1a1+")) == GameResult(PlayerType.BLACK, WinType.ROAD)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_incremental_roads_match_flood_fill(self, seed: int):
+        rng = random.Random(seed)
+        board = Board(tak_config, rng.choice([3, 4, 5]))
+        while not board.result:
+            moves = board.generate_moves(board.next_player)
+            if not moves:
+                break
+            board.do_move(board.next_player, rng.choice(moves))
+            for player in [PlayerType.WHITE, PlayerType.BLACK]:
+                assert board.roads[player].has_road == has_road_by_flood_fill(board, player)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_generated_moves_are_the_shared_ones(self, seed: int):
+        rng = random.Random(seed)
+        board = Board(tak_config, 5)
+        move_table = get_move_table(5)
+        while not board.result and board.ply < 60:
+            moves = board.generate_moves(board.next_player)
+            assert all(move_table.tokens[move.to_ptn()] is move for move in moves)
+            board.do_move(board.next_player, rng.choice(moves))
+
+
+class TestEndOfGame:
+    @pytest.fixture(autouse=True)
+    def init_board(self, board_type):
+        self.board = board_type(TakConfig({3: BoardConfig(5, 0)}), 3)
+        self.board.initial_moves = False
+
+    def test_counters_of_empty_board(self):
+        assert self.board.empty_fields == 9
+        assert self.board.flat_counts == {PlayerType.WHITE: 0, PlayerType.BLACK: 0}
+
+    def test_counters_follow_placements(self):
+        self.board.do_move(PlayerType.WHITE, parse_move("a1"))
+        self.board.do_move(PlayerType.BLACK, parse_move("Sb1"))
+        assert self.board.empty_fields == 7
+        assert self.board.flat_counts == {PlayerType.WHITE: 1, PlayerType.BLACK: 0}
+
+    def test_counters_follow_stack_moves(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+        self.board.do_move(PlayerType.WHITE, parse_move("2a1>11"))
+        assert self.board.empty_fields == 7
+        assert self.board.flat_counts == {PlayerType.WHITE: 1, PlayerType.BLACK: 1}
+
+    def test_flattening_counts_as_flat_once_covered(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)])
+        self.board.set_stack(1, 0, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+        self.board.do_move(PlayerType.WHITE, parse_move("1a1>"))
+        assert self.board.flat_counts == {PlayerType.WHITE: 1, PlayerType.BLACK: 0}
+        assert self.board.get_stack(1, 0) == [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)]
+
+    def test_full_board_is_won_by_flats(self):
+        # W B B / B W S / B S _
+        for (x, y), stone in {
+            (0, 2): Stone(PlayerType.WHITE, StoneType.FLAT), (1, 2): Stone(PlayerType.BLACK, StoneType.FLAT), (2, 2): Stone(PlayerType.BLACK, StoneType.FLAT),
+            (0, 1): Stone(PlayerType.BLACK, StoneType.FLAT), (1, 1): Stone(PlayerType.WHITE, StoneType.FLAT), (2, 1): Stone(PlayerType.BLACK, StoneType.STANDING),
+            (0, 0): Stone(PlayerType.BLACK, StoneType.FLAT), (1, 0): Stone(PlayerType.WHITE, StoneType.STANDING),
+        }.items():
+            self.board.set_stack(x, y, [stone])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("Sc1")) == GameResult(PlayerType.BLACK, WinType.FLAT)
+        assert self.board.empty_fields == 0
+
+    def test_full_board_with_equal_flats_is_a_draw(self):
+        for (x, y), stone in {
+            (0, 2): Stone(PlayerType.WHITE, StoneType.FLAT), (1, 2): Stone(PlayerType.BLACK, StoneType.FLAT), (2, 2): Stone(PlayerType.WHITE, StoneType.STANDING),
+            (0, 1): Stone(PlayerType.BLACK, StoneType.FLAT), (1, 1): Stone(PlayerType.WHITE, StoneType.FLAT), (2, 1): Stone(PlayerType.BLACK, StoneType.STANDING),
+            (0, 0): Stone(PlayerType.BLACK, StoneType.STANDING), (1, 0): Stone(PlayerType.WHITE, StoneType.STANDING),
+        }.items():
+            self.board.set_stack(x, y, [stone])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("Sc1")) == GameResult(None, WinType.FLAT)
+
+    def test_placing_the_last_piece_ends_the_game(self):
+        self.board.player_reserves[PlayerType.WHITE].flats = 1
+        self.board.set_stack(2, 2, [Stone(PlayerType.BLACK, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("a1")) == GameResult(None, WinType.FLAT)
+
+    def test_road_beats_flats(self):
+        self.board.player_reserves[PlayerType.WHITE].flats = 1
+        self.board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.set_stack(1, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        assert self.board.do_move(PlayerType.WHITE, parse_move("c1")) == GameResult(PlayerType.WHITE, WinType.ROAD)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_counters_match_a_scan_of_the_board(self, seed: int):
+        rng = random.Random(seed)
+        board = Board(tak_config, rng.choice([3, 4, 5]))
+        while not board.result:
+            board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+            tops = [stack[-1] for stack in board.board if stack]
+            assert board.empty_fields == len(board.board) - len(tops)
+            for player in [PlayerType.WHITE, PlayerType.BLACK]:
+                assert board.flat_counts[player] == sum(1 for top in tops if top.player == player and top.type == StoneType.FLAT)
+
+
+class TestZobristHash:
+    def test_equal_positions_have_equal_hashes(self, board_type):
+        board_a = board_type(tak_config, 5)
+        board_b = board_type(tak_config, 5)
+        for move in ["a1", "e5", "b1", "d5", "c1", "c5"]:
+            board_a.do_move(board_a.next_player, parse_move(move))
+        for move in ["a1", "e5", "c1", "c5", "b1", "d5"]:
+            board_b.do_move(board_b.next_player, parse_move(move))
+        assert board_a.hash == board_b.hash
+
+    def test_hash_depends_on_side_to_move(self, board_type):
+        board = board_type(tak_config, 5)
+        empty_hash = board.hash
+        board.next_player = PlayerType.BLACK
+        assert board.hash != empty_hash
+        board.next_player = PlayerType.WHITE
+        assert board.hash == empty_hash
+
+    def test_hash_depends_on_stone_type(self, board_type):
+        hashes = set()
+        for stone_type in StoneType:
+            board = board_type(tak_config, 5)
+            board.initial_moves = False
+            board.do_move(PlayerType.WHITE, PlaceStone("c", "3", stone_type))
+            hashes.add(board.hash)
+        assert len(hashes) == 3
+
+    def test_hash_is_stable_between_boards(self):
+        assert Board(tak_config, 6).hash == Board(tak_config, 6).hash
+        assert Board(tak_config, 5).hash != Board(tak_config, 6).hash
+
+    def test_copy_keeps_hash(self):
+        board = Board(tak_config, 5)
+        board.do_move(PlayerType.WHITE, parse_move("a1"))
+        assert board.copy().hash == board.hash
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_incremental_hash_matches_full_hash(self, seed: int):
+        rng = random.Random(seed)
+        board = Board(tak_config, rng.choice([3, 4, 5, 6]))
+        while not board.result:
+            board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+            assert board.hash == board._compute_hash()
+
+    def test_stacks_hash_ignores_turn_and_reserves(self):
+        board = Board(tak_config, 5)
+        empty_hash = board.get_stacks_hash()
+        board.do_move(PlayerType.WHITE, parse_move("a1"))
+        assert board.get_stacks_hash() != empty_hash
+
+        board.set_stack(0, 0, [])
+        assert board.get_stacks_hash() == empty_hash
+        assert board.hash != Board(tak_config, 5).hash
+
+
+class TestInvalidMovesChangeNothing:
+    @pytest.fixture(autouse=True)
+    def init_board(self, board_type):
+        self.board = board_type(tak_config, 5)
+        self.board.initial_moves = False
+        self.board.set_stack(0, 0, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT)])
+        self.board.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.CAPSTONE)])
+        self.board.set_stack(0, 2, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+
+    @pytest.mark.parametrize("move", [
+        "3a1>111",  # drops onto the capstone on c1
+        "2a1+11",  # flattening without a capstone
+        "3a1<",  # off the board
+        "3a1-12",  # off the board
+        "3a1>12",  # capstone after dropping on b1
+    ])
+    def test_stacks_are_unchanged(self, move: str):
+        before = [self.board.get_stack(x, y) for y in range(5) for x in range(5)]
+        before = [list(stack) for stack in before]
+        hash_before = self.board.hash
+        with pytest.raises(InvalidMoveError):
+            self.board.do_move(PlayerType.WHITE, parse_move(move))
+        assert [self.board.get_stack(x, y) for y in range(5) for x in range(5)] == before
+        assert self.board.next_player == PlayerType.WHITE
+        assert self.board.hash == hash_before
+
+    def test_placing_from_an_empty_reserve_changes_nothing(self):
+        self.board.player_reserves[PlayerType.WHITE].caps = 0
+        hash_before = self.board.hash
+        with pytest.raises(InvalidMoveError):
+            self.board.do_move(PlayerType.WHITE, parse_move("Cb2"))
+        assert self.board.get_stack(1, 1) == []
+        assert self.board.hash == hash_before
+
+
+class TestUndo:
+    def test_undo_without_moves_fails(self, board_type):
+        with pytest.raises(InvalidMoveError):
+            board_type(tak_config, 4).undo_move()
+
+    def test_undo_placement(self, board_type):
+        board = board_type(tak_config, 4)
+        board.do_move(PlayerType.WHITE, parse_move("a1"))
+        board.undo_move()
+        assert board.get_stack(0, 0) == []
+        assert board.player_reserves[PlayerType.BLACK].flats == 44
+        assert board.next_player == PlayerType.WHITE
+        assert board.initial_moves
+        assert board.hash == board_type(tak_config, 4).hash
+
+    def test_undo_flattening(self, board_type):
+        board = board_type(tak_config, 5)
+        board.initial_moves = False
+        board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)])
+        board.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+        board.do_move(PlayerType.WHITE, parse_move("2a1>11"))
+        board.undo_move()
+        assert board.get_stack(0, 0) == [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)]
+        assert board.get_stack(1, 0) == []
+        assert board.get_stack(2, 0) == [Stone(PlayerType.BLACK, StoneType.STANDING)]
+
+    def test_undo_ends_game_over(self):
+        board = Board(tak_config, 4)
+        board.initial_moves = False
+        for x in range(3):
+            board.set_stack(x, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        board.do_move(PlayerType.WHITE, parse_move("d1"))
+        board.undo_move()
+        assert board.result is None
+        assert not board.roads[PlayerType.WHITE].has_road
+        board.do_move(PlayerType.WHITE, parse_move("d2"))
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_undoing_a_game_restores_every_position(self, seed: int):
+        rng = random.Random(seed)
+        board = Board(tak_config, rng.choice([3, 4, 5, 6]))
+        positions = []
+        while not board.result:
+            positions.append(board.copy())
+            board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+        while positions:
+            board.undo_move()
+            expected = positions.pop()
+            assert board.board == expected.board
+            assert board.hash == expected.hash
+            assert board.flat_counts == expected.flat_counts
+            assert board.empty_fields == expected.empty_fields
+            assert board.next_player == expected.next_player
+            assert board.initial_moves == expected.initial_moves
+            for player in [PlayerType.WHITE, PlayerType.BLACK]:
+                assert board.roads[player].has_road == expected.roads[player].has_road
+                assert [board.roads[player].contains(index) for index in range(len(board.board))] == \
+                    [expected.roads[player].contains(index) for index in range(len(board.board))]
+                assert board.player_reserves[player].flats == expected.player_reserves[player].flats
+                assert board.player_reserves[player].caps == expected.player_reserves[player].caps
+
+    def test_discarded_history_keeps_no_undo_records(self):
+        board = Board(tak_config, 5)
+        board.do_move(PlayerType.WHITE, parse_move("a1"))
+        board.discard_history()
+        board.do_move(PlayerType.BLACK, parse_move("b1"))
+        board.do_move(PlayerType.WHITE, parse_move("c1"))
+        assert board.history == []
+        assert all(tracker.journal is None for tracker in board.roads.values())
+        with pytest.raises(InvalidMoveError):
+            board.undo_move()
+
+    def test_copy_of_a_board_without_history_can_undo(self):
+        board = Board(tak_config, 5)
+        board.discard_history()
+        board.do_move(PlayerType.WHITE, parse_move("a1"))
+        copy = board.copy()
+        copy.do_move(PlayerType.BLACK, parse_move("b1"))
+        copy.undo_move()
+        assert copy.hash == board.hash
@@ -1,2 +1,3 @@
 from .piecereserve import PieceReserve
+from .roads import RoadTracker
 from .stone import Stone
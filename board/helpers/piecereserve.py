@@ -5,6 +5,8 @@ from mytypes import InvalidMoveError, PlayerType, StoneType
 
 
 class PieceReserve():
+    __slots__ = ("flats", "caps", "player")
+
     def __init__(self, player: PlayerType, flats: int, caps: int):
         if flats < 1:
             raise ValueError(f"Player must start with a positive number of flats, but was given '{flats}'")
@@ -21,6 +23,9 @@ class PieceReserve():
             return self.flats > 0
         raise ValueError(f"Cannot play unknown stone of type '{stone_type}'")
 
+    def is_empty(self) -> bool:
+        return self.flats == 0 and self.caps == 0
+
     def take(self, stone_type: StoneType) -> Stone:
         if not self.has(stone_type):
             raise InvalidMoveError(f"Player '{self.player}' does not have sufficient pieces")
@@ -30,4 +35,12 @@ class PieceReserve():
         elif stone_type == StoneType.FLAT or stone_type == StoneType.STANDING:
             self.flats -= 1
 
-        return Stone(player=self.player, stone_type=stone_type)
+        return Stone(self.player, stone_type)
+
+    def put_back(self, stone_type: StoneType) -> None:
+        if stone_type == StoneType.CAPSTONE:
+            self.caps += 1
+        elif stone_type == StoneType.FLAT or stone_type == StoneType.STANDING:
+            self.flats += 1
+        else:
+            raise ValueError(f"Cannot put back unknown stone of type '{stone_type}'")
@@ -68,3 +68,19 @@ class TestGivenNoCapsButFlats:
         flats_count = self.reserve.flats
         self.reserve.take(StoneType.STANDING)
         assert self.reserve.flats == flats_count - 1
+
+
+def test_is_empty_once_all_pieces_are_taken():
+    reserve = PieceReserve(PlayerType.WHITE, flats=1, caps=1)
+    reserve.take(StoneType.FLAT)
+    assert not reserve.is_empty()
+    reserve.take(StoneType.CAPSTONE)
+    assert reserve.is_empty()
+
+
+@pytest.mark.parametrize("stone_type", [StoneType.FLAT, StoneType.STANDING, StoneType.CAPSTONE])
+def test_put_back_reverts_take(stone_type):
+    reserve = PieceReserve(PlayerType.WHITE, flats=3, caps=1)
+    reserve.take(stone_type)
+    reserve.put_back(stone_type)
+    assert reserve.flats == 3 and reserve.caps == 1
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+# Bits of the edge mask of a connected group
+NORTH = 1
+SOUTH = 2
+WEST = 4
+EAST = 8
+
+
+class RoadTracker():
+    """
+    Union-find over the road-eligible fields (flats and capstones on top) of one player.
+
+    Every group remembers which board edges it touches, so a road exists as soon as one group touches two opposite edges.
+    Union-find can only add fields. When fields stop being part of the player's roads, remove() rebuilds only the groups
+    that contained them, since those may have split.
+
+    With a journal every change records the overwritten entries, so that rollback() can undo changes back to a mark().
+    That keeps undoing a move proportional to what the move changed instead of copying the whole tracker.
+    """
+    __slots__ = ("board_size", "parent", "edges", "has_road", "journal")
+
+    def __init__(self, board_size: int, journal: bool = False):
+        self.board_size = board_size
+        self.parent: List[int] = [-1] * (board_size * board_size)  # -1 for fields without a road stone
+        self.edges: List[int] = [0] * (board_size * board_size)  # only valid for roots
+        self.has_road = False
+        self.journal: Optional[List[int]] = [] if journal else None  # index, parent and edges before each change
+
+    def copy(self) -> RoadTracker:
+        """
+          The copy has no journal, it can't roll back changes of the original
+        """
+        tracker = RoadTracker.__new__(RoadTracker)
+        tracker.board_size = self.board_size
+        tracker.parent = list(self.parent)
+        tracker.edges = list(self.edges)
+        tracker.has_road = self.has_road
+        tracker.journal = None
+        return tracker
+
+    def _set(self, index: int, parent: int, edges: int) -> None:
+        if self.journal is not None:
+            self.journal += (index, self.parent[index], self.edges[index])
+        self.parent[index] = parent
+        self.edges[index] = edges
+
+    def mark(self) -> Tuple[int, bool]:
+        return len(self.journal) if self.journal is not None else 0, self.has_road
+
+    def rollback(self, mark: Tuple[int, bool]) -> None:
+        """
+          Reverts all changes since mark() returned mark
+        """
+        if self.journal is None:
+            raise ValueError("The tracker has no journal to roll back")
+        length, self.has_road = mark
+        journal = self.journal
+        while len(journal) > length:
+            edges, parent, index = journal.pop(), journal.pop(), journal.pop()
+            self.parent[index] = parent
+            self.edges[index] = edges
+
+    def start_journal(self) -> None:
+        if self.journal is None:
+            self.journal = []
+
+    def stop_journal(self) -> None:
+        self.journal = None
+
+    def contains(self, index: int) -> bool:
+        return self.parent[index] != -1
+
+    def _find(self, index: int) -> int:
+        root = index
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[index] != root:  # path compression
+            next_index = self.parent[index]
+            self._set(index, root, self.edges[index])
+            index = next_index
+        return root
+
+    def _union(self, a: int, b: int) -> None:
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        self._set(root_b, root_a, self.edges[root_b])
+        self._set(root_a, root_a, self.edges[root_a] | self.edges[root_b])
+        if self._is_road_edges(self.edges[root_a]):
+            self.has_road = True
+
+    def _get_edges(self, index: int) -> int:
+        x, y = index % self.board_size, index // self.board_size
+        edges = 0
+        if y == self.board_size - 1:
+            edges |= NORTH
+        if y == 0:
+            edges |= SOUTH
+        if x == 0:
+            edges |= WEST
+        if x == self.board_size - 1:
+            edges |= EAST
+        return edges
+
+    def add(self, index: int) -> None:
+        if self.contains(index):
+            return
+        self._set(index, index, self._get_edges(index))
+
+        x, y = index % self.board_size, index // self.board_size
+        if x > 0 and self.contains(index - 1):
+            self._union(index, index - 1)
+        if x < self.board_size - 1 and self.contains(index + 1):
+            self._union(index, index + 1)
+        if y > 0 and self.contains(index - self.board_size):
+            self._union(index, index - self.board_size)
+        if y < self.board_size - 1 and self.contains(index + self.board_size):
+            self._union(index, index + self.board_size)
+
+    def _is_road_edges(self, edges: int) -> bool:
+        return bool((edges & NORTH and edges & SOUTH) or (edges & WEST and edges & EAST))
+
+    def remove(self, indices: Iterable[int]) -> None:
+        """
+          Removes the fields. The groups that contained them are collected with a flood fill and added again without them,
+          the other groups are untouched.
+        """
+        removed = {index for index in indices if self.contains(index)}
+        if not removed:
+            return
+        size = self.board_size
+        members = set(removed)
+        pending = list(removed)
+        while pending:
+            index = pending.pop()
+            x, y = index % size, index // size
+            for neighbour, on_board in ((index - 1, x > 0), (index + 1, x < size - 1), (index - size, y > 0), (index + size, y < size - 1)):
+                if on_board and neighbour not in members and self.contains(neighbour):
+                    members.add(neighbour)
+                    pending.append(neighbour)
+
+        for index in members:
+            self._set(index, -1, 0)
+        if self.has_road:
+            # Another group may still have a road, only roots have valid edges
+            self.has_road = any(parent == index and self._is_road_edges(self.edges[index]) for index, parent in enumerate(self.parent))
+        for index in members - removed:
+            self.add(index)
+
+    def rebuild(self, indices: Iterable[int]) -> None:
+        """
+          Resets the tracker to contain exactly the given fields
+        """
+        for index in range(self.board_size * self.board_size):
+            if self.parent[index] != -1:
+                self._set(index, -1, 0)
+        self.has_road = False
+        for index in indices:
+            self.add(index)
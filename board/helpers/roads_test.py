@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from . import RoadTracker
+
+
+def indices(board_size, *fields):
+    return [x + y * board_size for x, y in fields]
+
+
+def test_empty_tracker_has_no_road():
+    assert not RoadTracker(5).has_road
+
+
+@pytest.mark.parametrize("fields", [
+    [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)],  # west to east along the edge
+    [(2, 0), (2, 1), (2, 2), (2, 3), (2, 4)],  # south to north
+    [(0, 2), (1, 2), (1, 1), (2, 1), (3, 1), (3, 2), (4, 2)],  # winding
+])
+def test_detects_roads(fields):
+    tracker = RoadTracker(5)
+    for index in indices(5, *fields):
+        tracker.add(index)
+    assert tracker.has_road
+
+
+def test_road_is_detected_by_the_field_connecting_two_groups():
+    tracker = RoadTracker(4)
+    for index in indices(4, (0, 1), (1, 1), (3, 1)):
+        tracker.add(index)
+    assert not tracker.has_road
+    tracker.add(indices(4, (2, 1))[0])
+    assert tracker.has_road
+
+
+def test_diagonals_are_not_connected():
+    tracker = RoadTracker(3)
+    for index in indices(3, (0, 0), (1, 1), (2, 2)):
+        tracker.add(index)
+    assert not tracker.has_road
+
+
+def test_touching_adjacent_edges_is_no_road():
+    tracker = RoadTracker(3)
+    for index in indices(3, (0, 0), (0, 1), (1, 1)):  # south and west only
+        tracker.add(index)
+    assert not tracker.has_road
+
+
+def test_rebuild_removes_fields():
+    tracker = RoadTracker(3)
+    for index in indices(3, (0, 0), (1, 0), (2, 0)):
+        tracker.add(index)
+    tracker.rebuild(indices(3, (0, 0), (2, 0)))
+    assert not tracker.has_road
+    assert not tracker.contains(indices(3, (1, 0))[0])
+
+
+def test_copy_is_independent():
+    tracker = RoadTracker(3)
+    tracker.add(0)
+    copy = tracker.copy()
+    copy.add(1)
+    copy.add(2)
+    assert copy.has_road and not tracker.has_road
+    assert not tracker.contains(1)
+
+
+def test_remove_splits_the_group():
+    tracker = RoadTracker(3)
+    for index in indices(3, (0, 1), (1, 1), (2, 1)):
+        tracker.add(index)
+    assert tracker.has_road
+    tracker.remove(indices(3, (1, 1)))
+    assert not tracker.has_road
+    assert tracker.contains(indices(3, (0, 1))[0]) and not tracker.contains(indices(3, (1, 1))[0])
+    tracker.add(indices(3, (1, 1))[0])
+    assert tracker.has_road
+
+
+def test_remove_keeps_the_road_of_another_group():
+    tracker = RoadTracker(3)
+    for index in indices(3, (0, 0), (1, 0), (2, 0), (0, 2)):
+        tracker.add(index)
+    tracker.remove(indices(3, (0, 2)))
+    assert tracker.has_road
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_remove_matches_rebuild(seed: int):
+    rng = random.Random(seed)
+    fields = set()
+    tracker = RoadTracker(5)
+    for _ in range(200):
+        index = rng.randrange(25)
+        if index in fields and rng.random() < 0.5:
+            removed = {index} | {other for other in fields if rng.random() < 0.1}
+            fields -= removed
+            tracker.remove(removed)
+        else:
+            fields.add(index)
+            tracker.add(index)
+        expected = RoadTracker(5)
+        expected.rebuild(sorted(fields))
+        assert tracker.has_road == expected.has_road
+        assert all(tracker.contains(field) == (field in fields) for field in range(25))
+
+
+def test_rollback_reverts_to_the_mark():
+    tracker = RoadTracker(3, journal=True)
+    tracker.add(0)
+    mark = tracker.mark()
+    tracker.add(1)
+    tracker.add(2)
+    assert tracker.has_road
+    tracker.remove([0])
+    tracker.rollback(mark)
+    assert not tracker.has_road
+    assert tracker.contains(0) and not tracker.contains(1) and not tracker.contains(2)
+    tracker.add(1)
+    tracker.add(2)
+    assert tracker.has_road
@@ -8,9 +8,31 @@ from mytypes import InvalidMoveError, PlayerType, StoneType
 
 
 class Stone():
-    def __init__(self, player: PlayerType, stone_type: StoneType):
-        self.player = player
-        self.type = stone_type
+    """
+    Immutable and interned: there are only six different stones, Stone(player, stone_type) always returns the same instance for them.
+    So placing or flattening a stone allocates nothing and stacks only hold references to these six.
+    """
+    __slots__ = ("player", "type")
+    instances: Dict[Tuple[PlayerType, StoneType], Stone] = {}
+
+    player: PlayerType
+    type: StoneType
+
+    def __new__(cls, player: PlayerType, stone_type: StoneType) -> Stone:
+        stone = cls.instances.get((player, stone_type))
+        if stone is None:
+            stone = super().__new__(cls)
+            object.__setattr__(stone, "player", player)
+            object.__setattr__(stone, "type", stone_type)
+            cls.instances[(player, stone_type)] = stone
+        return stone
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Stones are immutable, cannot set '{name}'")
+
+    def __reduce__(self):
+        # Unpickles to the interned instance, the default would call __new__ without arguments
+        return Stone, (self.player, self.type)
 
     def draw(self, draw: ImageDraw.ImageDraw, offset: Tuple[int, int], colors: Dict[PlayerType, Tuple[int, int]], stone_width: int):
         fill, outline = colors[self.player]
@@ -32,9 +54,12 @@ class Stone():
         return Stone(self.player, StoneType.FLAT)
 
     def __eq__(self, other):
-        return isinstance(other, Stone)\
+        return self is other or isinstance(other, Stone)\
             and self.player == other.player\
             and self.type == other.type
 
+    def __hash__(self):
+        return hash((self.player, self.type))
+
     def __repr__(self):
         return f"[{self.player.name} {self.type.name}]"
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from mytypes import InvalidMoveError, PlayerType, StoneType
@@ -33,3 +35,20 @@ def test_not_eq():
     assert Stone(PlayerType.WHITE, StoneType.STANDING) != Stone(PlayerType.WHITE, StoneType.FLAT)
     assert Stone(PlayerType.WHITE, StoneType.STANDING) != Stone(PlayerType.WHITE, StoneType.CAPSTONE)
     assert Stone(PlayerType.WHITE, StoneType.FLAT) != Stone(PlayerType.WHITE, StoneType.CAPSTONE)
+
+
+def test_stones_are_interned():
+    assert Stone(PlayerType.BLACK, StoneType.STANDING) is Stone(PlayerType.BLACK, StoneType.STANDING)
+    assert Stone(PlayerType.BLACK, StoneType.STANDING).flatten() is Stone(PlayerType.BLACK, StoneType.FLAT)
+
+
+def test_stones_are_immutable():
+    stone = Stone(PlayerType.WHITE, StoneType.FLAT)
+    with pytest.raises(AttributeError):
+        stone.player = PlayerType.BLACK
+    assert Stone(PlayerType.WHITE, StoneType.FLAT).player == PlayerType.WHITE
+
+
+def test_unpickled_stone_is_the_interned_one():
+    stone = Stone(PlayerType.WHITE, StoneType.CAPSTONE)
+    assert pickle.loads(pickle.dumps(stone)) is stone
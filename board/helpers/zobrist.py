@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, List, Tuple
+
+from board.helpers.stone import Stone
+from mytypes import PlayerType, StoneType
+
+
+def derive_key(*parts) -> int:
+    """
+      Derives a random looking 64 bit key from parts. Keys are stable between runs and processes, unlike hash().
+    """
+    return int.from_bytes(blake2b(repr(parts).encode(), digest_size=8).digest(), "little")
+
+
+class ZobristKeys():
+    """
+    Keys for Zobrist hashing positions of one board size.
+
+    A position's hash is the XOR of the keys of every stone (by field, height and player), the type of every top stone
+    that isn't flat (only the top stone can be standing or a capstone), both players' reserves, the side to move and
+    whether the game is still in the initial moves.
+    """
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.black_to_move = derive_key(board_size, "black to move")
+        self.initial_moves = derive_key(board_size, "initial moves")
+        self.top_types: List[Dict[StoneType, int]] = [
+            {stone_type: derive_key(board_size, "top", index, stone_type.value) for stone_type in [StoneType.STANDING, StoneType.CAPSTONE]}
+            for index in range(board_size * board_size)
+        ]
+        self.stones: List[Dict[PlayerType, int]] = []  # index = height * fields + field, extended on demand for taller stacks
+        self.reserves: Dict[Tuple[PlayerType, StoneType, int], int] = {}
+
+    def stone(self, index: int, height: int, stone: Stone) -> int:
+        fields = self.board_size * self.board_size
+        while len(self.stones) <= height * fields + index:
+            key_index = len(self.stones)
+            self.stones.append({player: derive_key(self.board_size, "stone", key_index, player.value) for player in PlayerType})
+
+        key = self.stones[height * fields + index][stone.player]
+        if stone.type != StoneType.FLAT:
+            key ^= self.top_types[index][stone.type]
+        return key
+
+    def reserve(self, player: PlayerType, flats: int, caps: int) -> int:
+        flats_key = self.reserves.get((player, StoneType.FLAT, flats))
+        if flats_key is None:
+            flats_key = self.reserves[(player, StoneType.FLAT, flats)] = derive_key(self.board_size, "flats", player.value, flats)
+        caps_key = self.reserves.get((player, StoneType.CAPSTONE, caps))
+        if caps_key is None:
+            caps_key = self.reserves[(player, StoneType.CAPSTONE, caps)] = derive_key(self.board_size, "caps", player.value, caps)
+        return flats_key ^ caps_key
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(board_size: int) -> ZobristKeys:
+    return ZobristKeys(board_size)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+from readconfig import Config
+
+from .board import Board
+
+# Number of positions after n moves from the empty board, using the standard piece counts of botsettings.json
+REFERENCE_COUNTS = {
+    3: [1, 9, 72, 1200, 17792],
+    4: [1, 16, 240, 7440, 216464],
+    5: [1, 25, 600, 43320, 2999784],
+    6: [1, 36, 1260, 132720, 13586048],
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts the positions reachable from the empty board and reports nodes/second")
+    parser.add_argument("board_size", type=int)
+    parser.add_argument("depth", type=int)
+    parser.add_argument("--config", default="botsettings.json")
+    args = parser.parse_args()
+
+    board = Board(Config.load(args.config).tak, args.board_size)
+    for depth in range(1, args.depth + 1):
+        start = time.perf_counter()
+        nodes = board.perft(depth)
+        elapsed = time.perf_counter() - start
+
+        expected = REFERENCE_COUNTS.get(args.board_size, [])
+        check = "" if depth >= len(expected) else (" ok" if expected[depth] == nodes else f" MISMATCH expected {expected[depth]}")
+        print(f"perft({depth}) = {nodes} in {elapsed:.3f}s ({nodes / max(elapsed, 1e-9):.0f} nodes/s){check}")
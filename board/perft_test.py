@@ -0,0 +1,78 @@
+import pytest
+
+from board.helpers import Stone
+from moves.moves import MoveStack, PlaceStone
+from mytypes import Direction, PlayerType, StoneType
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from . import Board
+from .perft import REFERENCE_COUNTS
+
+# Standard piece counts, the reference counts depend on them
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    4: BoardConfig(15, 0),
+    5: BoardConfig(21, 1),
+    6: BoardConfig(30, 1),
+})
+
+
+@pytest.mark.parametrize("board_size, depth", [
+    (3, 1), (3, 2), (3, 3), (3, 4),
+    (4, 1), (4, 2), (4, 3),
+    (5, 1), (5, 2), (5, 3),
+    (6, 1), (6, 2), (6, 3),
+])
+def test_perft_matches_reference_counts(board_size: int, depth: int):
+    assert Board(tak_config, board_size).perft(depth) == REFERENCE_COUNTS[board_size][depth]
+
+
+def test_generate_moves_is_empty_for_the_waiting_player():
+    assert Board(tak_config, 4).generate_moves(PlayerType.BLACK) == []
+
+
+def test_first_moves_are_flats_only():
+    board = Board(tak_config, 5)
+    assert all(isinstance(move, PlaceStone) and move.stoneType == StoneType.FLAT for move in board.generate_moves(PlayerType.WHITE))
+
+
+class TestStackMoves:
+    @pytest.fixture(autouse=True)
+    def init_board(self):
+        self.board = Board(tak_config, 5)
+        self.board.initial_moves = False
+
+    def stack_moves(self):
+        return [move for move in self.board.generate_moves(self.board.next_player) if isinstance(move, MoveStack)]
+
+    def test_respects_carry_limit(self):
+        self.board.set_stack(2, 2, [Stone(PlayerType.WHITE, StoneType.FLAT)] * 7)
+        assert max(move.pickup or 0 for move in self.stack_moves()) == 5
+
+    def test_stops_at_capstones_and_standing_stones(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT)] * 3)
+        self.board.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+        self.board.set_stack(0, 1, [Stone(PlayerType.BLACK, StoneType.CAPSTONE)])
+        assert self.stack_moves() == [
+            MoveStack("a", "1", Direction.RIGHT, 1, [1]),
+            MoveStack("a", "1", Direction.RIGHT, 2, [2]),
+            MoveStack("a", "1", Direction.RIGHT, 3, [3]),
+        ]
+
+    def test_capstone_alone_flattens_standing_stones(self):
+        self.board.set_stack(0, 0, [Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)])
+        self.board.set_stack(2, 0, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+        self.board.set_stack(0, 1, [Stone(PlayerType.BLACK, StoneType.CAPSTONE)])
+        assert self.stack_moves() == [
+            MoveStack("a", "1", Direction.RIGHT, 1, [1]),
+            MoveStack("a", "1", Direction.RIGHT, 2, [2]),
+            MoveStack("a", "1", Direction.RIGHT, 2, [1, 1]),
+        ]
+
+    def test_generated_moves_are_valid(self):
+        self.board.set_stack(1, 1, [Stone(PlayerType.BLACK, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.FLAT), Stone(PlayerType.WHITE, StoneType.CAPSTONE)])
+        self.board.set_stack(1, 3, [Stone(PlayerType.BLACK, StoneType.STANDING)])
+        self.board.set_stack(3, 1, [Stone(PlayerType.WHITE, StoneType.FLAT)])
+        for move in self.board.generate_moves(PlayerType.WHITE):
+            board = self.board.copy()
+            board.do_move(PlayerType.WHITE, move)
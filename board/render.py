@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import time
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, List, Tuple, Union
+
+from PIL import Image, ImageColor, ImageDraw
+
+from mytypes import PlayerType, StoneType
+
+from .board import STONE_WIDTH, TILE_WIDTH, Board
+from .helpers import Stone
+
+VERTICAL_LIFT = 5  # px between two stones of a stack
+STONE_OFFSET = (TILE_WIDTH - STONE_WIDTH) // 2  # px between the border of a field and its stones
+MAX_TILE_HEIGHT = 3  # highest stack that is drawn within its field
+
+StackKey = Tuple[Tuple[PlayerType, StoneType], ...]
+FIELD_COLORS = ["gray", "blue"]  # by parity of x + y
+
+
+class RenderProfile():
+    def __init__(self, palette: bool = False, compress_level: int = 6, optimize: bool = False):
+        """
+        palette: encode a palette ("P" mode) image instead of RGB. Boards only have a handful of colors, so nothing is lost.
+        compress_level: zlib level of the PNG from 0 (none, fastest) to 9 (smallest)
+        optimize: let PIL search for the smallest encoding, slow
+        """
+        if compress_level not in range(0, 10):
+            raise ValueError(f"PNG compress level must be in [0, 9] but was {compress_level}")
+        self.palette = palette
+        self.compress_level = compress_level
+        self.optimize = optimize
+
+    def get_key(self) -> Tuple[bool, int, bool]:
+        return self.palette, self.compress_level, self.optimize
+
+    def __str__(self):
+        return f"[RenderProfile Palette={self.palette} CompressLevel={self.compress_level} Optimize={self.optimize}]"
+
+
+RENDER_PROFILES: Dict[str, RenderProfile] = {
+    "default": RenderProfile(),  # PIL defaults
+    "fast": RenderProfile(palette=True, compress_level=1),
+    "palette": RenderProfile(palette=True),
+    "small": RenderProfile(palette=True, compress_level=9),
+    "smallest": RenderProfile(palette=True, compress_level=9, optimize=True),
+}
+
+
+class BoardSnapshot():
+    """
+    The part of a Board that is needed to draw it. It doesn't change with the board and can be pickled,
+    so it can be rendered in another thread or process while the game goes on.
+    """
+
+    def __init__(self, board: Board):
+        self.board_size = board.board_size
+        self.board: List[List[Stone]] = [list(stack) for stack in board.board]
+        self.colors: Dict[PlayerType, Tuple[int, int]] = dict(board.colors)
+
+
+def to_rgba(color: int) -> Tuple[int, int, int, int]:
+    """
+      Converts a color given as int like in Board.colors (0xBBGGRR as PIL reads it for RGB images) to an opaque RGBA tuple
+    """
+    return color & 0xff, (color >> 8) & 0xff, (color >> 16) & 0xff, 0xff
+
+
+@lru_cache(maxsize=None)
+def get_background(board_size: int) -> Image.Image:
+    """
+      Returns the empty checkerboard. It is shared, so it must be copied before drawing on it.
+    """
+    im = Image.new("RGB", (board_size * TILE_WIDTH, board_size * TILE_WIDTH), "white")
+    draw = ImageDraw.ImageDraw(im)
+    for iy in range(board_size):
+        for ix in range(board_size):
+            color = FIELD_COLORS[(ix + iy) % 2]
+            x = ix * TILE_WIDTH
+            y = (board_size - iy - 1) * TILE_WIDTH  # Rows are numbered from 1-n from the bottom up
+            draw.rectangle([x, y, x + TILE_WIDTH, y + TILE_WIDTH], fill=color, width=0)
+    return im
+
+
+@lru_cache(maxsize=None)
+def get_background_row(board_size: int, iy: int) -> Image.Image:
+    y = (board_size - iy - 1) * TILE_WIDTH
+    return get_background(board_size).crop((0, y, board_size * TILE_WIDTH, y + TILE_WIDTH + 1))
+
+
+@lru_cache(maxsize=None)
+def get_stone_sprite(player: PlayerType, stone_type: StoneType, colors: Tuple[int, int]) -> Image.Image:
+    """
+      Returns the stone drawn on a transparent background
+    """
+    sprite = Image.new("RGBA", (STONE_WIDTH + 1, STONE_WIDTH + 1), (0, 0, 0, 0))
+    fill, outline = colors
+    Stone(player, stone_type).draw(ImageDraw.ImageDraw(sprite), (0, 0), {player: (to_rgba(fill), to_rgba(outline))}, STONE_WIDTH)  # type: ignore
+    return sprite
+
+
+@lru_cache(maxsize=4096)
+def get_stack_sprite(stack: StackKey, white_colors: Tuple[int, int], black_colors: Tuple[int, int]) -> Image.Image:
+    """
+      Returns the whole stack drawn on a transparent background, bottom stone at the bottom.
+      Stones are either fully opaque or fully transparent, so pasting the stack equals pasting its stones one by one.
+    """
+    colors = {PlayerType.WHITE: white_colors, PlayerType.BLACK: black_colors}
+    sprite = Image.new("RGBA", (STONE_WIDTH + 1, STONE_WIDTH + 1 + (len(stack) - 1) * VERTICAL_LIFT), (0, 0, 0, 0))
+    for i, (player, stone_type) in enumerate(stack):
+        stone = get_stone_sprite(player, stone_type, colors[player])
+        sprite.paste(stone, (0, (len(stack) - 1 - i) * VERTICAL_LIFT), stone)
+    return sprite
+
+
+@lru_cache(maxsize=4096)
+def get_tile(board_size: int, parity: int, stack: StackKey, white_colors: Tuple[int, int], black_colors: Tuple[int, int]) -> Image.Image:
+    """
+      Returns the opaque inside of a field including its stack, for stacks that don't reach out of their field.
+      The outermost pixel rows are left out since neighbouring fields overlap them.
+      Fields of the same color (parity of x + y) look the same, so the field a1 or b1 is used.
+    """
+    x, y = parity * TILE_WIDTH, (board_size - 1) * TILE_WIDTH
+    tile = get_background(board_size).crop((x, y + 1, x + TILE_WIDTH, y + TILE_WIDTH))
+    sprite = get_stack_sprite(stack, white_colors, black_colors)
+    tile.paste(sprite, (STONE_OFFSET, get_stack_top(len(stack)) - 1), sprite)
+    return tile
+
+
+def get_stack_top(height: int) -> int:
+    """
+      Returns where the top stone of a stack is drawn, relative to the top of its field
+    """
+    return STONE_OFFSET + height // 2 * VERTICAL_LIFT - (height - 1) * VERTICAL_LIFT
+
+
+def render_board(board: Union[Board, BoardSnapshot]) -> Image.Image:
+    """
+      Draws the same image as Board.draw, but composites a cached background and cached fields/stacks
+      instead of drawing every field and stone.
+    """
+    im = get_background(board.board_size).copy()
+    white_colors, black_colors = board.colors[PlayerType.WHITE], board.colors[PlayerType.BLACK]
+    overflowing_row = False
+    for iy in range(board.board_size):
+        row_y = (board.board_size - iy - 1) * TILE_WIDTH
+        if overflowing_row:
+            # Like Board.draw, the fields of a row cover stones of tall stacks in the row below
+            im.paste(get_background_row(board.board_size, iy), (0, row_y))
+        overflowing_row = False
+        for ix in range(board.board_size):
+            stones = board.board[ix + iy * board.board_size]
+            if not stones:
+                continue
+            stack = tuple((stone.player, stone.type) for stone in stones)
+            if len(stack) <= MAX_TILE_HEIGHT:
+                im.paste(get_tile(board.board_size, (ix + iy) % 2, stack, white_colors, black_colors), (ix * TILE_WIDTH, row_y + 1))
+                continue
+            overflowing_row = True
+            sprite = get_stack_sprite(stack, white_colors, black_colors)
+            im.paste(sprite, (ix * TILE_WIDTH + STONE_OFFSET, row_y + get_stack_top(len(stack))), sprite)
+    return im
+
+
+@lru_cache(maxsize=None)
+def get_palette(white_colors: Tuple[int, int], black_colors: Tuple[int, int]) -> Image.Image:
+    """
+      Returns a palette image with every color a board is drawn with, for Image.quantize
+    """
+    colors = [ImageColor.getrgb(color) for color in FIELD_COLORS + ["white"]] + [to_rgba(color)[:3] for color in white_colors + black_colors]
+    palette = Image.new("P", (1, 1))
+    palette.putpalette([channel for color in colors for channel in color] + [0, 0, 0] * (256 - len(colors)))
+    return palette
+
+
+def encode_image(im: Image.Image, colors: Dict[PlayerType, Tuple[int, int]], profile: RenderProfile) -> bytes:
+    if profile.palette:
+        im = im.quantize(palette=get_palette(colors[PlayerType.WHITE], colors[PlayerType.BLACK]), dither=Image.NONE)
+    with BytesIO() as image_binary:
+        im.save(image_binary, "PNG", compress_level=profile.compress_level, optimize=profile.optimize)
+        return image_binary.getvalue()
+
+
+def encode_png(board: Union[Board, BoardSnapshot], profile: RenderProfile = RENDER_PROFILES["default"]) -> bytes:
+    with render_board(board) as im:
+        return encode_image(im, board.colors, profile)
+
+
+def encode_png_timed(board: Union[Board, BoardSnapshot], profile: RenderProfile = RENDER_PROFILES["default"]) -> Tuple[bytes, float, float]:
+    """
+      Like encode_png, also returns the seconds drawing and encoding took. The render profiles trade one against the other.
+    """
+    start = time.perf_counter()
+    with render_board(board) as im:
+        drawn = time.perf_counter()
+        png = encode_image(im, board.colors, profile)
+    return png, drawn - start, time.perf_counter() - drawn
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Measures encode time and size of board images per board size and render profile")
+    parser.add_argument("--config", default="botsettings.json")
+    parser.add_argument("--moves", type=int, default=60, help="random moves played before measuring")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tak_config = Config.load(args.config).tak
+    print(f"{'size':>4} {'profile':>9} {'ms':>7} {'bytes':>7}")
+    for board_size in sorted(tak_config.boards.keys()):
+        board = Board(tak_config, board_size)
+        rng = random.Random(board_size)
+        for _ in range(args.moves):
+            if board.result:
+                break
+            board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+
+        for name, profile in RENDER_PROFILES.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                png = encode_png(board, profile)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{board_size:>4} {name:>9} {elapsed * 1000:>7.2f} {len(png):>7}")
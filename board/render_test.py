@@ -0,0 +1,79 @@
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from board.helpers import Stone
+from mytypes import PlayerType, StoneType
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from . import Board
+from .render import (RENDER_PROFILES, RenderProfile, encode_png,
+                     get_background, render_board)
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+    8: BoardConfig(50, 2),
+})
+
+
+def draw(board: Board) -> Image.Image:
+    im = Image.new("RGB", board.get_dimensions(), "white")
+    board.draw(ImageDraw.ImageDraw(im))
+    return im
+
+
+def assert_same_image(a: Image.Image, b: Image.Image):
+    assert a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+@pytest.mark.parametrize("board_size", [3, 5, 8])
+def test_empty_board(board_size: int):
+    board = Board(tak_config, board_size)
+    assert_same_image(render_board(board), draw(board))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_games_look_like_board_draw(seed: int):
+    rng = random.Random(seed)
+    board = Board(tak_config, rng.choice([3, 5, 8]))
+    for _ in range(rng.randint(10, 120)):
+        if board.result:
+            break
+        board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+    assert_same_image(render_board(board), draw(board))
+
+
+@pytest.mark.parametrize("height", [1, 2, 3, 4, 5, 9, 15])
+def test_tall_stacks_look_like_board_draw(height: int):
+    board = Board(tak_config, 5)
+    for index in range(25):
+        stones = [Stone(PlayerType.WHITE if (index + i) % 3 else PlayerType.BLACK, StoneType.FLAT) for i in range(height)]
+        stones[-1] = Stone(stones[-1].player, [StoneType.FLAT, StoneType.STANDING, StoneType.CAPSTONE][index % 3])
+        board.set_stack(index % 5, index // 5, stones)
+    assert_same_image(render_board(board), draw(board))
+
+
+def test_rendering_does_not_change_the_cached_background():
+    board = Board(tak_config, 3)
+    board.do_move(PlayerType.WHITE, board.generate_moves(PlayerType.WHITE)[0])
+    render_board(board)
+    assert_same_image(get_background(3), draw(Board(tak_config, 3)))
+
+
+@pytest.mark.parametrize("profile", RENDER_PROFILES.keys())
+def test_profiles_encode_the_same_pixels(profile: str):
+    rng = random.Random(1)
+    board = Board(tak_config, 5)
+    for _ in range(40):
+        board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+    with Image.open(BytesIO(encode_png(board, RENDER_PROFILES[profile]))) as im:
+        assert_same_image(im.convert("RGB"), draw(board))
+
+
+def test_invalid_compress_level_fails():
+    with pytest.raises(ValueError):
+        RenderProfile(compress_level=10)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from moves.ptn import parse_game, split_games
+from mytypes import InvalidMoveError, ParseMoveError
+from readconfig import Config, TakConfig
+
+from .board import Board
+from .tps import from_tps
+
+# Where a game comes from: file name, line of the game's first line, lines of the game
+GameSource = Tuple[str, int, List[str]]
+
+
+class ReplayResult():
+    def __init__(self, source: str, line: int, moves: int = 0, error: Optional[str] = None, ply: Optional[int] = None, move: Optional[str] = None):
+        """
+        moves: moves that were replayed successfully
+        error: why the game failed, None if it didn't
+        ply/move: number (starting at 1) and text of the offending move, None if the game failed before or after its moves
+        """
+        self.source = source
+        self.line = line
+        self.moves = moves
+        self.error = error
+        self.ply = ply
+        self.move = move
+
+    def __str__(self):
+        where = f"{self.source}:{self.line}"
+        if not self.error:
+            return f"{where} ok ({self.moves} moves)"
+        if self.move:
+            return f"{where} failed at ply {self.ply} '{self.move}': {self.error}"
+        return f"{where} failed: {self.error}"
+
+
+def replay_game(tak_config: TakConfig, source: str, line: int, lines: List[str]) -> ReplayResult:
+    """
+      Plays the game on a Board and checks that every move is legal and that the result matches the board's
+    """
+    try:
+        game = parse_game(lines)
+        board = from_tps(tak_config, game.tags["TPS"]) if "TPS" in game.tags else Board(tak_config, game.get_size())
+    except (ParseMoveError, ValueError) as error:
+        return ReplayResult(source, line, error=f"{type(error).__name__}: {error}")
+
+    for ply, ptn_move in enumerate(game.moves, 1):
+        try:
+            board.do_move(board.next_player, ptn_move.move)
+        except (InvalidMoveError, ValueError) as error:
+            return ReplayResult(source, line, ply - 1, f"{type(error).__name__}: {error}", ply, ptn_move.move.to_ptn())
+
+    # 1-0 and 0-1 are won by resignation or time and 0-0 is unfinished, those aren't visible on the board
+    if game.result not in [None, "1-0", "0-1", "0-0"] and game.result != str(board.result):
+        return ReplayResult(source, line, len(game.moves), f"Game claims result {game.result} but the board says {board.result}")
+    if game.result is None and board.result:
+        return ReplayResult(source, line, len(game.moves), f"Game has no result but the board says {board.result}")
+    return ReplayResult(source, line, len(game.moves))
+
+
+worker_tak_config: Optional[TakConfig] = None  # of the worker process, set by init_worker
+
+
+def init_worker(tak_config: TakConfig) -> None:
+    global worker_tak_config
+    worker_tak_config = tak_config
+
+
+def replay_chunk(chunk: List[GameSource]) -> List[ReplayResult]:
+    if not worker_tak_config:
+        raise RuntimeError("Worker was not initialized")
+    return [replay_game(worker_tak_config, *game) for game in chunk]
+
+
+def read_ptn_file(filename: str) -> Iterator[GameSource]:
+    """
+      Streams the games of a PTN file, "-" reads stdin
+    """
+    if filename == "-":
+        yield from read_ptn_lines(filename, sys.stdin)
+        return
+    with open(filename, "r") as fp:
+        yield from read_ptn_lines(filename, fp)
+
+
+def read_ptn_lines(source: str, lines: Iterable[str]) -> Iterator[GameSource]:
+    line = 1
+    for game in split_games(lines):
+        yield source, line, game
+        line += len(game)
+
+
+def read_store(directory: str) -> Iterator[GameSource]:
+    """
+      Turns the move logs of the bot's game store (see discordtakbot.gamestore) into PTN games
+    """
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".log"):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, "r") as fp:
+            header = json.loads(fp.readline())
+            yield path, 1, [f'[Size "{header["board_size"]}"]'] + [move for move in fp.read().split("\n") if move]
+
+
+def chunked(games: Iterable[GameSource], chunk_size: int) -> Iterator[List[GameSource]]:
+    chunk: List[GameSource] = []
+    for game in games:
+        chunk.append(game)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay_all(games: Iterable[GameSource], tak_config: TakConfig, workers: int, chunk_size: int = 64) -> Iterator[ReplayResult]:
+    """
+      Replays the games in a pool of worker processes and yields the results in the order of the games.
+      Only a few chunks per worker are read ahead, so archives of any size are replayed in constant memory.
+      workers=0 replays in this process.
+    """
+    if workers == 0:
+        for game in games:
+            yield replay_game(tak_config, *game)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(tak_config,)) as executor:
+        pending: Deque[Future] = deque()
+        for chunk in chunked(games, chunk_size):
+            pending.append(executor.submit(replay_chunk, chunk))
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays PTN games on the Board and reports illegal moves and wrong results")
+    parser.add_argument("files", nargs="*", help="PTN files, - reads stdin")
+    parser.add_argument("--store", action="append", default=[], help="directory of the bot's game store to check as well")
+    parser.add_argument("--config", default="botsettings.json", help="piece counts are taken from its tak section")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0 replays without a process pool")
+    parser.add_argument("--chunk-size", type=int, default=64, help="games sent to a worker at once")
+    parser.add_argument("--verbose", action="store_true", help="print successful games too")
+    args = parser.parse_args()
+
+    def sources() -> Iterator[GameSource]:
+        for filename in args.files:
+            yield from read_ptn_file(filename)
+        for directory in args.store:
+            yield from read_store(directory)
+
+    games = 0
+    moves = 0
+    failures = 0
+    start = time.perf_counter()
+    for result in replay_all(sources(), Config.load(args.config).tak, args.workers, args.chunk_size):
+        games += 1
+        moves += result.moves
+        failures += bool(result.error)
+        if result.error or args.verbose:
+            print(result)
+    elapsed = time.perf_counter() - start
+
+    print(f"Replayed {games} games ({moves} moves) in {elapsed:.2f}s, {games / max(elapsed, 1e-9):.0f} games/s, {moves / max(elapsed, 1e-9):.0f} moves/s. "
+          f"{failures} failed")
+    sys.exit(1 if failures else 0)
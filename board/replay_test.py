@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from .replay import read_ptn_lines, read_store, replay_all, replay_game
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+})
+
+ARCHIVE = """[Size "3"]
+
+1. a1 c3
+2. a2 a3
+3. b2 b3
+4. c2 R-0
+
+[Size "5"]
+
+1. a1 a1
+
+[Size "3"]
+
+1. a1 c3 R-0
+
+[Size "9"]
+
+1. a1 c3
+
+[Size "3"]
+[TPS "x3/x3/1,1,x 1 4"]
+
+4. c1 R-0
+
+[Size "5"]
+[Result "1-0"]
+
+1. a1 e5
+2. Ce4 {resigned} 1-0
+"""
+
+
+def replay(archive: str, workers: int = 0, chunk_size: int = 64):
+    return list(replay_all(read_ptn_lines("archive.ptn", archive.splitlines(True)), tak_config, workers, chunk_size))
+
+
+def test_reports_failures_with_the_offending_move():
+    results = replay(ARCHIVE)
+    assert [result.line for result in results] == [1, 8, 12, 16, 20, 25]
+    assert [bool(result.error) for result in results] == [False, True, True, True, False, False]
+
+    illegal = results[1]
+    assert (illegal.ply, illegal.move, illegal.moves) == (2, "a1", 1)
+    assert "InvalidMoveError" in str(illegal)
+
+    assert "claims result R-0" in str(results[2])
+    assert "ValueError" in str(results[3]) and results[3].move is None
+
+
+def test_finished_game_without_result_fails():
+    result = replay_game(tak_config, "game", 1, '[Size "3"]\n1. a1 c3\n2. a2 a3\n3. b2 b3\n4. c2'.splitlines())
+    assert "no result" in str(result.error)
+
+
+def test_moves_after_the_end_fail():
+    result = replay_game(tak_config, "game", 1, '[Size "3"]\n1. a1 c3\n2. a2 a3\n3. b2 b3\n4. c2 c1'.splitlines())
+    assert (result.ply, result.move) == (8, "c1")
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 1), (2, 2)])
+def test_process_pool_gives_the_same_results_in_order(workers: int, chunk_size: int):
+    assert [str(result) for result in replay(ARCHIVE, workers, chunk_size)] == [str(result) for result in replay(ARCHIVE)]
+
+
+def test_reads_game_store(tmp_path):
+    with open(tmp_path / "1.log", "w") as fp:
+        fp.write(json.dumps({"board_size": 3, "white": 1, "black": 2}) + "\na1\nc3\n")
+    with open(tmp_path / "2.log", "w") as fp:
+        fp.write(json.dumps({"board_size": 3, "white": 1, "black": 2}) + "\na1\na1\n")
+    results = list(replay_all(read_store(str(tmp_path)), tak_config, 0))
+    assert [(result.moves, bool(result.error)) for result in results] == [(2, False), (1, True)]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+from board.helpers.stone import Stone
+from mytypes import PlayerType, StoneType
+from readconfig import TakConfig
+
+from .board import Board
+
+PLAYER_DIGITS = {PlayerType.WHITE: "1", PlayerType.BLACK: "2"}
+DIGIT_PLAYERS = {digit: player for player, digit in PLAYER_DIGITS.items()}
+# The stones of every player and stone type are the same objects, stacks only ever replace stones
+STONES = {(player, stone_type): Stone(player, stone_type) for player in PlayerType for stone_type in StoneType}
+
+REGEX_TPS = re.compile(r'^\s*(?:\[TPS\s+")?(?P<rows>[^"\s]+)\s+(?P<player>[12])\s+(?P<move>\d+)(?:"\])?\s*$')
+REGEX_STACK = re.compile(r"^[12]+[SC]?$")
+
+
+def encode_stack(stones: List[Stone]) -> str:
+    """
+      Writes a stack bottom to top, e.g. "121S" for a standing white stone on top
+    """
+    stack = "".join(PLAYER_DIGITS[stone.player] for stone in stones)
+    if stones and stones[-1].type != StoneType.FLAT:
+        stack += stones[-1].type.value
+    return stack
+
+
+def decode_stack(stack: str) -> List[Stone]:
+    return list(decode_cached_stack(stack))
+
+
+@lru_cache(maxsize=4096)
+def decode_cached_stack(stack: str) -> Tuple[Stone, ...]:
+    if not REGEX_STACK.match(stack):
+        raise ValueError(f"Invalid stack '{stack}'")
+    top_type = StoneType.FLAT
+    if stack[-1] in "SC":
+        top_type = StoneType(stack[-1])
+        stack = stack[:-1]
+    stones = [STONES[(DIGIT_PLAYERS[digit], StoneType.FLAT)] for digit in stack]
+    stones[-1] = STONES[(stones[-1].player, top_type)]
+    return tuple(stones)
+
+
+def to_tps(board: Board) -> str:
+    """
+      Returns the position in Tak Positional System, e.g. "x3/x,2,x/1,x2 1 2". Rows go from the top to the bottom.
+    """
+    rows = []
+    for y in reversed(range(board.board_size)):
+        squares: List[str] = []
+        empty = 0
+        for x in range(board.board_size):
+            stack = board.board[x + y * board.board_size]
+            if not stack:
+                empty += 1
+                continue
+            if empty:
+                squares.append("x" if empty == 1 else f"x{empty}")
+                empty = 0
+            squares.append(encode_stack(stack))
+        if empty:
+            squares.append("x" if empty == 1 else f"x{empty}")
+        rows.append(",".join(squares))
+
+    # The move number decides whether the players still place their opponent's stones, it has to agree with initial_moves
+    move_number = 1 if board.initial_moves else max(board.ply // 2 + 1, 2)
+    return f"{'/'.join(rows)} {PLAYER_DIGITS[board.next_player]} {move_number}"
+
+
+def from_tps(tak_config: TakConfig, tps: str) -> Board:
+    """
+      Loads a position written by to_tps, also accepts it as PTN tag like [TPS "..."]. Reserves are the config's piece counts
+      minus the stones on the board.
+    """
+    match = REGEX_TPS.match(tps)
+    if not match:
+        raise ValueError(f"Invalid TPS '{tps}'")
+    rows = match.group("rows").split("/")
+    board_size = len(rows)
+    board = Board(tak_config, board_size)
+
+    for row, squares in enumerate(rows):
+        y = board_size - row - 1
+        x = 0
+        for square in squares.split(","):
+            if not square:
+                raise ValueError(f"Row {row + 1} of TPS '{tps}' has an empty field")
+            if square[0] == "x":
+                x += int(square[1:]) if len(square) > 1 else 1
+                continue
+            if x >= board_size:
+                raise ValueError(f"Row {row + 1} of TPS '{tps}' has more fields than the board size {board_size}")
+            board.board[x + y * board_size] = decode_stack(square)
+            x += 1
+        if x != board_size:
+            raise ValueError(f"Row {row + 1} of TPS '{tps}' has {x} fields but the board size is {board_size}")
+
+    stones = {player: 0 for player in PlayerType}
+    caps = {player: 0 for player in PlayerType}
+    for stack in board.board:
+        for stone in stack:
+            stones[stone.player] += 1
+        if stack and stack[-1].type == StoneType.CAPSTONE:  # only the top stone can be a capstone
+            caps[stack[-1].player] += 1
+    for player, reserve in board.player_reserves.items():
+        reserve.caps -= caps[player]
+        reserve.flats -= stones[player] - caps[player]
+        if reserve.caps < 0 or reserve.flats < 0:
+            raise ValueError(f"{player.value} has more stones on the board than the board size {board_size} allows")
+
+    move_number = int(match.group("move"))
+    if move_number < 1:
+        raise ValueError(f"Move number must be positive but was {move_number}")
+    board.next_player = DIGIT_PLAYERS[match.group("player")]
+    board.initial_moves = move_number == 1
+    board.ply = (move_number - 1) * 2 + (1 if board.next_player == PlayerType.BLACK else 0)
+    board._update_derived_state()
+    return board
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Measures how long writing and loading positions as TPS takes per board size")
+    parser.add_argument("--config", default="botsettings.json")
+    parser.add_argument("--moves", type=int, default=60, help="random moves played before measuring")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    tak_config = Config.load(args.config).tak
+    for board_size in sorted(tak_config.boards.keys()):
+        board = Board(tak_config, board_size)
+        rng = random.Random(board_size)
+        for _ in range(args.moves):
+            if board.result:
+                break
+            board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            tps = to_tps(board)
+        written = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            from_tps(tak_config, tps)
+        loaded = (time.perf_counter() - start) / args.repeat
+        print(f"{board_size}x{board_size}: to_tps {written * 1e6:.1f}us, from_tps {loaded * 1e6:.1f}us ({tps})")
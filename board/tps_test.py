@@ -0,0 +1,126 @@
+import random
+import time
+
+import pytest
+
+from board.helpers import Stone
+from moves.moves import parse_move
+from mytypes import PlayerType, StoneType, WinType
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from . import Board
+from .tps import from_tps, to_tps
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+    8: BoardConfig(50, 2),
+})
+
+
+def play(board: Board, moves):
+    for move in moves:
+        board.do_move(board.next_player, parse_move(move))
+
+
+def assert_same_position(board: Board, loaded: Board):
+    assert loaded.board == board.board
+    assert loaded.hash == board.hash
+    assert loaded.ply == board.ply
+    assert loaded.flat_counts == board.flat_counts
+    assert loaded.empty_fields == board.empty_fields
+    assert str(loaded.result) == str(board.result)
+    for player in PlayerType:
+        assert loaded.player_reserves[player].flats == board.player_reserves[player].flats
+        assert loaded.player_reserves[player].caps == board.player_reserves[player].caps
+        assert loaded.roads[player].has_road == board.roads[player].has_road
+
+
+def test_empty_board():
+    assert to_tps(Board(tak_config, 3)) == "x3/x3/x3 1 1"
+
+
+def test_writes_stacks_from_the_top_row():
+    board = Board(tak_config, 5)
+    play(board, ["a1", "e5", "Cc3", "Sd4", "c3+"])
+    assert to_tps(board) == "x4,1/x2,1C,2S,x/x5/x5/2,x4 2 3"
+
+
+@pytest.mark.parametrize("tps", [
+    "x3/x3/x3 1 1",
+    "x3/x3/x3 2 1",
+    "2,1S,2/1S,2S,1S/2,1S,122S 1 10",
+    "x,2S,2C,x,2S/1S,1,2S,2,2/1S,1,211,x,2S/1S,x,12S,x,1S/2S,x,11S,221221C,x 1 31",
+    '[TPS "x3/x,12,x/x3 2 4"]',
+])
+def test_round_trip(tps: str):
+    assert to_tps(from_tps(tak_config, tps)) == tps.replace('[TPS "', "").replace('"]', "")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_loads_the_position_of_random_games(seed: int):
+    rng = random.Random(seed)
+    board = Board(tak_config, rng.choice([3, 5, 8]))
+    for _ in range(rng.randint(0, 120)):
+        if board.result:
+            break
+        board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+
+    loaded = from_tps(tak_config, to_tps(board))
+    assert_same_position(board, loaded)
+    assert loaded.generate_moves(loaded.next_player) == board.generate_moves(board.next_player)
+
+
+def test_initial_moves_follow_the_move_number():
+    board = from_tps(tak_config, "x3/x3/x3 2 1")
+    assert board.initial_moves and board.next_player == PlayerType.BLACK
+    play(board, ["a1"])
+    assert board.get_stack(0, 0) == [Stone(PlayerType.WHITE, StoneType.FLAT)]
+    assert not board.initial_moves
+
+
+def test_loads_finished_game():
+    board = from_tps(tak_config, "x3/1,1,1/2,2,x 2 3")
+    assert board.result is not None and board.result.winner == PlayerType.WHITE and board.result.win_type == WinType.ROAD
+
+
+@pytest.mark.parametrize("tps", [
+    "",
+    "x3/x3 1 1",  # 2 rows but 3 fields per row
+    "x3/x4/x3 1 1",
+    "x3/x,,x/x3 1 1",
+    "x3/x,3,x/x3 1 1",
+    "x3/x,1S1,x/x3 1 1",
+    "1,2,1,2,1/x3/x3 1 2",  # stones beyond the end of a row
+    "x3,1/x3/x3 1 2",
+    "x3/x3/x3 3 1",
+    "x3/x3/x3 1 0",
+    "x4/x4/x4/x4 1 1",  # board size not in the config
+    "1C,x2/x3/x3 2 2",  # 3x3 has no capstones
+    "1111111111,1/x3/x3 2 7",  # more than 10 flats
+])
+def test_invalid_tps_fails(tps: str):
+    with pytest.raises(ValueError):
+        from_tps(tak_config, tps)
+
+
+def test_loading_is_faster_than_replaying():
+    rng = random.Random(0)
+    board = Board(tak_config, 8)
+    moves = []
+    for _ in range(80):
+        moves.append(rng.choice(board.generate_moves(board.next_player)))
+        board.do_move(board.next_player, moves[-1])
+    tps = to_tps(board)
+
+    start = time.perf_counter()
+    for _ in range(20):
+        from_tps(tak_config, tps)
+    loading = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20):
+        replayed = Board(tak_config, 8)
+        for move in moves:
+            replayed.do_move(replayed.next_player, move)
+    replaying = time.perf_counter() - start
+    assert loading < replaying
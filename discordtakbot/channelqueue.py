@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class ChannelQueue():
+    """
+    Runs the work of each channel one after another in the order it was submitted, while channels don't wait for each other.
+    This keeps a game's moves from interleaving at the awaits of rendering and sending.
+
+    Refreshes (re-sending the board) that are waiting for their turn are coalesced: a refresh requested while another one of
+    the same channel hasn't started yet shares it, so a burst of $show renders the latest position once.
+    """
+
+    def __init__(self):
+        self.locks: Dict[int, asyncio.Lock] = {}  # channel ID -> lock, only while work of the channel is queued or running
+        self.queued: Dict[int, int] = {}  # channel ID -> work queued or running
+        self.refreshes: Dict[int, asyncio.Future] = {}  # channel ID -> refresh that hasn't started yet
+
+        self.coalesced = 0
+
+    async def run(self, channel_id: int, work: Callable[[], Awaitable[T]]) -> T:
+        lock = self.locks.get(channel_id)
+        if not lock:
+            lock = self.locks[channel_id] = asyncio.Lock()
+        self.queued[channel_id] = self.queued.get(channel_id, 0) + 1
+        try:
+            async with lock:  # waiters get the lock in the order they started waiting
+                return await work()
+        finally:
+            self.queued[channel_id] -= 1
+            if not self.queued[channel_id]:
+                del self.queued[channel_id]
+                del self.locks[channel_id]
+
+    async def refresh(self, channel_id: int, work: Callable[[], Awaitable[None]]) -> None:
+        pending = self.refreshes.get(channel_id)
+        if pending:
+            self.coalesced += 1
+        else:
+            pending = self.refreshes[channel_id] = asyncio.ensure_future(self.run(channel_id, lambda: self._start_refresh(channel_id, work)))
+        # Shielded, one cancelled requester must not cancel the refresh of the others
+        await asyncio.shield(pending)
+
+    async def _start_refresh(self, channel_id: int, work: Callable[[], Awaitable[None]]) -> None:
+        # From now on the board may change before this refresh is sent, so later requests need their own
+        del self.refreshes[channel_id]
+        await work()
+
+    def __len__(self) -> int:
+        return sum(self.queued.values())
+
+    def __str__(self):
+        return f"[ChannelQueue Channels={len(self.queued)} Queued={len(self)} Coalesced={self.coalesced}]"
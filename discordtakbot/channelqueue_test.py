@@ -0,0 +1,108 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from .channelqueue import ChannelQueue
+
+
+def test_serializes_work_of_a_channel_in_order():
+    log: List[str] = []
+
+    async def work(name: str):
+        log.append(f"start {name}")
+        await asyncio.sleep(0.01)
+        log.append(f"end {name}")
+
+    async def run():
+        queue = ChannelQueue()
+        await asyncio.gather(*[queue.run(1, lambda name=name: work(name)) for name in "abc"])
+        return queue
+
+    queue = asyncio.run(run())
+    assert log == ["start a", "end a", "start b", "end b", "start c", "end c"]
+    assert len(queue) == 0
+    assert not queue.locks
+
+
+def test_channels_run_concurrently():
+    running = 0
+    max_running = 0
+
+    async def work():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def run():
+        queue = ChannelQueue()
+        await asyncio.gather(*[queue.run(channel_id, work) for channel_id in range(5)])
+
+    asyncio.run(run())
+    assert max_running == 5
+
+
+def test_returns_results_and_raises_errors():
+    async def fail():
+        raise ValueError("broken")
+
+    async def run():
+        queue = ChannelQueue()
+        with pytest.raises(ValueError):
+            await queue.run(1, fail)
+        result = await queue.run(1, lambda: asyncio.sleep(0, "ok"))
+        return queue, result
+
+    queue, result = asyncio.run(run())
+    assert result == "ok"
+    assert len(queue) == 0
+
+
+def test_coalesces_waiting_refreshes():
+    renders: List[int] = []
+    position = 0
+
+    async def move():
+        nonlocal position
+        await asyncio.sleep(0.01)
+        position += 1
+
+    async def render():
+        renders.append(position)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        queue = ChannelQueue()
+        moving = asyncio.ensure_future(queue.run(1, move))
+        await asyncio.sleep(0)
+        # All of these wait for the move, so one render of the position after it serves them all
+        await asyncio.gather(*[queue.refresh(1, render) for _ in range(5)])
+        await moving
+        return queue
+
+    queue = asyncio.run(run())
+    assert renders == [1]
+    assert queue.coalesced == 4
+    assert not queue.refreshes
+
+
+def test_refresh_after_a_started_refresh_renders_again():
+    renders = 0
+
+    async def render():
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.01)
+
+    async def run():
+        queue = ChannelQueue()
+        first = asyncio.ensure_future(queue.refresh(1, render))
+        await asyncio.sleep(0.005)  # the first render is running, the position may have changed since it started
+        await asyncio.gather(first, queue.refresh(1, render), queue.refresh(1, render))
+        return queue
+
+    queue = asyncio.run(run())
+    assert renders == 2
+    assert queue.coalesced == 1
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import discord
+
+# Handles the message, gets the text after the command name
+Handler = Callable[[discord.Message, str], Awaitable[None]]
+
+
+class Command():
+    def __init__(self, name: str, handler: Handler, needs_game: bool):
+        """
+        needs_game: only accepted in channels with a game, elsewhere it's ignored before it's handled
+        """
+        self.name = name
+        self.handler = handler
+        self.needs_game = needs_game
+
+    def __str__(self):
+        return f"[Command Name={self.name} NeedsGame={self.needs_game}]"
+
+
+class CommandTable():
+    """
+    The bot's commands by name, e.g. "show" for "$show".
+
+    Most messages aren't commands. Those are rejected with a look at their first character, and commands with a dictionary lookup,
+    so nothing is parsed or logged for them. Text after the prefix that isn't a registered name goes to the fallback, which handles moves.
+    """
+
+    def __init__(self, prefix: str = "$"):
+        self.prefix = prefix
+        self.commands: Dict[str, Command] = {}
+        self.fallback: Optional[Command] = None
+
+    def register(self, name: str, handler: Handler, needs_game: bool = True) -> None:
+        if name in self.commands:
+            raise ValueError(f"Command '{name}' is registered already")
+        self.commands[name] = Command(name, handler, needs_game)
+
+    def set_fallback(self, handler: Handler, needs_game: bool = True) -> None:
+        self.fallback = Command("", handler, needs_game)
+
+    def match(self, content: str) -> Optional[Tuple[Command, str]]:
+        """
+          Returns the command and the text after its name, None if the content isn't a command
+        """
+        if not content.startswith(self.prefix):
+            return None
+        text = content[len(self.prefix):]
+        name, _, arguments = text.partition(" ")
+        command = self.commands.get(name)
+        if command:
+            return command, arguments
+        if self.fallback and text:
+            return self.fallback, text
+        return None
@@ -0,0 +1,57 @@
+import pytest
+
+from .commands import CommandTable
+
+
+async def show(message, arguments):
+    pass
+
+
+async def create(message, arguments):
+    pass
+
+
+async def move(message, text):
+    pass
+
+
+def make_table() -> CommandTable:
+    commands = CommandTable()
+    commands.register("show", show)
+    commands.register("create", create, needs_game=False)
+    commands.set_fallback(move)
+    return commands
+
+
+def test_matches_registered_commands():
+    commands = make_table()
+    command, arguments = commands.match("$show")
+    assert command.handler is show and arguments == ""
+    command, arguments = commands.match("$create -s5 -white @someone")
+    assert command.handler is create and not command.needs_game
+    assert arguments == "-s5 -white @someone"
+
+
+def test_other_commands_go_to_the_fallback():
+    commands = make_table()
+    command, text = commands.match("$5b3>212")
+    assert command is commands.fallback and command.needs_game
+    assert text == "5b3>212"
+    command, text = commands.match("$showing")
+    assert command is commands.fallback
+
+
+@pytest.mark.parametrize("content", ["", "hello", "show", " $show", "$"])
+def test_rejects_messages_that_are_no_commands(content: str):
+    assert make_table().match(content) is None
+
+
+def test_without_fallback_only_registered_commands_match():
+    commands = CommandTable()
+    commands.register("show", show)
+    assert commands.match("$a1") is None
+
+
+def test_names_are_unique():
+    with pytest.raises(ValueError):
+        make_table().register("show", show)
@@ -1,32 +1,53 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import random
+import re
+import time
 from io import BytesIO
-from typing import Dict, List, Union
+from typing import Awaitable, Dict, List, Optional, Set, Union
 
 import discord
 from discord import mentions
 from discord.channel import TextChannel
-from PIL import Image, ImageDraw
 
 from board import Board
-from moves import parse_move
-from mytypes import InvalidMoveError, ParseMoveError, PlayerType, get_opponent
-from readconfig import TakConfig
-
-
-async def send_board_image(board: Board, channel: discord.abc.Messageable, content: str = ""):
+from board.render import RenderProfile
+from board.tps import to_tps
+from engine import MctsLimits, SearchLimits
+from moves import Move, get_move_table
+from mytypes import InvalidMoveError, ParseMoveError, PlayerType
+from readconfig import (EngineConfig, MetricsConfig, RenderConfig, StoreConfig,
+                        TakConfig)
+
+from .channelqueue import ChannelQueue
+from .commands import CommandTable
+from .enginepool import EnginePool
+from .game import Game
+from .gameregistry import GameRegistry
+from .gamestore import GameStore, StoredGame
+from .metrics import Metrics
+from .outbox import Outbox
+from .renderpool import RenderPool
+
+logger = logging.getLogger(__name__)
+
+EVICT_INTERVAL = 60  # seconds between checks for idle games
+PTN_INLINE_LENGTH = 1900  # longer PTN is sent as a file, messages are limited to 2000 characters
+REGEX_DEPTH = re.compile(r"-depth\s*(\d+)")
+REGEX_TIME = re.compile(r"-time\s*(\d+)")
+REGEX_PLAYOUTS = re.compile(r"-playouts\s*(\d+)")
+
+
+async def send_board_image(board: Board, channel: discord.abc.Messageable, render_pool: RenderPool, outbox: Outbox, content: str = "",
+                           profile: Optional[RenderProfile] = None):
     embed = discord.Embed(title="Game State", description=content, color=0xfc9a04)
-    with Image.new("RGB", board.get_dimensions(), "white") as im:
-        draw: ImageDraw.ImageDraw = ImageDraw.ImageDraw(im)
-        board.draw(draw)
-        with BytesIO() as image_binary:
-            im.save(image_binary, 'PNG')
-            image_binary.seek(0)
-
-            file = discord.File(fp=image_binary, filename="board.png")
-            embed.set_image(url="attachment://board.png")
-            await channel.send(file=file, embed=embed, delete_after=60)
+    png = await render_pool.render_png(board, profile)
+    with BytesIO(png) as image_binary:
+        file = discord.File(fp=image_binary, filename="board.png")
+        embed.set_image(url="attachment://board.png")
+        await outbox.send(channel, file=file, embed=embed, delete_after=60)
 
 
 async def make_channel(ctx: discord.Message, opponent: discord.Member, public_read: bool = False, public_write: bool = False) -> TextChannel:
@@ -50,27 +71,31 @@ async def make_channel(ctx: discord.Message, opponent: discord.Member, public_re
     return channel
 
 
-class Game:
-    def __init__(self, white: discord.Member, black: discord.Member, board: Board):
-        self.board = board
-        self.white = white
-        self.black = black
-
-    def next_player_mention(self) -> str:
-        next = self.white if self.board.next_player == PlayerType.WHITE else self.black
-        return f"{next.mention}({self.board.next_player.value})"
-
-    def other_player_mention(self) -> str:
-        other = self.black if self.board.next_player == PlayerType.WHITE else self.white
-        return f"{other.mention}({get_opponent(self.board.next_player).value})"
-
-
 class DiscordTakBot(discord.Client):
-    def __init__(self, tak_config: TakConfig, initial_moves: List[str] = []):
-        super().__init__()
+    def __init__(self, tak_config: TakConfig, initial_moves: List[str] = [], render_config: RenderConfig = RenderConfig(), store_config: StoreConfig = StoreConfig(),
+                 engine_config: EngineConfig = EngineConfig(), metrics_config: MetricsConfig = MetricsConfig()):
+        intents = discord.Intents.default()
+        if hasattr(intents, "message_content"):  # discord.py 2 only delivers the content of messages with this intent
+            intents.message_content = True
+        super().__init__(intents=intents)
         self.tak_config = tak_config
-
-        self.games: Dict[int, Game] = {}  # channel ID -> Game
+        self.metrics_config = metrics_config
+        self.metrics = Metrics()
+        self.render_pool = RenderPool(render_config, self.metrics)
+        self.engine_pool = EnginePool(engine_config)
+        self.store = GameStore(store_config)
+
+        self.games = GameRegistry(self.store, tak_config, store_config)  # channel ID -> Game
+        self.outbox = Outbox(metrics=self.metrics)  # every call to Discord after a message goes through it
+        self.queue = ChannelQueue()  # everything that changes or shows a game runs in its channel's queue
+        self.evict_task: Optional[asyncio.Task] = None
+        self.metrics_task: Optional[asyncio.Task] = None
+        self.tasks: Set[asyncio.Task] = set()  # e.g. the engine's moves in resumed games, kept so they aren't garbage collected
+        self.commands = self.register_commands()
+
+        start = time.perf_counter()
+        self.stored_games: List[StoredGame] = self.store.load_all(tak_config)  # games of the last run, until their players are looked up
+        logger.info("restored games=%d directory=%r seconds=%.2f", len(self.stored_games), store_config.directory, time.perf_counter() - start)
 
         # self.board = Board(self.tak_config, 6)
 
@@ -102,6 +127,20 @@ class DiscordTakBot(discord.Client):
         if userandom:
             white = bool(random.randint(0, 1))
 
+        engine_limits: Union[SearchLimits, MctsLimits, None] = None
+        if "-vs-bot" in command:
+            depth = REGEX_DEPTH.search(command)
+            playouts = REGEX_PLAYOUTS.search(command)
+            time_ms = REGEX_TIME.search(command)
+            if "-mcts" in command:
+                if depth:
+                    raise Exception("`-depth` is for the alpha-beta bot, use `-playouts` with `-mcts`")
+                engine_limits = self.engine_pool.get_mcts_limits(int(playouts.group(1)) if playouts else None, int(time_ms.group(1)) if time_ms else None)
+            else:
+                if playouts:
+                    raise Exception("`-playouts` needs `-mcts`")
+                engine_limits = self.engine_pool.get_limits(int(depth.group(1)) if depth else None, int(time_ms.group(1)) if time_ms else None)
+
         author = message.author
         if not isinstance(author, discord.Member):
             raise Exception("Author must be a member")
@@ -110,63 +149,252 @@ class DiscordTakBot(discord.Client):
 
         channel = await make_channel(message, opponent, True, False)
 
-        game = Game(white, black, Board(self.tak_config, board_size))
-        self.games[channel.id] = game
-
-        return await send_board_image(game.board, channel, f"{game.next_player_mention()} vs {game.other_player_mention()}")
+        game = Game(white, black, Board(self.tak_config, board_size), engine_limits=engine_limits)
+        self.store.create_game(channel.id, white.id, black.id, board_size, engine_limits)
+        self.metrics.count("games_created")
+        self.games.add(channel.id, game)
+
+        async def start():
+            await send_board_image(game.board, channel, self.render_pool, self.outbox, f"{game.next_player_mention()} vs {game.other_player_mention()}")
+            await self.play_bot_move(channel, game)
+        await self.queue.run(channel.id, start)
+
+    async def play_bot_move(self, channel: discord.abc.Messageable, game: Game):
+        """
+          Lets the engine answer if the bot plays in this game and it's its turn
+        """
+        if not game.engine_limits or game.board.result or not self.user or game.next_member().id != self.user.id:
+            return
+        player = game.board.next_player
+        with self.metrics.time("engine"):
+            result = await self.engine_pool.think(game.board, game.engine_limits)
+        self.metrics.count("bot_moves")
+        logger.info("engine searched channel=%s result=%s", channel.id, result)
+        game_result = game.do_move(player, result.move)
+        self.log_move(channel.id, result.move, game)
+        content = f"{self.user.mention}({player.value}) executed move {result.move} ({result.get_summary()})\n{game.status_message()}"
+        await send_board_image(game.board, channel, self.render_pool, self.outbox, content)
+
+    def log_move(self, channel_id: int, move: Move, game: Game):
+        self.store.append_move(channel_id, move, game.board)
+        if game.board.result:
+            # Finished games aren't resumed. They stay in memory for $show and $ptn until they are evicted.
+            self.store.remove_game(channel_id)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if channel.id in self.games:
+            logger.info("removing game channel=%s reason='the channel was deleted'", channel.id)
+            self.games.remove(channel.id)
+
+    async def close(self):
+        if self.evict_task:
+            self.evict_task.cancel()
+        if self.metrics_task:
+            self.metrics_task.cancel()
+        for task in list(self.tasks):
+            task.cancel()
+        self.outbox.close()
+        logger.info("closing outbox=%s", self.outbox)
+        await super().close()
+        self.render_pool.shutdown()
+        self.engine_pool.shutdown()
+        self.store.shutdown()
 
     async def on_ready(self):
-        print(f'Logged on as {self.user}!')
+        logger.info("logged on user=%s", self.user)
+        await self.resume_games()
+        if not self.evict_task:
+            self.evict_task = asyncio.create_task(self.evict_idle_games())
+        if not self.metrics_task and self.metrics_config.prometheus_file:
+            self.metrics_task = asyncio.create_task(self.write_metrics(self.metrics_config.prometheus_file))
+
+    async def resume_games(self):
+        """
+          Looks up the channels and players of the restored games, they are only stored by ID
+        """
+        stored_games, self.stored_games = self.stored_games, []
+        for stored in stored_games:
+            channel = self.get_channel(stored.channel_id)
+            if not isinstance(channel, TextChannel):
+                logger.warning("not resuming game channel=%s reason='the channel is gone'", stored.channel_id)
+                continue
+            try:
+                # Without the privileged members intent only members that were seen since the start are cached
+                white = channel.guild.get_member(stored.white_id) or await channel.guild.fetch_member(stored.white_id)
+                black = channel.guild.get_member(stored.black_id) or await channel.guild.fetch_member(stored.black_id)
+            except discord.HTTPException as ex:
+                logger.warning("not resuming game channel=%s reason='failed to look up its players' error=%r", stored.channel_id, ex)
+                continue
+            game = Game(white, black, stored.board, stored.moves, stored.engine_limits)
+            self.games.add(stored.channel_id, game)
+            # The bot may have been stopped while it was thinking
+            self.spawn(self.queue.run(stored.channel_id, lambda channel=channel, game=game: self.play_bot_move(channel, game)))
+        logger.info("resumed games=%d", len(self.games))
+
+    def spawn(self, coroutine: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._finish_task)
+
+    def _finish_task(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("background task failed error=%r", task.exception())
+
+    async def evict_idle_games(self):
+        calls = 0
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            if self.games.evict_idle():
+                logger.info("evicted idle games registry=%s", self.games)
+            self.outbox.evict_idle_buckets()
+            if self.outbox.calls != calls:
+                calls = self.outbox.calls
+                logger.info("sent to discord outbox=%s", self.outbox)
+
+    async def write_metrics(self, path: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.metrics_config.write_every)
+            self.update_gauges()
+            try:
+                await loop.run_in_executor(None, self.metrics.write_prometheus, path, self.metrics.to_prometheus())
+            except OSError as ex:
+                logger.warning("failed to write metrics file=%r error=%r", path, ex)
+
+    def update_gauges(self):
+        self.metrics.set_gauge("games_resident", len(self.games.resident))
+        self.metrics.set_gauge("games_evicted", len(self.games.evicted))
+        self.metrics.set_gauge("outbox_pending", self.outbox.pending)
+        self.metrics.set_gauge("renders_pending", self.render_pool.pending)
+        self.metrics.set_gauge("render_cache_bytes", self.render_pool.cache.size)
+        self.metrics.set_gauge("render_cache_images", len(self.render_pool.cache))
+        self.metrics.set_gauge("channels_queued", len(self.queue.queued))
+
+    def register_commands(self) -> CommandTable:
+        commands = CommandTable()
+        commands.register("show", self.show_command)
+        commands.register("tps", self.tps_command)
+        commands.register("ptn", self.ptn_command)
+        commands.register("create", self.create_command, needs_game=False)
+        commands.register("stats", self.stats_command, needs_game=False)
+        commands.set_fallback(self.move_command)
+        return commands
 
     async def on_message(self, message: discord.Message):
-        try:
-            await self._on_message(message)
-        except Exception as ex:
-            return await message.channel.send(f"Error: {ex}")
-
-    async def _on_message(self, message: discord.Message):
-        print(f'Message from {message.author} on channel id {message.channel.id}: {message.content}')
-        if message.author == self.user:
+        match = self.commands.match(message.content)
+        if not match or message.author == self.user:
+            return
+        command, arguments = match
+        # Moves in channels without a game may be meant for another bot, reject them before parsing them
+        if command.needs_game and message.channel.id not in self.games:
+            if command is not self.commands.fallback:
+                await self.outbox.send(message.channel, "Error: Channel doesn't have a game", delete_after=60)
             return
 
-        if message.content.startswith('$'):
-            command = message.content[1:]
-            game = self.games.get(message.channel.id)
-
-            if command == "show":
-                if not game:
-                    raise Exception("Channel doesn't have a game")
-                await send_board_image(game.board, message.channel, f"{game.next_player_mention()} is next")
-                return await message.delete()
+        logger.debug("command channel=%s author=%s content=%r", message.channel.id, message.author.id, message.content)
+        name = command.name if command.name else "move"
+        self.metrics.count(f"command_{name}")
+        try:
+            with self.metrics.time(f"command_{name}"):
+                await command.handler(message, arguments)
+        except Exception as ex:
+            self.metrics.count_error(ex)
+            logger.info("command failed channel=%s content=%r error=%r", message.channel.id, message.content, ex)
+            await self.outbox.send(message.channel, f"Error: {ex}", delete_after=60)
 
-            if command.startswith("create"):
-                if len(message.mentions) == 0:
-                    raise Exception("Must mention only your opponent")
-                opponent = message.mentions[0]
-                if not isinstance(opponent, discord.Member):
-                    raise Exception(f"Opponent is not a member but a {type(opponent)}")
+    async def show_command(self, message: discord.Message, arguments: str):
+        self.outbox.delete(message)
+        await self.queue.refresh(message.channel.id, lambda: self.show(message.channel))
 
-                await self.create(message, command, opponent)
-                return await message.delete()
+    async def stats_command(self, message: discord.Message, arguments: str):
+        author = message.author
+        if author.id not in self.metrics_config.admins and not (isinstance(author, discord.Member) and author.guild_permissions.administrator):
+            raise Exception("Only administrators can see the stats")
+        self.update_gauges()
+        await self.outbox.send(message.channel, f"```\n{self.metrics.format_table()}\n```", delete_after=300)
+
+    async def tps_command(self, message: discord.Message, arguments: str):
+        game = await self.get_game(message.channel.id)
+        await self.outbox.send(message.channel, f"`{to_tps(game.board)}`")
+
+    async def ptn_command(self, message: discord.Message, arguments: str):
+        game = await self.get_game(message.channel.id)
+        ptn = game.to_ptn()
+        if len(ptn) < PTN_INLINE_LENGTH:
+            await self.outbox.send(message.channel, f"```\n{ptn}```")
+            return
+        with BytesIO(ptn.encode()) as ptn_binary:
+            await self.outbox.send(message.channel, file=discord.File(fp=ptn_binary, filename="game.ptn"))
+
+    async def create_command(self, message: discord.Message, arguments: str):
+        if "-vs-bot" in arguments:
+            if not message.guild or not message.guild.me:
+                raise Exception("Games against the bot can only be created in a server")
+            opponent = message.guild.me
+        elif len(message.mentions) == 0:
+            raise Exception("Must mention only your opponent")
+        else:
+            opponent = message.mentions[0]
+        if not isinstance(opponent, discord.Member):
+            raise Exception(f"Opponent is not a member but a {type(opponent)}")
+
+        await self.create(message, arguments, opponent)
+        self.outbox.delete(message)  # kept if creating failed, so the player can see what they typed
+
+    async def move_command(self, message: discord.Message, text: str):
+        board_size = self.games.get_board_size(message.channel.id)
+        if not board_size:
+            raise Exception("Channel doesn't have a game")
+        try:
+            with self.metrics.time("parse"):
+                move = get_move_table(board_size).parse(text)
+        except ParseMoveError as error:
+            self.metrics.count_error(error)
+            await self.outbox.send(message.channel, f"Failed to parse command {message.content}: {error}", delete_after=60)
+            return
+        queued = time.perf_counter()
+        await self.queue.run(message.channel.id, lambda: self.play_move(message, move, queued))
+
+    async def get_game(self, channel_id: int) -> Game:
+        game = await self.games.get(channel_id)
+        if not game:
+            raise Exception("Channel doesn't have a game")
+        return game
+
+    async def show(self, channel: discord.abc.Messageable):
+        """
+          Sends the board as it is once the refresh starts, so coalesced $show requests all get the latest position
+        """
+        game = await self.games.get(channel.id)
+        if game:
+            await send_board_image(game.board, channel, self.render_pool, self.outbox, game.status_message())
+
+    async def play_move(self, message: discord.Message, move: Move, queued: float):
+        self.metrics.observe("queue_wait", time.perf_counter() - queued)
+        # Looked up again in the queue, the game may have been evicted and reloaded while the move waited
+        game = await self.get_game(message.channel.id)
+
+        if message.author == game.white:
+            player = PlayerType.WHITE
+        elif message.author == game.black:
+            player = PlayerType.BLACK
+        else:
+            raise Exception(f"You are not a player. Only {game.next_player_mention()} and {game.other_player_mention()} can do moves")
 
-            try:
-                move = parse_move(command)
-                if not game:
-                    raise Exception("Channel doesn't have a game")
-                print(f"Parsed move {move}")
-
-                if message.author == game.white:
-                    player = PlayerType.WHITE
-                elif message.author == game.black:
-                    player = PlayerType.BLACK
-                else:
-                    raise Exception(f"You are not a player. Only {game.next_player_mention()} and {game.other_player_mention()} can do moves")
-
-                try:
-                    game.board.do_move(player, move)
-                    await send_board_image(game.board, message.channel, f"{message.author.mention}({player.value}) executed move {move}")
-                    return await message.delete()
-                except InvalidMoveError as error:
-                    return await message.channel.send(f"Failed to apply move {move}: {error}", delete_after=60)
-            except ParseMoveError as error:
-                return await message.channel.send(f"Failed to parse command {message.content}: {error}", delete_after=60)
+        try:
+            with self.metrics.time("do_move"):
+                result = game.do_move(player, move)
+        except InvalidMoveError as error:
+            self.metrics.count_error(error)
+            await self.outbox.send(message.channel, f"Failed to apply move {move}: {error}", delete_after=60)
+            return
+        with self.metrics.time("store"):
+            self.log_move(message.channel.id, move, game)
+        self.metrics.count("moves")
+        content = f"{message.author.mention}({player.value}) executed move {move}"
+        if result:
+            content += f"\n{game.result_message(result)}"
+        self.outbox.delete(message)
+        await send_board_image(game.board, message.channel, self.render_pool, self.outbox, content)
+        await self.play_bot_move(message.channel, game)
@@ -0,0 +1,90 @@
+import asyncio
+import random
+import sys
+
+from board import Board
+from readconfig import BoardConfig, RenderConfig, StoreConfig, TakConfig
+
+from .discordtakbot import DiscordTakBot
+from .fakes import FakeGuild, FakeMember, FakeMessage
+from .game import Game
+from .gamestore import GameStore
+from .outbox import ROUTE_LIMITS, Outbox
+
+tak_config = TakConfig({3: BoardConfig(10, 0)})
+
+
+def test_finished_games_are_not_resumed(tmp_path):
+    async def play():
+        bot = DiscordTakBot(tak_config, render_config=RenderConfig(cache_bytes=0), store_config=StoreConfig(str(tmp_path)))
+        bot.outbox = Outbox(route_limits={route: (sys.maxsize, 1) for route in ROUTE_LIMITS}, batch_delay=0)
+        guild = FakeGuild()
+        white, black = guild.add_member(FakeMember("white")), guild.add_member(FakeMember("black"))
+        channel = await guild.create_text_channel("game")
+        bot.games.add(channel.id, Game(white, black, Board(tak_config, 3)))  # type: ignore
+        bot.store.create_game(channel.id, white.id, black.id, 3)
+        board = Board(tak_config, 3)
+        rng = random.Random(1)
+        try:
+            while not board.result:
+                move = rng.choice(board.generate_moves(board.next_player))
+                author = white if board.ply % 2 == 0 else black
+                board.do_move(board.next_player, move)
+                await bot.on_message(FakeMessage(channel, author, f"${move.to_ptn()}"))  # type: ignore
+            assert (await bot.games.get(channel.id)).board.result  # still shown until it is evicted
+        finally:
+            bot.outbox.close()
+            bot.render_pool.shutdown()
+            bot.engine_pool.shutdown()
+            bot.store.shutdown()
+
+    asyncio.run(play())
+    store = GameStore(StoreConfig(str(tmp_path)))
+    assert store.load_all(tak_config) == []
+    store.shutdown()
+
+
+def test_spawned_tasks_are_kept_until_done(caplog, tmp_path):
+    async def run():
+        bot = DiscordTakBot(tak_config, render_config=RenderConfig(cache_bytes=0), store_config=StoreConfig(str(tmp_path)))
+        try:
+            async def fail():
+                raise ValueError("broken")
+            bot.spawn(fail())
+            assert len(bot.tasks) == 1
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            assert not bot.tasks
+        finally:
+            bot.outbox.close()
+            bot.render_pool.shutdown()
+            bot.engine_pool.shutdown()
+            bot.store.shutdown()
+
+    asyncio.run(run())
+    assert "background task failed error=ValueError('broken')" in caplog.text
+
+
+def test_create_keeps_the_command_if_it_fails(tmp_path):
+    async def run():
+        bot = DiscordTakBot(tak_config, render_config=RenderConfig(cache_bytes=0), store_config=StoreConfig(str(tmp_path)))
+        bot.outbox = Outbox(route_limits={route: (sys.maxsize, 1) for route in ROUTE_LIMITS}, batch_delay=0)
+        guild = FakeGuild()
+        white, black = guild.add_member(FakeMember("white")), guild.add_member(FakeMember("black"))
+        lobby = await guild.create_text_channel("lobby")
+        try:
+            failing = FakeMessage(lobby, white, f"$create -s9 -white {black.mention}", [black])
+            await bot.on_message(failing)  # type: ignore
+            created = FakeMessage(lobby, white, f"$create -s3 -white {black.mention}", [black])
+            await bot.on_message(created)  # type: ignore
+            await bot.outbox.drain()
+            return failing, created
+        finally:
+            bot.outbox.close()
+            bot.render_pool.shutdown()
+            bot.engine_pool.shutdown()
+            bot.store.shutdown()
+
+    failing, created = asyncio.run(run())
+    assert not failing.deleted
+    assert created.deleted
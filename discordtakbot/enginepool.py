@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+
+from board import Board
+from board.tps import to_tps
+from engine import (MctsLimits, MctsResult, SearchLimits, SearchResult,
+                    parallel_mcts, search_tps)
+from readconfig import EngineConfig
+
+EngineLimits = Union[SearchLimits, MctsLimits]
+EngineResult = Union[SearchResult, MctsResult]
+
+
+class EnginePool():
+    """
+    Searches the bot's moves in worker processes, so neither the event loop nor other games wait for a search.
+    Positions are sent as TPS, which is much cheaper to pickle than a Board.
+
+    An alpha-beta search runs in one worker. MCTS runs one tree per worker and merges them (root parallelism),
+    so it uses every core within the same time.
+    """
+
+    def __init__(self, config: EngineConfig):
+        self.config = config
+        self.executor = ProcessPoolExecutor(config.workers)
+
+    def get_limits(self, depth: Optional[int] = None, time_ms: Optional[int] = None) -> SearchLimits:
+        """
+          Limits that a player asked for, capped by the config. A search is always limited by max_time_ms.
+        """
+        if depth is not None and depth < 1 or time_ms is not None and time_ms < 1:
+            raise ValueError("`-depth` and `-time` must be positive")
+        if depth is None and time_ms is None:
+            time_ms = self.config.default_time_ms
+        depth = min(depth, self.config.max_depth) if depth is not None else self.config.max_depth
+        time_ms = min(time_ms, self.config.max_time_ms) if time_ms is not None else self.config.max_time_ms
+        return SearchLimits(depth, time_ms)
+
+    def get_mcts_limits(self, playouts: Optional[int] = None, time_ms: Optional[int] = None) -> MctsLimits:
+        if playouts is not None and playouts < 1 or time_ms is not None and time_ms < 1:
+            raise ValueError("`-playouts` and `-time` must be positive")
+        if playouts is None and time_ms is None:
+            time_ms = self.config.default_time_ms
+        playouts = min(playouts, self.config.max_playouts) if playouts is not None else self.config.max_playouts
+        time_ms = min(time_ms, self.config.max_time_ms) if time_ms is not None else self.config.max_time_ms
+        return MctsLimits(playouts, time_ms)
+
+    async def think(self, board: Board, limits: EngineLimits) -> EngineResult:
+        # Encode right away and not in the executor, the board may change in between
+        tps = to_tps(board)
+        loop = asyncio.get_running_loop()
+        if isinstance(limits, SearchLimits):
+            return await loop.run_in_executor(self.executor, search_tps, board.tak_config, tps, limits)
+        # parallel_mcts only submits to the workers and waits for them, a thread of the loop's default executor can do that
+        return await loop.run_in_executor(None, parallel_mcts, self.executor, self.config.workers, board.tak_config, tps, limits)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from board import Board
+from moves import parse_move
+from mytypes import PlayerType
+from readconfig import BoardConfig, EngineConfig, TakConfig
+
+from .enginepool import EnginePool
+
+tak_config = TakConfig({5: BoardConfig(21, 1)})
+
+
+def test_limits_are_capped_by_the_config():
+    pool = EnginePool(EngineConfig(max_depth=4, max_time_ms=2000, default_time_ms=500))
+    try:
+        limits = pool.get_limits()
+        assert (limits.depth, limits.time_ms) == (4, 500)
+        limits = pool.get_limits(depth=9)
+        assert (limits.depth, limits.time_ms) == (4, 2000)
+        limits = pool.get_limits(time_ms=60000)
+        assert (limits.depth, limits.time_ms) == (4, 2000)
+        with pytest.raises(ValueError):
+            pool.get_limits(depth=0)
+        limits = pool.get_mcts_limits(playouts=10**9)
+        assert (limits.playouts, limits.time_ms) == (100000, 2000)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("mcts", [False, True])
+def test_finds_road_in_a_worker_process(mcts: bool):
+    async def think():
+        pool = EnginePool(EngineConfig(workers=2))
+        try:
+            return await pool.think(board, pool.get_mcts_limits(playouts=600) if mcts else pool.get_limits(depth=2))
+        finally:
+            pool.shutdown()
+
+    board = Board(tak_config, 5)
+    for move in ["a5", "a1", "b1", "a2", "c1", "a3", "d1", "a4"]:
+        board.do_move(board.next_player, parse_move(move))
+    result = asyncio.run(think())
+    assert result.move == parse_move("e1")
+    assert board.next_player == PlayerType.WHITE  # searched on a copy
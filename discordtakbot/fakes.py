@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Any, List, Optional
+
+import discord
+
+# Fakes of the discord.py objects the bot uses, to drive it without connecting to Discord. They only have what the bot needs.
+
+ids = itertools.count(1000)
+
+
+class FakePermissions():
+    def __init__(self, administrator: bool = False):
+        self.administrator = administrator
+
+
+class FakeMember(discord.Member):
+    """
+    A discord.Member, so that the bot's isinstance checks accept it, without the state of a connection behind it
+    """
+
+    def __init__(self, name: str, administrator: bool = False):
+        self.fake_id = next(ids)
+        self.fake_name = name
+        self.fake_permissions = FakePermissions(administrator)
+
+    @property
+    def id(self) -> int:  # type: ignore
+        return self.fake_id
+
+    @property
+    def name(self) -> str:  # type: ignore
+        return self.fake_name
+
+    @property
+    def display_name(self) -> str:
+        return self.fake_name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.fake_id}>"
+
+    @property
+    def guild_permissions(self) -> FakePermissions:  # type: ignore
+        return self.fake_permissions
+
+    @property
+    def bot(self) -> bool:  # type: ignore
+        return False
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FakeMember) and other.fake_id == self.fake_id
+
+    def __hash__(self) -> int:
+        return hash(self.fake_id)
+
+    def __str__(self):
+        return self.fake_name
+
+
+class FakeMessage():
+    def __init__(self, channel: FakeTextChannel, author: Any, content: str = "", mentions: Optional[List[FakeMember]] = None, **kwargs):
+        """
+        kwargs: what the bot sent along, like file and embed
+        """
+        self.id = next(ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.mentions = mentions if mentions else []
+        self.kwargs = kwargs
+        self.deleted = False
+
+    async def delete(self):
+        await self.channel.call()
+        self.deleted = True
+        self.channel.deleted.append(self)
+
+
+class FakeTextChannel():
+    def __init__(self, guild: FakeGuild, name: str, latency: float = 0):
+        """
+        latency: seconds every call takes, like a round trip to Discord
+        """
+        self.id = next(ids)
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.latency = latency
+        self.sent: List[FakeMessage] = []
+        self.deleted: List[FakeMessage] = []
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        await self.call()
+        message = FakeMessage(self, self.guild.me, content if content else "", **kwargs)
+        self.sent.append(message)
+        return message
+
+    async def delete_messages(self, messages: List[FakeMessage]):
+        await self.call()
+        for message in messages:
+            message.deleted = True
+            self.deleted.append(message)
+
+
+class FakeGuild():
+    def __init__(self, me: Optional[FakeMember] = None, latency: float = 0):
+        self.id = next(ids)
+        self.me = me if me else FakeMember("TakBot")
+        self.default_role = "@everyone"
+        self.latency = latency
+        self.members = {self.me.id: self.me}
+        self.channels: List[FakeTextChannel] = []
+
+    def add_member(self, member: FakeMember) -> FakeMember:
+        self.members[member.id] = member
+        return member
+
+    def get_member(self, id: int) -> Optional[FakeMember]:
+        return self.members.get(id)
+
+    async def fetch_member(self, id: int) -> FakeMember:
+        return self.members[id]
+
+    async def create_text_channel(self, name: str, overwrites: Any = None) -> FakeTextChannel:
+        channel = FakeTextChannel(self, name, self.latency)
+        await channel.call()
+        self.channels.append(channel)
+        return channel
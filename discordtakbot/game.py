@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import List, Optional, Union
+
+import discord
+
+from board import Board
+from engine import MctsLimits, SearchLimits
+from moves import Move, PtnGame, PtnMove, format_game, parse_move
+from mytypes import GameResult, PlayerType, WinType, get_opponent
+
+
+class Game:
+    __slots__ = ("board", "white", "black", "moves", "engine_limits")
+
+    def __init__(self, white: discord.Member, black: discord.Member, board: Board, moves: Optional[List[str]] = None,
+                 engine_limits: Union[SearchLimits, MctsLimits, None] = None):
+        """
+        moves: the moves that led to the board in PTN
+        engine_limits: how long the bot thinks if it plays in this game, None if two members play
+        """
+        board.discard_history()  # games are only played on, the engine searches its own copies
+        self.board = board
+        self.white = white
+        self.black = black
+        self.moves = moves if moves else []
+        self.engine_limits = engine_limits
+
+    def next_member(self) -> discord.Member:
+        return self.white if self.board.next_player == PlayerType.WHITE else self.black
+
+    def do_move(self, player: PlayerType, move: Move) -> Optional[GameResult]:
+        result = self.board.do_move(player, move)
+        self.moves.append(move.to_ptn())
+        return result
+
+    def next_player_mention(self) -> str:
+        return f"{self.next_member().mention}({self.board.next_player.value})"
+
+    def other_player_mention(self) -> str:
+        other = self.black if self.board.next_player == PlayerType.WHITE else self.white
+        return f"{other.mention}({get_opponent(self.board.next_player).value})"
+
+    def result_message(self, result: GameResult) -> str:
+        flats = ""
+        if result.win_type == WinType.FLAT:
+            counts = self.board.flat_counts
+            flats = f", {counts[PlayerType.WHITE]} to {counts[PlayerType.BLACK]} flats"
+        if result.winner is None:
+            return f"Game over, it's a draw ({result}{flats})"
+        winner = self.white if result.winner == PlayerType.WHITE else self.black
+        return f"Game over, {winner.mention}({result.winner.value}) wins by {result.win_type.name.lower()} ({result}{flats})"
+
+    def status_message(self) -> str:
+        if self.board.result:
+            return self.result_message(self.board.result)
+        return f"{self.next_player_mention()} is next"
+
+    def to_ptn(self) -> str:
+        piece_count = self.board.tak_config.boards[self.board.board_size]
+        tags = {
+            "Site": "Discord",
+            "Player1": self.white.display_name,
+            "Player2": self.black.display_name,
+            "Size": str(self.board.board_size),
+            "Flats": str(piece_count.flats),
+            "Caps": str(piece_count.caps),
+        }
+        result = str(self.board.result) if self.board.result else None
+        if result:
+            tags["Result"] = result
+        return format_game(PtnGame(tags, [PtnMove(parse_move(move)) for move in self.moves], result))
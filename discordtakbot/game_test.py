@@ -0,0 +1,47 @@
+from board import Board
+from moves import parse_move, read_game
+from mytypes import PlayerType
+from readconfig import BoardConfig, TakConfig
+
+from .game import Game
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+})
+
+
+class FakeMember():
+    def __init__(self, name: str):
+        self.display_name = name
+        self.mention = f"@{name}"
+
+
+def test_to_ptn_replays_to_the_same_position():
+    game = Game(FakeMember("alice"), FakeMember("bob"), Board(tak_config, 3))  # type: ignore
+    for move in ["a1", "c3", "a2", "a3", "b2", "b3", "c2"]:
+        game.do_move(game.board.next_player, parse_move(move))
+
+    ptn = read_game(game.to_ptn())
+    assert ptn.tags["Player1"] == "alice" and ptn.tags["Player2"] == "bob"
+    assert ptn.get_size() == 3
+    assert ptn.result == "R-0" and ptn.tags["Result"] == "R-0"
+
+    board = Board(tak_config, 3)
+    for move in ptn.moves:
+        board.do_move(board.next_player, move.move)
+    assert board.hash == game.board.hash
+
+
+def test_to_ptn_of_running_game_has_no_result():
+    game = Game(FakeMember("alice"), FakeMember("bob"), Board(tak_config, 3))  # type: ignore
+    game.do_move(PlayerType.WHITE, parse_move("a1"))
+    ptn = read_game(game.to_ptn())
+    assert ptn.result is None and "Result" not in ptn.tags
+    assert [move.move for move in ptn.moves] == [parse_move("a1")]
+
+
+def test_games_keep_no_undo_history():
+    game = Game(FakeMember("alice"), FakeMember("bob"), Board(tak_config, 3))  # type: ignore
+    for move in ["a1", "c3", "a2"]:
+        game.do_move(game.board.next_player, parse_move(move))
+    assert game.board.history == []
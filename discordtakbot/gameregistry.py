@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, Optional
+
+import discord
+
+from readconfig import StoreConfig, TakConfig
+
+from .game import Game
+from .gamestore import GameStore
+
+
+class EvictedGame():
+    """
+    What stays in memory of an evicted game: its players, so that a reloaded game doesn't need to look them up,
+    and its board size, so that moves can be parsed before it is reloaded
+    """
+
+    def __init__(self, white: discord.Member, black: discord.Member, board_size: int):
+        self.white = white
+        self.black = black
+        self.board_size = board_size
+
+
+class GameRegistry():
+    """
+    The games by channel ID, keeping only recently used games in memory.
+
+    Games are evicted once they were idle for config.evict_idle_after seconds or when more than config.max_resident games are
+    in memory, least recently used first. Every game is in the GameStore already, so evicting it only snapshots its position
+    and drops the board. The next get() of an evicted game reloads it from the snapshot.
+    """
+
+    def __init__(self, store: GameStore, tak_config: TakConfig, config: StoreConfig, clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.tak_config = tak_config
+        self.config = config
+        self.clock = clock
+
+        self.resident: OrderedDict[int, Game] = OrderedDict()  # channel ID -> Game, least recently used first
+        self.last_used: Dict[int, float] = {}
+        self.evicted: Dict[int, EvictedGame] = {}
+        self.loading: Dict[int, asyncio.Future[Game]] = {}  # reloads in progress, so that concurrent messages share them
+
+        self.evictions = 0
+        self.reloads = 0
+        self.reload_seconds = 0.0  # total
+        self.max_reload_seconds = 0.0
+
+    def add(self, channel_id: int, game: Game) -> None:
+        self.evicted.pop(channel_id, None)
+        self.resident[channel_id] = game
+        self._touch(channel_id)
+        self._evict_over_limit()
+
+    async def get(self, channel_id: int) -> Optional[Game]:
+        game = self.resident.get(channel_id)
+        if game:
+            self._touch(channel_id)
+            return game
+        if channel_id not in self.evicted:
+            return None
+
+        loading = self.loading.get(channel_id)
+        if not loading:
+            loading = self.loading[channel_id] = asyncio.ensure_future(self._reload(channel_id))
+        return await asyncio.shield(loading)
+
+    async def _reload(self, channel_id: int) -> Optional[Game]:
+        start = time.perf_counter()
+        try:
+            if channel_id not in self.evicted:
+                return None  # removed before the reload started, its files are gone
+            # The store runs its tasks in order, so a removal from now on deletes the files only after they were read
+            stored = await asyncio.wrap_future(self.store.reload(self.tak_config, channel_id))
+        finally:
+            del self.loading[channel_id]
+        elapsed = time.perf_counter() - start
+        self.reloads += 1
+        self.reload_seconds += elapsed
+        self.max_reload_seconds = max(self.max_reload_seconds, elapsed)
+
+        evicted = self.evicted.pop(channel_id, None)
+        if not evicted:
+            return None  # removed while it was reloading, get() reports it like any channel without a game
+        game = Game(evicted.white, evicted.black, stored.board, stored.moves, stored.engine_limits)
+        self.add(channel_id, game)
+        return game
+
+    def get_board_size(self, channel_id: int) -> Optional[int]:
+        """
+          Returns the board size without reloading an evicted game, None if the channel has no game
+        """
+        game = self.resident.get(channel_id)
+        if game:
+            return game.board.board_size
+        evicted = self.evicted.get(channel_id)
+        return evicted.board_size if evicted else None
+
+    def _touch(self, channel_id: int) -> None:
+        self.resident.move_to_end(channel_id)
+        self.last_used[channel_id] = self.clock()
+
+    def remove(self, channel_id: int) -> None:
+        """
+          Forgets the game and deletes it from the store, e.g. when its channel was deleted
+        """
+        self.resident.pop(channel_id, None)
+        self.last_used.pop(channel_id, None)
+        self.evicted.pop(channel_id, None)
+        self.store.remove_game(channel_id)
+
+    def evict(self, channel_id: int) -> None:
+        """
+          Finished games are forgotten, they were removed from the store when they ended
+        """
+        game = self.resident.pop(channel_id)
+        del self.last_used[channel_id]
+        if game.board.result:
+            return
+        self.store.snapshot(channel_id, game.board)
+        self.evicted[channel_id] = EvictedGame(game.white, game.black, game.board.board_size)
+        self.evictions += 1
+
+    def _evict_over_limit(self) -> None:
+        while len(self.resident) > self.config.max_resident:
+            self.evict(next(iter(self.resident)))
+
+    def evict_idle(self) -> int:
+        """
+          Evicts the games that were idle for too long and returns how many
+        """
+        if not self.config.evict_idle_after:
+            return 0
+        deadline = self.clock() - self.config.evict_idle_after
+        idle = []
+        for channel_id in self.resident:  # least recently used first
+            if self.last_used[channel_id] > deadline:
+                break
+            idle.append(channel_id)
+        for channel_id in idle:
+            self.evict(channel_id)
+        return len(idle)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self.resident or channel_id in self.evicted
+
+    def __len__(self) -> int:
+        return len(self.resident) + len(self.evicted)
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self.resident
+        yield from self.evicted
+
+    def __str__(self):
+        average = self.reload_seconds / self.reloads if self.reloads else 0
+        return f"[GameRegistry Resident={len(self.resident)} Evicted={len(self.evicted)} Evictions={self.evictions} " \
+            f"Reloads={self.reloads} ReloadAvg={average * 1000:.2f}ms ReloadMax={self.max_reload_seconds * 1000:.2f}ms]"
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+
+    from board import Board
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Measures how long reloading evicted games takes")
+    parser.add_argument("--config", default="botsettings.json")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--max-resident", type=int, default=200)
+    parser.add_argument("--moves", type=int, default=80, help="maximum random moves per game")
+    args = parser.parse_args()
+
+    async def measure(directory: str):
+        tak_config = Config.load(args.config).tak
+        config = StoreConfig(directory, max_resident=args.max_resident)
+        store = GameStore(config)
+        registry = GameRegistry(store, tak_config, config)
+        rng = random.Random(0)
+        for channel_id in range(args.games):
+            board = Board(tak_config, rng.choice(list(tak_config.boards.keys())))
+            store.create_game(channel_id, 1, 2, board.board_size)
+            registry.add(channel_id, Game(None, None, board))  # type: ignore
+            for _ in range(rng.randint(0, args.moves)):
+                if board.result:
+                    break
+                move = rng.choice(board.generate_moves(board.next_player))
+                board.do_move(board.next_player, move)
+                store.append_move(channel_id, move, board)
+        print(f"After creating: {registry}")
+        for channel_id in rng.sample(range(args.games), args.games):
+            await registry.get(channel_id)
+        print(f"After using every game once in random order: {registry}")
+        store.shutdown()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(measure(directory))
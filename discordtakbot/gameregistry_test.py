@@ -0,0 +1,177 @@
+import asyncio
+import os
+
+import pytest
+
+from board import Board
+from readconfig import BoardConfig, StoreConfig, TakConfig
+
+from .game import Game
+from .gameregistry import GameRegistry
+from .gamestore import GameStore
+
+tak_config = TakConfig({
+    5: BoardConfig(21, 1),
+})
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_registry(tmp_path, clock=None, **config):
+    store_config = StoreConfig(str(tmp_path), **config)
+    store = GameStore(store_config)
+    return GameRegistry(store, tak_config, store_config, clock if clock else FakeClock())
+
+
+def add_game(registry: GameRegistry, channel_id: int, moves: int = 0) -> Game:
+    game = Game(f"white{channel_id}", f"black{channel_id}", Board(tak_config, 5))  # type: ignore
+    registry.store.create_game(channel_id, channel_id, channel_id, 5)
+    registry.add(channel_id, game)
+    for _ in range(moves):
+        do_move(registry, channel_id, game)
+    return game
+
+
+def do_move(registry: GameRegistry, channel_id: int, game: Game):
+    move = game.board.generate_moves(game.board.next_player)[-1]
+    game.board.do_move(game.board.next_player, move)
+    registry.store.append_move(channel_id, move, game.board)
+
+
+def test_evicts_least_recently_used_over_limit(tmp_path):
+    registry = make_registry(tmp_path, max_resident=2)
+    for channel_id in range(3):
+        add_game(registry, channel_id)
+    asyncio.run(registry.get(0))
+    add_game(registry, 3)
+
+    assert list(registry.resident.keys()) == [0, 3]
+    assert sorted(registry.evicted.keys()) == [1, 2]
+    assert len(registry) == 4
+    registry.store.shutdown()
+
+
+def test_evicts_idle_games(tmp_path):
+    clock = FakeClock()
+    registry = make_registry(tmp_path, clock, evict_idle_after=10)
+    add_game(registry, 1)
+    clock.now = 5
+    add_game(registry, 2)
+    clock.now = 12
+
+    assert registry.evict_idle() == 1
+    assert list(registry.resident.keys()) == [2]
+    assert 1 in registry
+    registry.store.shutdown()
+
+
+def test_reloads_evicted_game(tmp_path):
+    registry = make_registry(tmp_path, snapshot_every=3)
+    game = add_game(registry, 1, moves=7)
+    expected = game.board.copy()
+    registry.evict(1)
+
+    reloaded = asyncio.run(registry.get(1))
+    assert reloaded is not None and reloaded is not game
+    assert (reloaded.white, reloaded.black) == ("white1", "black1")
+    assert reloaded.board.board == expected.board
+    assert reloaded.board.hash == expected.hash
+    assert registry.reloads == 1 and 1 in registry.resident
+    registry.store.shutdown()
+
+
+def test_moves_on_a_held_game_survive_eviction(tmp_path):
+    registry = make_registry(tmp_path)
+    game = add_game(registry, 1, moves=2)
+    registry.evict(1)
+    do_move(registry, 1, game)  # e.g. a message handler that got the game just before it was evicted
+
+    reloaded = asyncio.run(registry.get(1))
+    assert reloaded is not None
+    assert reloaded.board.hash == game.board.hash
+    registry.store.shutdown()
+
+
+def test_concurrent_gets_share_one_reload(tmp_path):
+    registry = make_registry(tmp_path)
+    add_game(registry, 1, moves=2)
+    registry.evict(1)
+
+    async def get_twice():
+        return await asyncio.gather(registry.get(1), registry.get(1))
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    assert registry.reloads == 1
+    registry.store.shutdown()
+
+
+def test_unknown_channel_has_no_game(tmp_path):
+    registry = make_registry(tmp_path)
+    assert asyncio.run(registry.get(1)) is None
+    assert 1 not in registry
+    registry.store.shutdown()
+
+
+def test_invalid_config_fails():
+    with pytest.raises(ValueError):
+        StoreConfig(max_resident=0)
+
+
+def test_knows_board_size_of_evicted_games_without_reloading(tmp_path):
+    registry = make_registry(tmp_path, max_resident=1)
+    add_game(registry, 1)
+    add_game(registry, 2)
+    assert 1 in registry.evicted
+    assert registry.get_board_size(1) == 5
+    assert registry.get_board_size(2) == 5
+    assert registry.get_board_size(3) is None
+    assert registry.reloads == 0
+    registry.store.shutdown()
+
+
+def test_forgets_finished_games_when_evicting(tmp_path):
+    registry = make_registry(tmp_path, max_resident=1)
+    game = add_game(registry, 1)
+    while not game.board.result:
+        do_move(registry, 1, game)
+    add_game(registry, 2)
+    assert 1 not in registry
+    assert asyncio.run(registry.get(1)) is None
+    registry.store.shutdown()
+
+
+def test_remove_forgets_the_game_and_its_files(tmp_path):
+    registry = make_registry(tmp_path, max_resident=1)
+    add_game(registry, 1, moves=2)
+    add_game(registry, 2, moves=2)
+    registry.remove(1)
+    registry.remove(2)
+    assert len(registry) == 0
+    registry.store.shutdown()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("steps", [1, 3])  # removed before and after the reload reached the store
+def test_game_removed_while_reloading_stays_removed(tmp_path, steps: int):
+    registry = make_registry(tmp_path)
+    add_game(registry, 1, moves=2)
+    registry.evict(1)
+
+    async def get_while_removing():
+        loading = asyncio.ensure_future(registry.get(1))
+        for _ in range(steps):
+            await asyncio.sleep(0)
+        registry.remove(1)
+        return await loading
+
+    assert asyncio.run(get_while_removing()) is None
+    assert 1 not in registry
+    assert asyncio.run(registry.get(1)) is None
+    registry.store.shutdown()
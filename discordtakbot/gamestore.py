@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+from board import Board
+from board.tps import from_tps, to_tps
+from engine import MctsLimits, SearchLimits
+from moves import Move, get_move_table
+from readconfig import StoreConfig, TakConfig
+
+logger = logging.getLogger(__name__)
+
+LOG_SUFFIX = ".log"
+SNAPSHOT_SUFFIX = ".snap"
+
+
+def encode_snapshot(board: Board, ply: int) -> Dict[str, Any]:
+    return {"ply": ply, "hash": board.hash, "tps": to_tps(board)}
+
+
+def decode_snapshot(tak_config: TakConfig, snapshot: Dict[str, Any]) -> Board:
+    board = from_tps(tak_config, snapshot["tps"])
+    if board.hash != snapshot["hash"]:
+        raise ValueError(f"Snapshot hash {snapshot['hash']} doesn't match the restored position {board.hash}")
+    return board
+
+
+def encode_engine_limits(limits: Union[SearchLimits, MctsLimits]) -> Dict[str, Any]:
+    if isinstance(limits, MctsLimits):
+        return {"playouts": limits.playouts, "time_ms": limits.time_ms}
+    return {"depth": limits.depth, "time_ms": limits.time_ms}
+
+
+def decode_engine_limits(limits: Dict[str, Any]) -> Union[SearchLimits, MctsLimits]:
+    return MctsLimits(**limits) if "playouts" in limits else SearchLimits(**limits)
+
+
+class StoredGame():
+    def __init__(self, channel_id: int, white_id: int, black_id: int, board: Board, moves: List[str],
+                 engine_limits: Union[SearchLimits, MctsLimits, None] = None):
+        """
+        moves: every move of the game in PTN
+        engine_limits: of the bot if it plays in this game
+        """
+        self.channel_id = channel_id
+        self.white_id = white_id
+        self.black_id = black_id
+        self.board = board
+        self.moves = moves
+        self.engine_limits = engine_limits
+
+
+class GameStore():
+    """
+    Keeps running games on disk so they survive restarts.
+
+    Every game has an append-only log: a JSON header with the board size and players, then one accepted move per line in PTN.
+    Every config.snapshot_every moves the position is also written to a snapshot, so recovery only replays the moves after it.
+
+    Files are written by a single background thread in the order the calls were made, so the event loop never waits for the disk.
+    The position of a snapshot is encoded right away though, the board may change before the thread gets to it.
+    """
+
+    def __init__(self, config: StoreConfig):
+        self.config = config
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="store")
+        self.plies: Dict[int, int] = {}  # channel ID -> moves in the log
+        os.makedirs(config.directory, exist_ok=True)
+
+    def get_path(self, channel_id: int, suffix: str) -> str:
+        return os.path.join(self.config.directory, f"{channel_id}{suffix}")
+
+    def create_game(self, channel_id: int, white_id: int, black_id: int, board_size: int,
+                    engine_limits: Union[SearchLimits, MctsLimits, None] = None) -> Future:
+        self.plies[channel_id] = 0
+        fields: Dict[str, Any] = {"board_size": board_size, "white": white_id, "black": black_id}
+        if engine_limits:
+            fields["engine"] = encode_engine_limits(engine_limits)
+        header = json.dumps(fields)
+        return self._submit(self._write_header, channel_id, header)
+
+    def append_move(self, channel_id: int, move: Move, board: Board) -> Future:
+        """
+          Logs a move that was just applied to board
+        """
+        ply = self.plies[channel_id] = self.plies[channel_id] + 1
+        snapshot = None
+        # Finished games aren't snapshotted, replaying their last move sets the result again
+        if self.config.snapshot_every and ply % self.config.snapshot_every == 0 and not board.result:
+            snapshot = json.dumps(encode_snapshot(board, ply))
+        return self._submit(self._append, channel_id, move.to_ptn(), snapshot)
+
+    def snapshot(self, channel_id: int, board: Board) -> Future:
+        """
+          Snapshots the current position, so that reloading the game doesn't replay any moves
+        """
+        snapshot = None if board.result else json.dumps(encode_snapshot(board, self.plies[channel_id]))
+        return self._submit(self._write_snapshot, channel_id, snapshot)
+
+    def reload(self, tak_config: TakConfig, channel_id: int) -> Future:
+        """
+          Loads a game in the background thread, after everything that was written for it so far
+        """
+        return self._submit(self.load_game, tak_config, channel_id)
+
+    def remove_game(self, channel_id: int) -> Future:
+        """
+          Deletes the game's files once it is over or its channel is gone
+        """
+        self.plies.pop(channel_id, None)
+        return self._submit(self._remove, channel_id)
+
+    def _submit(self, fn, *args) -> Future:
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(GameStore._report_error)
+        return future
+
+    @staticmethod
+    def _report_error(future: Future) -> None:
+        if future.exception():
+            logger.error("game store failed error=%r", future.exception())
+
+    def _write_header(self, channel_id: int, header: str) -> None:
+        self._remove(channel_id)
+        self._write(self.get_path(channel_id, LOG_SUFFIX), "w", header)
+
+    def _append(self, channel_id: int, ptn: str, snapshot: Optional[str]) -> None:
+        self._write(self.get_path(channel_id, LOG_SUFFIX), "a", ptn)
+        self._write_snapshot(channel_id, snapshot)
+
+    def _write_snapshot(self, channel_id: int, snapshot: Optional[str]) -> None:
+        if not snapshot:
+            return
+        # Replace atomically, a crash while writing must not destroy the previous snapshot
+        path = self.get_path(channel_id, SNAPSHOT_SUFFIX)
+        self._write(path + ".tmp", "w", snapshot)
+        os.replace(path + ".tmp", path)
+
+    def _write(self, path: str, mode: str, line: str) -> None:
+        with open(path, mode) as fp:
+            fp.write(line + "\n")
+            if self.config.fsync:
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    def _remove(self, channel_id: int) -> None:
+        for suffix in [LOG_SUFFIX, SNAPSHOT_SUFFIX]:
+            path = self.get_path(channel_id, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load_all(self, tak_config: TakConfig) -> List[StoredGame]:
+        """
+          Restores every running game in the directory. Games that can't be read are reported and skipped,
+          finished games are removed, e.g. when the bot stopped before it removed them. Call this before logging further moves.
+        """
+        games: List[StoredGame] = []
+        for filename in sorted(os.listdir(self.config.directory)):
+            if not filename.endswith(LOG_SUFFIX):
+                continue
+            try:
+                stored = self.load_game(tak_config, int(filename[:-len(LOG_SUFFIX)]))
+            except Exception as ex:
+                logger.warning("failed to restore game file=%r error=%r", filename, ex)
+                continue
+            if stored.board.result:
+                self.remove_game(stored.channel_id)
+                continue
+            games.append(stored)
+        return games
+
+    def load_game(self, tak_config: TakConfig, channel_id: int) -> StoredGame:
+        with open(self.get_path(channel_id, LOG_SUFFIX), "r") as fp:
+            lines = fp.read().split("\n")
+        # Everything is written line by line, a last line without line break was cut off by a crash
+        lines = lines[:-1]
+        if not lines:
+            raise ValueError("Log has no header")
+        header = json.loads(lines[0])
+        moves = lines[1:]
+
+        board = None
+        ply = 0
+        try:
+            with open(self.get_path(channel_id, SNAPSHOT_SUFFIX), "r") as fp:
+                snapshot = json.load(fp)
+            if snapshot["ply"] <= len(moves):
+                board = decode_snapshot(tak_config, snapshot)
+                ply = snapshot["ply"]
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            logger.warning("ignoring snapshot channel=%s error=%r", channel_id, ex)
+        if not board:
+            board = Board(tak_config, header["board_size"])
+
+        move_table = get_move_table(board.board_size)
+        for move in moves[ply:]:
+            board.do_move(board.next_player, move_table.parse(move))
+
+        self.plies[channel_id] = len(moves)
+        engine_limits = decode_engine_limits(header["engine"]) if "engine" in header else None
+        return StoredGame(channel_id, header["white"], header["black"], board, moves, engine_limits)
+
+    def shutdown(self) -> None:
+        """
+          Waits for all pending writes
+        """
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Measures how long recovering stored games takes")
+    parser.add_argument("--config", default="botsettings.json")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--moves", type=int, default=80, help="maximum random moves per game")
+    parser.add_argument("--snapshot-every", type=int, nargs="+", default=[0, 20])
+    args = parser.parse_args()
+
+    tak_config = Config.load(args.config).tak
+    for snapshot_every in args.snapshot_every:
+        with tempfile.TemporaryDirectory() as directory:
+            store = GameStore(StoreConfig(directory, snapshot_every=snapshot_every))
+            rng = random.Random(0)
+            total_moves = 0
+            start = time.perf_counter()
+            for channel_id in range(args.games):
+                board = Board(tak_config, rng.choice(list(tak_config.boards.keys())))
+                store.create_game(channel_id, 1, 2, board.board_size)
+                for _ in range(rng.randint(0, args.moves)):
+                    if board.result:
+                        break
+                    move = rng.choice(board.generate_moves(board.next_player))
+                    board.do_move(board.next_player, move)
+                    store.append_move(channel_id, move, board)
+                    total_moves += 1
+            store.shutdown()
+            written = time.perf_counter() - start
+
+            start = time.perf_counter()
+            games = GameStore(StoreConfig(directory, snapshot_every=snapshot_every)).load_all(tak_config)
+            elapsed = time.perf_counter() - start
+            print(f"snapshot_every={snapshot_every}: played and wrote {total_moves} moves in {written:.2f}s, "
+                  f"recovered {len(games)} games in {elapsed:.2f}s ({len(games) / elapsed:.0f} games/s)")
@@ -0,0 +1,163 @@
+import os
+import random
+
+import pytest
+
+from board import Board
+from engine import MctsLimits, SearchLimits
+from mytypes import PlayerType
+from readconfig import BoardConfig, StoreConfig, TakConfig
+
+from .gamestore import GameStore, decode_snapshot, encode_snapshot
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+})
+
+
+def play_random(store: GameStore, channel_id: int, board_size: int, moves: int, seed: int) -> Board:
+    rng = random.Random(seed)
+    board = Board(tak_config, board_size)
+    store.create_game(channel_id, 100 + channel_id, 200 + channel_id, board_size)
+    for _ in range(moves):
+        if board.result:
+            break
+        move = rng.choice(board.generate_moves(board.next_player))
+        board.do_move(board.next_player, move)
+        store.append_move(channel_id, move, board)
+    return board
+
+
+def assert_same_game(board: Board, restored: Board):
+    assert restored.board == board.board
+    assert restored.hash == board.hash
+    assert str(restored.result) == str(board.result)
+    assert restored.flat_counts == board.flat_counts
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_snapshot_round_trip(seed: int):
+    rng = random.Random(seed)
+    board = Board(tak_config, 5)
+    for _ in range(rng.randint(0, 30)):
+        if board.result:
+            break
+        board.do_move(board.next_player, rng.choice(board.generate_moves(board.next_player)))
+    restored = decode_snapshot(tak_config, encode_snapshot(board, board.ply))
+    assert restored.board == board.board
+    assert restored.hash == board.hash
+    assert restored.roads[PlayerType.WHITE].has_road == board.roads[PlayerType.WHITE].has_road
+
+
+def test_restores_engine_limits(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path)))
+    store.create_game(1, 100, 200, 5, SearchLimits(4, 3000))
+    store.create_game(2, 100, 200, 5)
+    store.create_game(3, 100, 200, 5, MctsLimits(5000, 2000))
+    store.shutdown()
+
+    restored = {game.channel_id: game for game in GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)}
+    limits = restored[1].engine_limits
+    assert limits and (limits.depth, limits.time_ms) == (4, 3000)
+    assert restored[2].engine_limits is None
+    mcts_limits = restored[3].engine_limits
+    assert isinstance(mcts_limits, MctsLimits) and (mcts_limits.playouts, mcts_limits.time_ms) == (5000, 2000)
+
+
+@pytest.mark.parametrize("snapshot_every", [0, 1, 7])
+def test_restores_games(tmp_path, snapshot_every: int):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=snapshot_every))
+    boards = {channel_id: play_random(store, channel_id, [3, 5][channel_id % 2], 40, channel_id) for channel_id in range(6)}
+    store.shutdown()
+
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=snapshot_every))
+    for channel_id, board in boards.items():
+        game = store.load_game(tak_config, channel_id)
+        assert (game.white_id, game.black_id) == (100 + channel_id, 200 + channel_id)
+        assert_same_game(board, game.board)
+
+    # Finished games are only removed once the bot sees their end, but they are never resumed
+    restored = store.load_all(tak_config)
+    assert sorted(game.channel_id for game in restored) == sorted(channel_id for channel_id, board in boards.items() if not board.result)
+    assert any(board.result for board in boards.values())
+    for game in restored:
+        assert_same_game(boards[game.channel_id], game.board)
+    store.shutdown()
+
+
+def test_continues_logging_after_restore(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=3))
+    board = play_random(store, 1, 5, 5, 0)
+    store.shutdown()
+
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=3))
+    restored = store.load_all(tak_config)[0].board
+    for _ in range(4):
+        move = restored.generate_moves(restored.next_player)[0]
+        restored.do_move(restored.next_player, move)
+        board.do_move(board.next_player, move)
+        store.append_move(1, move, restored)
+    store.shutdown()
+
+    assert_same_game(board, GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)[0].board)
+
+
+def test_ignores_cut_off_last_line(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=0))
+    board = play_random(store, 1, 5, 6, 0)
+    store.shutdown()
+    with open(tmp_path / "1.log", "a") as fp:
+        fp.write("3a1>1")  # crashed while writing
+
+    assert_same_game(board, GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)[0].board)
+
+
+def test_falls_back_to_replay_for_broken_snapshot(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=2))
+    board = play_random(store, 1, 5, 6, 0)
+    store.shutdown()
+    with open(tmp_path / "1.snap", "w") as fp:
+        fp.write("{broken")
+
+    assert_same_game(board, GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)[0].board)
+
+
+def test_skips_unreadable_games(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path)))
+    play_random(store, 1, 5, 6, 0)
+    store.shutdown()
+    with open(tmp_path / "2.log", "w") as fp:
+        fp.write("not a header\n")
+
+    assert [game.channel_id for game in GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)] == [1]
+
+
+def test_remove_game(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=1))
+    play_random(store, 1, 5, 6, 0)
+    store.remove_game(1)
+    store.shutdown()
+    assert os.listdir(tmp_path) == []
+
+
+def test_load_all_removes_finished_games(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path)))
+    board = play_random(store, 1, 3, 100, 0)
+    assert board.result
+    store.shutdown()
+
+    store = GameStore(StoreConfig(str(tmp_path)))
+    assert store.load_all(tak_config) == []
+    store.shutdown()
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshot_is_taken_when_the_move_is_logged(tmp_path):
+    store = GameStore(StoreConfig(str(tmp_path), snapshot_every=1))
+    board = play_random(store, 1, 5, 2, 0)
+    expected = board.copy()
+    board.do_move(board.next_player, board.generate_moves(board.next_player)[0])  # not logged, must not end up in the snapshot
+    store.shutdown()
+
+    assert_same_game(expected, GameStore(StoreConfig(str(tmp_path))).load_all(tak_config)[0].board)
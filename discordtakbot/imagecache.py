@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class ImageCache():
+    """
+    LRU cache of encoded images, keyed by what they show (e.g. a position hash plus render settings)
+    and bounded by the total size of the cached images.
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes < 0:
+            raise ValueError(f"Image cache size must not be negative but was {max_bytes}")
+        self.max_bytes = max_bytes
+        self.images: OrderedDict[Hashable, bytes] = OrderedDict()
+        self.size = 0  # bytes of all cached images
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        image = self.images.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.images.move_to_end(key)
+        return image
+
+    def put(self, key: Hashable, image: bytes) -> None:
+        if len(image) > self.max_bytes:
+            return
+        previous = self.images.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.images[key] = image
+        self.size += len(image)
+        while self.size > self.max_bytes:
+            _, evicted = self.images.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.images)
+
+    def __str__(self):
+        return f"[ImageCache Images={len(self.images)} Bytes={self.size}/{self.max_bytes} Hits={self.hits} Misses={self.misses} Evictions={self.evictions}]"
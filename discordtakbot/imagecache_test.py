@@ -0,0 +1,44 @@
+import pytest
+
+from .imagecache import ImageCache
+
+
+def test_miss_then_hit():
+    cache = ImageCache(100)
+    assert cache.get("a") is None
+    cache.put("a", b"12345")
+    assert cache.get("a") == b"12345"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_negative_size_fails():
+    with pytest.raises(ValueError):
+        ImageCache(-1)
+
+
+def test_evicts_least_recently_used_when_over_size():
+    cache = ImageCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.size == 8
+    assert cache.evictions == 1
+
+
+def test_replacing_an_image_updates_the_size():
+    cache = ImageCache(10)
+    cache.put("a", b"1234")
+    cache.put("a", b"12")
+    assert cache.size == 2
+    assert len(cache) == 1
+
+
+def test_images_larger_than_the_cache_are_not_cached():
+    cache = ImageCache(3)
+    cache.put("a", b"1234")
+    assert cache.get("a") is None
+    assert cache.size == 0
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from 0.1ms to a minute. Everything slower lands in the +Inf bucket.
+BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "takbot"
+
+
+class Histogram():
+    """
+    Counts observations in fixed buckets, so observing is a binary search and quantiles are estimates within a bucket
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+          Interpolates linearly within the bucket of the q-th observation, the +Inf bucket reports the maximum
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.max
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = min(self.buckets[index], self.max)
+                return lower + (upper - lower) * max(rank - seen, 0) / count
+            seen += count
+        return self.max
+
+
+class Metrics():
+    """
+    Latency histograms per stage of handling a message (e.g. parse, do_move, draw, encode, discord_send) and counters of events
+    like moves and of errors by type. Everything is in memory, to_prometheus() exports it in Prometheus' text format.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stages: Dict[str, Histogram] = {}
+        self.events: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}  # exception type -> count
+        self.gauges: Dict[str, float] = {}  # set by whoever knows the current value, e.g. resident games
+        self.started = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.stages.get(stage)
+        if not histogram:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """
+          Observes how long the block took, also if it raised
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(stage, self.clock() - start)
+
+    def count(self, event: str, amount: int = 1) -> None:
+        self.events[event] = self.events.get(event, 0) + amount
+
+    def count_error(self, error: BaseException) -> None:
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def format_table(self) -> str:
+        """
+          Stages with their quantiles in milliseconds, then counters, for $stats
+        """
+        lines = [f"{'stage':<16} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for stage, histogram in sorted(self.stages.items()):
+            quantiles = " ".join(f"{histogram.quantile(q) * 1000:>8.2f}" for q in QUANTILES)
+            lines.append(f"{stage:<16} {histogram.count:>7} {quantiles} {histogram.max * 1000:>8.2f}")
+        counters = [f"{name}={value}" for name, value in sorted(self.events.items())]
+        counters += [f"{name}={value:g}" for name, value in sorted(self.gauges.items())]
+        counters += [f"error.{name}={value}" for name, value in sorted(self.errors.items())]
+        lines.append("")
+        lines.append(" ".join(counters) if counters else "no events yet")
+        lines.append(f"uptime={time.time() - self.started:.0f}s")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = [
+            f"# HELP {PREFIX}_stage_seconds Time spent in each stage of handling messages",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + [float("inf")], histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += [f"# HELP {PREFIX}_events_total Games, moves and commands handled", f"# TYPE {PREFIX}_events_total counter"]
+        lines += [f'{PREFIX}_events_total{{event="{name}"}} {value}' for name, value in sorted(self.events.items())]
+        lines += [f"# HELP {PREFIX}_errors_total Errors by exception type", f"# TYPE {PREFIX}_errors_total counter"]
+        lines += [f'{PREFIX}_errors_total{{type="{name}"}} {value}' for name, value in sorted(self.errors.items())]
+        for name, value in sorted(self.gauges.items()):
+            lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, text: Optional[str] = None) -> None:
+        """
+          Replaces the file atomically, so a scraper never reads a half written one
+        """
+        with open(path + ".tmp", "w") as fp:
+            fp.write(text if text is not None else self.to_prometheus())
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from .metrics import Histogram, Metrics
+
+
+def test_quantiles_of_uniform_latencies():
+    histogram = Histogram()
+    rng = random.Random(1)
+    values = [rng.uniform(0, 0.1) for _ in range(10000)]
+    for value in values:
+        histogram.observe(value)
+    values.sort()
+    for q in [0.5, 0.95, 0.99]:
+        exact = values[int(q * len(values)) - 1]
+        # Within the width of the bucket around it
+        assert histogram.quantile(q) == pytest.approx(exact, abs=0.025)
+    assert histogram.count == 10000
+    assert histogram.max == values[-1]
+    assert histogram.sum == pytest.approx(sum(values))
+
+
+def test_quantiles_never_exceed_the_maximum():
+    histogram = Histogram()
+    for _ in range(10):
+        histogram.observe(0.0012)
+    assert histogram.quantile(0.5) <= 0.0012
+    assert histogram.quantile(0.99) == pytest.approx(0.0012, rel=0.01)
+
+
+def test_slow_observations_report_the_maximum():
+    histogram = Histogram(buckets=[0.1, 1])
+    histogram.observe(5)
+    histogram.observe(0.05)
+    assert histogram.counts == [1, 0, 1]
+    assert histogram.quantile(0.99) == 5
+
+
+def test_empty_histogram():
+    assert Histogram().quantile(0.5) == 0
+
+
+def test_times_stages_even_if_they_fail():
+    now = 0.0
+
+    def clock():
+        return now
+
+    metrics = Metrics(clock)
+    with pytest.raises(ValueError):
+        with metrics.time("parse"):
+            now += 0.002
+            raise ValueError()
+    assert metrics.stages["parse"].count == 1
+    assert metrics.stages["parse"].sum == pytest.approx(0.002)
+
+
+def test_counts_events_and_errors():
+    metrics = Metrics()
+    metrics.count("moves")
+    metrics.count("moves", 2)
+    metrics.count_error(ValueError())
+    metrics.count_error(KeyError())
+    metrics.count_error(ValueError())
+    assert metrics.events == {"moves": 3}
+    assert metrics.errors == {"ValueError": 2, "KeyError": 1}
+    table = metrics.format_table()
+    assert "moves=3" in table and "error.ValueError=2" in table
+
+
+def test_prometheus_text_format(tmp_path):
+    metrics = Metrics()
+    metrics.observe("render", 0.003)
+    metrics.observe("render", 0.2)
+    metrics.count("moves")
+    metrics.count_error(ValueError())
+    metrics.set_gauge("games_resident", 4)
+    text = metrics.to_prometheus()
+    assert 'takbot_stage_seconds_bucket{stage="render",le="0.005"} 1' in text
+    assert 'takbot_stage_seconds_bucket{stage="render",le="+Inf"} 2' in text
+    assert 'takbot_stage_seconds_count{stage="render"} 2' in text
+    assert 'takbot_events_total{event="moves"} 1' in text
+    assert 'takbot_errors_total{type="ValueError"} 1' in text
+    assert "takbot_games_resident 4" in text
+
+    path = str(tmp_path / "takbot.prom")
+    metrics.write_prometheus(path)
+    with open(path) as fp:
+        assert fp.read() == text
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
+
+import discord
+
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Calls per seconds of every route and channel. Conservative guesses of Discord's buckets, it reports the real ones only after the fact.
+ROUTE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "send": (5, 5.0),
+    "delete": (5, 1.0),
+    "bulk_delete": (1, 1.0),
+}
+BULK_DELETE_LIMIT = 100  # messages per bulk delete
+
+
+class RouteBucket():
+    """
+    Sliding window of the calls of one route, a call waits until it fits into the limit instead of provoking a 429
+    """
+
+    def __init__(self, limit: int, per: float, clock: Callable[[], float], sleep: Callable[[float], Awaitable[None]]):
+        self.limit = limit
+        self.per = per
+        self.clock = clock
+        self.sleep = sleep
+        self.calls: Deque[float] = deque()  # when the calls of the window started, oldest first
+        self.lock = asyncio.Lock()  # calls of a route start in the order they were made
+
+        self.waited_seconds = 0.0
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            now = self.clock()
+            while self.calls and self.calls[0] <= now - self.per:
+                self.calls.popleft()
+            if len(self.calls) >= self.limit:
+                wait = self.calls[0] + self.per - now
+                self.waited_seconds += wait
+                await self.sleep(wait)
+                self.calls.popleft()
+            self.calls.append(self.clock())
+
+    def is_idle(self, now: float) -> bool:
+        """
+          True if no call is waiting and the window is empty, then a new bucket would behave the same
+        """
+        return not self.lock.locked() and (not self.calls or self.calls[-1] <= now - self.per)
+
+
+class Outbox():
+    """
+    Makes the bot's calls to Discord: sends, deletes and their delays.
+
+    Independent calls run concurrently, up to max_concurrency at once. Calls of the same route (e.g. sends to one channel)
+    start in the order they were made and are paced by ROUTE_LIMITS. Deletions are collected per channel for batch_delay
+    seconds and then removed with a single bulk delete where the channel supports it.
+
+    Only the methods of discord.py's channels and messages are used, so tests can pass fakes of them.
+    """
+
+    def __init__(self, max_concurrency: int = 8, route_limits: Dict[str, Tuple[int, float]] = ROUTE_LIMITS, batch_delay: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], Awaitable[None]] = asyncio.sleep, metrics: Optional[Metrics] = None):
+        self.metrics = metrics if metrics else Metrics()
+        self.route_limits = route_limits
+        self.batch_delay = batch_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.buckets: Dict[Tuple[str, int], RouteBucket] = {}
+        self.deletions: Dict[int, List[Any]] = {}  # channel ID -> messages to delete with the next batch
+        self.tasks: Set[asyncio.Task] = set()  # deletions that are queued or running
+        self.delayed: Set[asyncio.Task] = set()  # deletions waiting for their delay
+
+        self.pending = 0  # calls queued or running
+        self.max_pending = 0
+        self.calls = 0
+        self.call_seconds = 0.0  # total from queueing to the response
+        self.max_call_seconds = 0.0
+        self.errors = 0
+        self.waited_seconds = 0.0  # of the evicted buckets
+
+    async def send(self, channel: discord.abc.Messageable, content: Optional[str] = None, delete_after: Optional[float] = None, **kwargs) -> discord.Message:
+        """
+          Sends a message like channel.send, delete_after deletes it in a batch with other deletions of the channel
+        """
+        message = await self._call("send", channel, lambda: channel.send(content, **kwargs))
+        if delete_after is not None:
+            self.delete(message, delete_after)
+        return message
+
+    def delete(self, message: discord.Message, delay: float = 0) -> None:
+        """
+          Deletes the message without waiting for it, failures are reported and otherwise ignored
+        """
+        if delay:
+            self._spawn(self._delete_later(message, delay), self.delayed)
+        else:
+            self._spawn(self._queue_deletion(message), self.tasks)
+
+    async def _delete_later(self, message: discord.Message, delay: float) -> None:
+        await self.sleep(delay)
+        self.delete(message)
+
+    async def _queue_deletion(self, message: discord.Message) -> None:
+        channel = message.channel
+        batch = self.deletions.get(channel.id)
+        if batch is not None:
+            batch.append(message)
+            return
+        batch = self.deletions[channel.id] = [message]
+        await self.sleep(self.batch_delay)
+        del self.deletions[channel.id]
+
+        for start in range(0, len(batch), BULK_DELETE_LIMIT):
+            chunk = batch[start:start + BULK_DELETE_LIMIT]
+            if len(chunk) > 1 and getattr(channel, "delete_messages", None):
+                try:
+                    await self._call("bulk_delete", channel, lambda chunk=chunk: channel.delete_messages(chunk))
+                    continue
+                except discord.HTTPException:
+                    pass  # e.g. a message is older than 14 days, those can only be deleted one by one
+            await asyncio.gather(*[self._call("delete", channel, message.delete) for message in chunk])
+
+    def _spawn(self, coroutine: Awaitable[None], tasks: Set[asyncio.Task]) -> None:
+        task = asyncio.ensure_future(coroutine)
+        tasks.add(task)
+        task.add_done_callback(lambda task: self._finish_task(task, tasks))
+
+    def _finish_task(self, task: asyncio.Task, tasks: Set[asyncio.Task]) -> None:
+        tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning("outbox failed error=%r", task.exception())
+
+    async def _call(self, route: str, channel: Any, call: Callable[[], Awaitable[T]]) -> T:
+        start = self.clock()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            bucket = self.buckets.get((route, channel.id))
+            if not bucket:
+                limit, per = self.route_limits[route]
+                bucket = self.buckets[(route, channel.id)] = RouteBucket(limit, per, self.clock, self.sleep)
+            await bucket.acquire()
+            async with self.slots:
+                return await call()
+        except Exception as error:
+            self.errors += 1
+            self.metrics.count_error(error)
+            raise
+        finally:
+            self.pending -= 1
+            elapsed = self.clock() - start
+            self.metrics.observe(f"discord_{route}", elapsed)
+            self.calls += 1
+            self.call_seconds += elapsed
+            self.max_call_seconds = max(self.max_call_seconds, elapsed)
+
+    def evict_idle_buckets(self) -> int:
+        """
+          Forgets the buckets of routes that have no calls in their window, e.g. of channels that were deleted. Returns how many.
+        """
+        now = self.clock()
+        idle = [key for key, bucket in self.buckets.items() if bucket.is_idle(now)]
+        for key in idle:
+            self.waited_seconds += self.buckets.pop(key).waited_seconds
+        return len(idle)
+
+    async def drain(self, delayed: bool = False) -> None:
+        """
+          Waits for the queued deletions, delayed=True also for those still waiting for their delay
+        """
+        while self.tasks or (delayed and self.delayed):
+            await asyncio.gather(*self.tasks, *(self.delayed if delayed else []), return_exceptions=True)
+
+    def close(self) -> None:
+        for task in list(self.tasks) + list(self.delayed):
+            task.cancel()
+
+    def __str__(self):
+        average = self.call_seconds / max(self.calls, 1)
+        waited = self.waited_seconds + sum(bucket.waited_seconds for bucket in self.buckets.values())
+        return f"[Outbox Pending={self.pending} MaxPending={self.max_pending} Calls={self.calls} Errors={self.errors} " \
+            f"AverageLatency={average * 1000:.0f}ms MaxLatency={self.max_call_seconds * 1000:.0f}ms RateLimitWaits={waited:.1f}s]"
@@ -0,0 +1,203 @@
+import asyncio
+import time
+from typing import List, Optional
+
+import discord
+import pytest
+
+from .outbox import Outbox, RouteBucket
+
+
+class FakeMessage():
+    def __init__(self, channel, content: Optional[str]):
+        self.channel = channel
+        self.content = content
+
+    async def delete(self):
+        await self.channel.call(("delete", self.content))
+
+
+class FakeChannel():
+    """
+    Stand-in for discord's TextChannel that records its calls and takes latency seconds for each
+    """
+
+    running = 0  # calls of all channels
+    max_running = 0
+
+    def __init__(self, id: int, latency: float = 0.01):
+        self.id = id
+        self.latency = latency
+        self.calls: List[tuple] = []
+
+    async def call(self, call: tuple):
+        FakeChannel.running += 1
+        FakeChannel.max_running = max(FakeChannel.max_running, FakeChannel.running)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            FakeChannel.running -= 1
+        self.calls.append(call)
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        await self.call(("send", content))
+        return FakeMessage(self, content)
+
+    async def delete_messages(self, messages):
+        if len(messages) > 100:
+            raise discord.ClientException("Can only bulk delete messages up to 100 messages")
+        await self.call(("bulk_delete", [message.content for message in messages]))
+
+
+class FakeDMChannel(FakeChannel):
+    """
+    Direct messages can't be bulk deleted
+    """
+    delete_messages = None  # type: ignore
+
+
+def test_sends_of_a_channel_stay_in_order():
+    async def run():
+        outbox = Outbox()
+        await asyncio.gather(*[outbox.send(channel, str(index)) for index in range(5)])
+        return outbox
+
+    channel = FakeChannel(1)
+    outbox = asyncio.run(run())
+    assert channel.calls == [("send", str(index)) for index in range(5)]
+    assert outbox.calls == 5 and outbox.pending == 0
+
+
+def test_channels_are_sent_to_concurrently():
+    async def run():
+        outbox = Outbox()
+        start = time.perf_counter()
+        await asyncio.gather(*[outbox.send(channel, "hi") for channel in channels])
+        return time.perf_counter() - start, outbox
+
+    channels = [FakeChannel(id, latency=0.05) for id in range(8)]
+    elapsed, outbox = asyncio.run(run())
+    assert elapsed < 0.2
+    assert outbox.max_pending == 8
+
+
+def test_limits_concurrency():
+    async def run():
+        outbox = Outbox(max_concurrency=2)
+        await asyncio.gather(*[outbox.send(channel, "hi") for channel in channels])
+
+    channels = [FakeChannel(id) for id in range(6)]
+    FakeChannel.max_running = 0
+    asyncio.run(run())
+    assert FakeChannel.max_running == 2
+
+
+def test_batches_deletions_into_a_bulk_delete():
+    async def run():
+        outbox = Outbox(batch_delay=0.02)
+        for index in range(3):
+            outbox.delete(FakeMessage(channel, str(index)))
+        await outbox.drain()
+
+    channel = FakeChannel(1)
+    asyncio.run(run())
+    assert channel.calls == [("bulk_delete", ["0", "1", "2"])]
+
+
+@pytest.mark.parametrize("count, bulk", [(1, True), (3, False)])
+def test_deletes_single_messages_one_by_one(count: int, bulk: bool):
+    async def run():
+        outbox = Outbox(batch_delay=0.01)
+        for index in range(count):
+            outbox.delete(FakeMessage(channel, str(index)))
+        await outbox.drain()
+
+    channel = FakeChannel(1) if bulk else FakeDMChannel(1)
+    asyncio.run(run())
+    assert sorted(channel.calls) == [("delete", str(index)) for index in range(count)]
+
+
+def test_bulk_deletes_at_most_100_messages():
+    async def run():
+        outbox = Outbox(batch_delay=0.01, route_limits={"bulk_delete": (10, 1.0), "delete": (10, 1.0)})
+        for index in range(150):
+            outbox.delete(FakeMessage(channel, str(index)))
+        await outbox.drain()
+
+    channel = FakeChannel(1, latency=0)
+    asyncio.run(run())
+    assert [len(messages) for _, messages in channel.calls] == [100, 50]
+
+
+def test_deletes_after_a_delay():
+    async def run():
+        outbox = Outbox(batch_delay=0)
+        await outbox.send(channel, "temporary", delete_after=0.02)
+        await outbox.drain()
+        assert channel.calls == [("send", "temporary")]
+        await outbox.drain(delayed=True)
+
+    channel = FakeChannel(1, latency=0)
+    asyncio.run(run())
+    assert channel.calls == [("send", "temporary"), ("delete", "temporary")]
+
+
+def test_waits_for_the_rate_limit_instead_of_exceeding_it():
+    now = 0.0
+    sleeps: List[float] = []
+
+    async def sleep(seconds: float):
+        nonlocal now
+        sleeps.append(seconds)
+        now += seconds
+
+    async def run():
+        bucket = RouteBucket(2, 5.0, lambda: now, sleep)
+        for _ in range(5):
+            await bucket.acquire()
+        return bucket
+
+    bucket = asyncio.run(run())
+    assert sleeps == [5.0, 5.0]
+    assert bucket.waited_seconds == 10.0
+
+
+def test_reports_latency_and_errors():
+    class BrokenChannel(FakeChannel):
+        async def send(self, content: Optional[str] = None, **kwargs):
+            raise discord.ClientException("broken")
+
+    async def run():
+        outbox = Outbox()
+        await outbox.send(FakeChannel(1, latency=0.02), "hi")
+        with pytest.raises(discord.ClientException):
+            await outbox.send(BrokenChannel(2), "hi")
+        return outbox
+
+    outbox = asyncio.run(run())
+    assert outbox.calls == 2 and outbox.errors == 1
+    assert outbox.max_call_seconds >= 0.02
+    assert "Errors=1" in str(outbox)
+
+
+def test_evicts_idle_buckets():
+    now = 0.0
+
+    async def sleep(seconds: float):
+        nonlocal now
+        now += seconds
+
+    async def run():
+        outbox = Outbox(route_limits={"send": (1, 5.0)}, clock=lambda: now, sleep=sleep)
+        await outbox.send(FakeChannel(1, latency=0), "first")
+        await outbox.send(FakeChannel(1, latency=0), "waits")
+        await outbox.send(FakeChannel(2, latency=0), "later")
+        assert outbox.evict_idle_buckets() == 0  # both sent within the window
+        nonlocal now
+        now += 5.0
+        assert outbox.evict_idle_buckets() == 2
+        assert not outbox.buckets
+        return outbox
+
+    outbox = asyncio.run(run())
+    assert "RateLimitWaits=5.0s" in str(outbox)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Awaitable, Hashable, Optional
+
+from board import Board
+from board.render import (RENDER_PROFILES, BoardSnapshot, RenderProfile,
+                          encode_png_timed)
+from mytypes import PlayerType
+from readconfig import RenderConfig
+
+from .imagecache import ImageCache
+from .metrics import Metrics
+
+
+class RenderPool():
+    """
+    Renders and encodes board images in a thread or process pool, so the event loop keeps handling messages.
+
+    At most config.max_pending renders are queued or running at once. Further requests wait for a free slot,
+    so a burst of moves slows down the senders instead of piling up unbounded work.
+
+    Encoded images are cached by the board's stacks hash and the render settings, so showing a position again
+    skips rendering and encoding entirely.
+    """
+
+    def __init__(self, config: RenderConfig, metrics: Optional[Metrics] = None):
+        self.config = config
+        self.metrics = metrics if metrics else Metrics()
+        profile = RENDER_PROFILES.get(config.profile)
+        if not profile:
+            raise ValueError(f"Unknown render profile '{config.profile}', choose from {list(RENDER_PROFILES.keys())}")
+        self.profile = profile
+        self.executor: Executor = ProcessPoolExecutor(config.workers) if config.executor == "process" else ThreadPoolExecutor(config.workers, thread_name_prefix="render")
+        self.slots = asyncio.Semaphore(config.max_pending)
+        self.pending = 0  # renders queued or running
+        self.cache = ImageCache(config.cache_bytes)
+
+    @staticmethod
+    def get_cache_key(board: Board, profile: RenderProfile) -> Hashable:
+        return board.board_size, board.get_stacks_hash(), board.colors[PlayerType.WHITE], board.colors[PlayerType.BLACK], profile.get_key()
+
+    def render_png(self, board: Board, profile: Optional[RenderProfile] = None) -> Awaitable[bytes]:
+        """
+          profile=None uses the configured profile
+        """
+        profile = profile if profile else self.profile
+        key = RenderPool.get_cache_key(board, profile)
+        png = self.cache.get(key)
+        if png is not None:
+            self.metrics.count("render_cache_hits")
+            return self._cached_png(png)
+        self.metrics.count("render_cache_misses")
+        # Snapshot right away and not once the coroutine runs, the board may change in between
+        return self._render_png(key, BoardSnapshot(board), profile)
+
+    async def _cached_png(self, png: bytes) -> bytes:
+        return png
+
+    async def _render_png(self, key: Hashable, snapshot: BoardSnapshot, profile: RenderProfile) -> bytes:
+        start = time.perf_counter()
+        async with self.slots:
+            self.pending += 1
+            self.metrics.observe("render_wait", time.perf_counter() - start)
+            try:
+                # Timed in the worker, so the handover to the executor counts for neither
+                png, draw_seconds, encode_seconds = await asyncio.get_running_loop().run_in_executor(self.executor, encode_png_timed, snapshot, profile)
+            finally:
+                self.pending -= 1
+        self.metrics.observe("draw", draw_seconds)
+        self.metrics.observe("encode", encode_seconds)
+        self.metrics.observe("render", draw_seconds + encode_seconds)
+        evictions = self.cache.evictions
+        self.cache.put(key, png)
+        if self.cache.evictions > evictions:
+            self.metrics.count("render_cache_evictions", self.cache.evictions - evictions)
+        return png
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from board import Board
+from board.render import RENDER_PROFILES, encode_png, encode_png_timed
+from mytypes import PlayerType
+from readconfig import BoardConfig, RenderConfig, TakConfig
+
+from . import renderpool
+from .renderpool import RenderPool
+
+tak_config = TakConfig({5: BoardConfig(21, 1)})
+
+
+def make_board() -> Board:
+    board = Board(tak_config, 5)
+    board.do_move(PlayerType.WHITE, board.generate_moves(PlayerType.WHITE)[3])
+    return board
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_renders_the_same_png(executor: str):
+    async def render():
+        pool = RenderPool(RenderConfig(executor=executor, workers=1))
+        try:
+            return await pool.render_png(board)
+        finally:
+            pool.shutdown()
+
+    board = make_board()
+    assert asyncio.run(render()) == encode_png(board)
+
+
+def test_unknown_profile_fails():
+    with pytest.raises(ValueError):
+        RenderPool(RenderConfig(profile="unknown"))
+
+
+def test_renders_the_position_at_the_time_of_the_request():
+    async def render():
+        pool = RenderPool(RenderConfig(workers=1))
+        try:
+            request = asyncio.ensure_future(pool.render_png(board))
+            board.do_move(PlayerType.BLACK, board.generate_moves(PlayerType.BLACK)[0])
+            return await request
+        finally:
+            pool.shutdown()
+
+    board = make_board()
+    expected = encode_png(board)
+    assert asyncio.run(render()) == expected
+
+
+def test_limits_pending_renders(monkeypatch):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def slow_encode(snapshot, profile):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return b"", 0.0, 0.0
+
+    async def render():
+        pool = RenderPool(RenderConfig(workers=8, max_pending=2))
+        try:
+            await asyncio.gather(*[pool.render_png(board) for _ in range(10)])
+            return pool.pending
+        finally:
+            pool.shutdown()
+
+    monkeypatch.setattr(renderpool, "encode_png_timed", slow_encode)
+    board = make_board()
+    assert asyncio.run(render()) == 0
+    assert max_running == 2
+
+
+def test_draw_and_encode_are_timed_separately(monkeypatch):
+    async def render():
+        pool = RenderPool(RenderConfig(workers=1))
+        try:
+            await pool.render_png(make_board())
+            return pool
+        finally:
+            pool.shutdown()
+
+    monkeypatch.setattr(renderpool, "encode_png_timed", lambda snapshot, profile: (b"", 0.25, 0.5))
+    pool = asyncio.run(render())
+    assert pool.metrics.stages["draw"].sum == 0.25
+    assert pool.metrics.stages["encode"].sum == 0.5
+    assert pool.metrics.stages["render"].sum == 0.75
+
+
+def test_showing_a_position_again_hits_the_cache(monkeypatch):
+    encoded = []
+
+    def counting_encode(snapshot, profile):
+        encoded.append(snapshot)
+        return encode_png_timed(snapshot, profile)
+
+    async def render():
+        pool = RenderPool(RenderConfig(workers=1))
+        try:
+            first = await pool.render_png(board)
+            second = await pool.render_png(board)
+            return pool, first, second
+        finally:
+            pool.shutdown()
+
+    monkeypatch.setattr(renderpool, "encode_png_timed", counting_encode)
+    board = make_board()
+    pool, first, second = asyncio.run(render())
+    assert first == second
+    assert len(encoded) == 1
+    assert (pool.cache.hits, pool.cache.misses) == (1, 1)
+
+
+def test_cache_hits_misses_and_evictions_are_counted():
+    async def render():
+        # Room for a single image, so every new position evicts the previous one
+        pool = RenderPool(RenderConfig(workers=1, cache_bytes=len(encode_png(make_board(), RENDER_PROFILES["default"])) + 100))
+        try:
+            board = make_board()
+            await pool.render_png(board)
+            await pool.render_png(board)
+            board.do_move(PlayerType.BLACK, board.generate_moves(PlayerType.BLACK)[0])
+            await pool.render_png(board)
+            return pool
+        finally:
+            pool.shutdown()
+
+    pool = asyncio.run(render())
+    assert pool.metrics.events["render_cache_hits"] == 1
+    assert pool.metrics.events["render_cache_misses"] == 2
+    assert pool.metrics.events["render_cache_evictions"] == 1
+    assert 'event="render_cache_evictions"} 1' in pool.metrics.to_prometheus()
+
+
+def test_cache_key_depends_on_the_stacks_only():
+    board = make_board()
+    other = make_board()
+    other.player_reserves[PlayerType.WHITE].take(other.generate_moves(PlayerType.BLACK)[0].stoneType)
+    other.hash = other._compute_hash()
+    assert RenderPool.get_cache_key(board, RENDER_PROFILES["default"]) == RenderPool.get_cache_key(other, RENDER_PROFILES["default"])
+    assert RenderPool.get_cache_key(board, RENDER_PROFILES["default"]) != RenderPool.get_cache_key(board, RENDER_PROFILES["fast"])
+
+    board.do_move(PlayerType.BLACK, board.generate_moves(PlayerType.BLACK)[0])
+    assert RenderPool.get_cache_key(board, RENDER_PROFILES["default"]) != RenderPool.get_cache_key(other, RENDER_PROFILES["default"])
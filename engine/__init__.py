@@ -0,0 +1,2 @@
+from .mcts import MctsLimits, MctsResult, mcts, mcts_tps, merge_results, parallel_mcts
+from .search import SearchLimits, SearchResult, search, search_tps
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from board import Board
+from board.tps import from_tps
+from moves import Move, PlaceStone, get_move_table, parse_move
+from mytypes import PlayerType, StoneType, get_opponent
+from readconfig import TakConfig
+
+from .search import evaluate
+
+EXPLORATION = 1.4  # UCT exploration constant, about sqrt(2)
+PLAYOUT_PLIES = 1  # times the number of squares, a playout that doesn't end by then is decided by evaluate()
+FLAT_PLACEMENTS = 0.7  # share of playout moves that place a flat on a random empty square without generating all moves
+WALL_RETRIES = 1  # a random standing stone is drawn again this often, walls rarely help in random play
+
+# Visits and wins of every root move in PTN, what a worker sends back
+RootStats = Dict[str, Tuple[int, float]]
+
+
+class MctsLimits():
+    def __init__(self, playouts: Optional[int] = None, time_ms: Optional[int] = None):
+        """
+        playouts: playouts of all workers together, None for no limit
+        time_ms: wall-clock budget, None for no limit
+        """
+        if playouts is None and time_ms is None:
+            raise ValueError("MCTS needs a playout or a time limit")
+        if (playouts is not None and playouts < 1) or (time_ms is not None and time_ms < 1):
+            raise ValueError(f"MCTS playouts ({playouts}) and time ({time_ms}ms) must be positive")
+        self.playouts = playouts
+        self.time_ms = time_ms
+
+    def split(self, workers: int) -> MctsLimits:
+        """
+          The limits of each of the workers, they share the playouts and all get the full time
+        """
+        playouts = None if self.playouts is None else max(1, -(-self.playouts // workers))
+        return MctsLimits(playouts, self.time_ms)
+
+    def __str__(self):
+        return f"[MctsLimits Playouts={self.playouts} Time={self.time_ms}ms]"
+
+
+class MctsResult():
+    def __init__(self, move: Move, visits: int, wins: float, playouts: int, seconds: float, workers: int):
+        """
+        visits/wins: of the chosen move over all workers
+        playouts: of all workers together
+        """
+        self.move = move
+        self.visits = visits
+        self.wins = wins
+        self.playouts = playouts
+        self.seconds = seconds
+        self.workers = workers
+
+    def get_win_rate(self) -> float:
+        return self.wins / max(self.visits, 1)
+
+    def get_playouts_per_second(self) -> float:
+        return self.playouts / max(self.seconds, 1e-9)
+
+    def get_summary(self) -> str:
+        return f"{self.playouts} playouts on {self.workers} processes, {self.get_playouts_per_second():.0f} playouts/s, {self.get_win_rate():.0%} wins"
+
+    def __str__(self):
+        return f"[MctsResult Move={self.move.to_ptn()} Visits={self.visits} WinRate={self.get_win_rate():.2f} Playouts={self.playouts} " \
+            f"Workers={self.workers} Time={self.seconds * 1000:.0f}ms PlayoutsPerSecond={self.get_playouts_per_second():.0f}]"
+
+
+class MctsNode():
+    def __init__(self, move: Optional[Move], parent: Optional[MctsNode], player: Optional[PlayerType]):
+        """
+        player: who did move, the node's wins count for that player
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children: List[MctsNode] = []
+        self.untried: Optional[List[Move]] = None  # moves without a child yet, None until the node is expanded first
+        self.visits = 0
+        self.wins = 0.0  # draws count half
+
+    def select_child(self) -> MctsNode:
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits))
+
+
+class Mcts():
+    """
+    Monte Carlo tree search with UCT selection. A node with a winning move only gets that child. Playouts mostly place flats on random empty squares, which is cheap and builds roads,
+    otherwise they play a random legal move, drawing standing stones less often.
+    They are cut off after PLAYOUT_PLIES * squares plies, then the side that evaluate() favours wins.
+    The board is changed with do_move/undo_move and is restored afterwards.
+    """
+
+    def __init__(self, board: Board, limits: MctsLimits, seed: Optional[int] = None):
+        self.board = board
+        self.limits = limits
+        self.rng = random.Random(seed)
+        self.root = MctsNode(None, None, None)
+        self.playouts = 0
+        self.playout_plies = PLAYOUT_PLIES * board.board_size * board.board_size
+        self.flat_moves = [placements[StoneType.FLAT] for placements in get_move_table(board.board_size).placements]
+
+    def run(self) -> RootStats:
+        if self.board.result or not self.board.generate_moves(self.board.next_player):
+            raise ValueError("There is no move to search, the game is over")
+        deadline = float("inf") if self.limits.time_ms is None else time.perf_counter() + self.limits.time_ms / 1000
+        while (self.limits.playouts is None or self.playouts < self.limits.playouts) and time.perf_counter() < deadline:
+            self._iterate()
+        return {child.move.to_ptn(): (child.visits, child.wins) for child in self.root.children if child.move}
+
+    def _iterate(self) -> None:
+        board = self.board
+        node = self.root
+        plies = 0
+        try:
+            # Select
+            while node.untried is not None and not node.untried and node.children:
+                node = node.select_child()
+                board.do_move(board.next_player, node.move)  # type: ignore
+                plies += 1
+            # Expand
+            if not board.result:
+                if node.untried is None:
+                    node.untried = self._expand_moves()
+                if node.untried:
+                    move = node.untried.pop()
+                    player = board.next_player
+                    board.do_move(player, move)
+                    plies += 1
+                    child = MctsNode(move, node, player)
+                    node.children.append(child)
+                    node = child
+            # Simulate
+            winner, playout_plies = self._playout()
+            plies += playout_plies
+        finally:
+            for _ in range(plies):
+                board.undo_move()
+        self.playouts += 1
+
+        # Backpropagate
+        while node.parent:
+            node.visits += 1
+            node.wins += 0.5 if winner is None else float(winner == node.player)
+            node = node.parent
+        node.visits += 1
+
+    def _expand_moves(self) -> List[Move]:
+        """
+          The moves of a new node. If one of them wins right away only that one is kept, random playouts would rarely find it.
+        """
+        board = self.board
+        moves = board.generate_moves(board.next_player)
+        player = board.next_player
+        for move in moves:
+            board.do_move(player, move)
+            winner = board.result.winner if board.result else None
+            board.undo_move()
+            if winner == player:
+                return [move]
+        self.rng.shuffle(moves)
+        return moves
+
+    def _playout(self) -> Tuple[Optional[PlayerType], int]:
+        """
+          Returns the winner (None for a draw) and how many plies were played
+        """
+        board = self.board
+        rng = self.rng
+        plies = 0
+        while not board.result and plies < self.playout_plies:
+            # Flats of the opponent are placed in the first turn
+            placing = board.next_player if not board.initial_moves else get_opponent(board.next_player)
+            empty = [index for index, stack in enumerate(board.board) if not stack]
+            if empty and rng.random() < FLAT_PLACEMENTS and board.player_reserves[placing].flats:
+                move: Move = self.flat_moves[rng.choice(empty)]
+            else:
+                moves = board.generate_moves(board.next_player)
+                move = rng.choice(moves)
+                for _ in range(WALL_RETRIES):
+                    if not (isinstance(move, PlaceStone) and move.stoneType == StoneType.STANDING):
+                        break
+                    move = rng.choice(moves)
+            board.do_move(board.next_player, move)
+            plies += 1
+        if board.result:
+            return board.result.winner, plies
+        score = evaluate(board)
+        if score == 0:
+            return None, plies
+        return board.next_player if score > 0 else get_opponent(board.next_player), plies
+
+
+def mcts_tps(tak_config: TakConfig, tps: str, limits: MctsLimits, seed: Optional[int] = None) -> Tuple[RootStats, int]:
+    """
+      Searches the position given as TPS in a worker process, returns the root statistics and the number of playouts
+    """
+    mcts = Mcts(from_tps(tak_config, tps), limits, seed)
+    stats = mcts.run()
+    return stats, mcts.playouts
+
+
+def merge_results(results: List[Tuple[RootStats, int]], seconds: float) -> MctsResult:
+    """
+      Root parallelism: every worker grew its own tree, the move visited most often over all trees is played
+    """
+    merged: Dict[str, List[float]] = {}
+    for stats, _ in results:
+        for move, (visits, wins) in stats.items():
+            total = merged.setdefault(move, [0, 0.0])
+            total[0] += visits
+            total[1] += wins
+    if not merged:
+        raise ValueError("MCTS didn't do a single playout, increase its limits")
+    # Ties are broken by the PTN so that the result doesn't depend on the order the workers finished
+    move, (visits, wins) = max(merged.items(), key=lambda item: (item[1][0], item[1][1], item[0]))
+    return MctsResult(parse_move(move), int(visits), wins, sum(playouts for _, playouts in results), seconds, len(results))
+
+
+def mcts(board: Board, limits: MctsLimits, seed: Optional[int] = None) -> MctsResult:
+    start = time.perf_counter()
+    mcts = Mcts(board, limits, seed)
+    stats = mcts.run()
+    return merge_results([(stats, mcts.playouts)], time.perf_counter() - start)
+
+
+def parallel_mcts(executor: Executor, workers: int, tak_config: TakConfig, tps: str, limits: MctsLimits, seed: Optional[int] = None) -> MctsResult:
+    """
+      Runs one independent search per worker of the executor and merges them
+    """
+    start = time.perf_counter()
+    worker_limits = limits.split(workers)
+    seeds = [None if seed is None else seed + worker for worker in range(workers)]
+    futures = [executor.submit(mcts_tps, tak_config, tps, worker_limits, worker_seed) for worker_seed in seeds]
+    return merge_results([future.result() for future in futures], time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Searches a position with MCTS in a process pool and reports playouts/second per number of workers")
+    parser.add_argument("tps", help='e.g. "x6/x6/x6/x6/x6/x6 1 1"')
+    parser.add_argument("--playouts", type=int)
+    parser.add_argument("--time", type=int, default=None, help="milliseconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--config", default="botsettings.json")
+    args = parser.parse_args()
+
+    tak_config = Config.load(args.config).tak
+    for workers in sorted(set(args.workers)):
+        with ProcessPoolExecutor(workers) as executor:
+            print(parallel_mcts(executor, workers, tak_config, args.tps, MctsLimits(args.playouts, args.time)))
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from board import Board
+from board.tps import from_tps, to_tps
+from moves import parse_move
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from .mcts import Mcts, MctsLimits, mcts, merge_results, parallel_mcts
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    5: BoardConfig(21, 1),
+})
+
+ROAD_IN_ONE = "x5/x5/2,2,x,2,x/x5/1,1,1,1,x 1 5"
+
+
+def test_finds_road_in_one():
+    result = mcts(from_tps(tak_config, ROAD_IN_ONE), MctsLimits(playouts=400), seed=1)
+    assert result.move == parse_move("e1")
+    assert result.get_win_rate() == 1
+    assert result.playouts == 400
+
+
+def test_board_is_restored():
+    board = from_tps(tak_config, "x3/x,2,x/1,x2 2 2")
+    tps = to_tps(board)
+    Mcts(board, MctsLimits(playouts=200), seed=2).run()
+    assert to_tps(board) == tps
+    assert board.ply == from_tps(tak_config, tps).ply
+    assert not board.history
+
+
+def test_visits_add_up_to_playouts():
+    search = Mcts(Board(tak_config, 3), MctsLimits(playouts=300), seed=3)
+    stats = search.run()
+    assert sum(visits for visits, _ in stats.values()) == 300
+    assert search.root.visits == 300
+
+
+def test_same_seed_same_result():
+    first = mcts(Board(tak_config, 5), MctsLimits(playouts=100), seed=4)
+    second = mcts(Board(tak_config, 5), MctsLimits(playouts=100), seed=4)
+    assert first.move == second.move
+    assert first.visits == second.visits
+
+
+def test_time_limit():
+    result = mcts(Board(tak_config, 5), MctsLimits(time_ms=100), seed=5)
+    assert result.seconds < 1
+    assert result.playouts > 0
+
+
+def test_split_limits():
+    limits = MctsLimits(playouts=10, time_ms=500).split(3)
+    assert (limits.playouts, limits.time_ms) == (4, 500)
+    assert MctsLimits(time_ms=500).split(3).playouts is None
+
+
+@pytest.mark.parametrize("playouts, time_ms", [(None, None), (0, None), (None, 0)])
+def test_invalid_limits(playouts, time_ms):
+    with pytest.raises(ValueError):
+        MctsLimits(playouts, time_ms)
+
+
+def test_merges_visits_of_all_workers():
+    result = merge_results([({"a1": (3, 1.0), "b1": (5, 2.0)}, 8), ({"a1": (6, 4.0), "b1": (1, 0.0)}, 7)], 1.0)
+    assert result.move == parse_move("a1")
+    assert (result.visits, result.wins, result.playouts, result.workers) == (9, 5.0, 15, 2)
+
+
+def test_parallel_workers_find_road_in_one():
+    with ProcessPoolExecutor(2) as executor:
+        result = parallel_mcts(executor, 2, tak_config, ROAD_IN_ONE, MctsLimits(playouts=600), seed=6)
+    assert result.move == parse_move("e1")
+    assert result.workers == 2
+    assert result.playouts == 600
+
+
+def test_finished_game_fails():
+    board = from_tps(tak_config, ROAD_IN_ONE)
+    board.do_move(board.next_player, parse_move("e1"))
+    with pytest.raises(ValueError):
+        mcts(board, MctsLimits(playouts=10))
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from board import Board
+from board.tps import from_tps
+from moves import Move, MoveStack, PlaceStone
+from mytypes import PlayerType, StoneType
+from readconfig import TakConfig
+
+WIN_SCORE = 1_000_000  # minus the plies until the win, so that faster wins score higher
+INFINITY = 2 * WIN_SCORE
+
+# Evaluation in centi-flats
+TOP_VALUES = {StoneType.FLAT: 100, StoneType.STANDING: 50, StoneType.CAPSTONE: 70}
+OWN_CAPTIVE = 15  # own stone below an own top stone, it can be spread later
+ENEMY_CAPTIVE = 5  # opponent stone below an own top stone
+LINE_BONUS = 4  # per squared number of road stones in a row or column
+
+TIME_CHECK_INTERVAL = 1024  # nodes between looks at the clock
+MAX_TT_ENTRIES = 1 << 20
+
+EXACT, LOWER, UPPER = 0, 1, 2  # transposition table bounds
+
+
+class SearchLimits():
+    def __init__(self, depth: Optional[int] = None, time_ms: Optional[int] = None):
+        """
+        depth: maximum depth of the iterative deepening, None for no limit
+        time_ms: wall-clock budget, the deepest completed iteration's move is played once it runs out. None for no limit
+        """
+        if depth is None and time_ms is None:
+            raise ValueError("Search needs a depth or a time limit")
+        if (depth is not None and depth < 1) or (time_ms is not None and time_ms < 1):
+            raise ValueError(f"Search depth ({depth}) and time ({time_ms}ms) must be positive")
+        self.depth = depth
+        self.time_ms = time_ms
+
+    def __str__(self):
+        return f"[SearchLimits Depth={self.depth} Time={self.time_ms}ms]"
+
+
+class SearchResult():
+    def __init__(self, move: Move, score: int, depth: int, nodes: int, seconds: float):
+        """
+        score: in centi-flats from the view of the player to move, beyond WIN_SCORE - 1000 means a forced win
+        depth: of the deepest completed iteration
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def get_nodes_per_second(self) -> float:
+        return self.nodes / max(self.seconds, 1e-9)
+
+    def get_summary(self) -> str:
+        return f"depth {self.depth}, {self.nodes} nodes, {self.get_nodes_per_second():.0f} nodes/s"
+
+    def __str__(self):
+        return f"[SearchResult Move={self.move.to_ptn()} Score={self.score} Depth={self.depth} Nodes={self.nodes} " \
+            f"Time={self.seconds * 1000:.0f}ms NodesPerSecond={self.get_nodes_per_second():.0f}]"
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(board: Board) -> int:
+    """
+      Scores the position from the view of the player to move
+    """
+    score = 0  # positive is good for white
+    size = board.board_size
+    rows = [[0, 0] for _ in range(size)]  # road stones per row, white and black
+    columns = [[0, 0] for _ in range(size)]
+    for index, stack in enumerate(board.board):
+        if not stack:
+            continue
+        top = stack[-1]
+        white = top.player == PlayerType.WHITE
+        value = TOP_VALUES[top.type]
+        for stone in stack[:-1]:
+            value += OWN_CAPTIVE if stone.player == top.player else ENEMY_CAPTIVE
+        score += value if white else -value
+        if top.type != StoneType.STANDING:
+            rows[index // size][0 if white else 1] += 1
+            columns[index % size][0 if white else 1] += 1
+    for white, black in rows + columns:
+        score += LINE_BONUS * (white * white - black * black)
+    return score if board.next_player == PlayerType.WHITE else -score
+
+
+def order_key(move: Move) -> int:
+    """
+      Cheap static move ordering, lower first: flats and capstones, stack moves, then standing stones
+    """
+    if isinstance(move, PlaceStone):
+        return 2 if move.stoneType == StoneType.STANDING else 0
+    if isinstance(move, MoveStack):
+        return 1
+    return 3
+
+
+class Search():
+    """
+    Negamax with alpha-beta pruning, iterative deepening and a transposition table keyed by the board's Zobrist hash.
+    Moves are ordered by the table's best move, then killer moves of the same ply, then order_key.
+    The board is changed with do_move/undo_move while searching and is restored afterwards.
+    """
+
+    def __init__(self, board: Board, limits: SearchLimits):
+        self.board = board
+        self.limits = limits
+        self.table: Dict[int, Tuple[int, int, int, Optional[Move]]] = {}  # hash -> depth, score, bound, best move
+        self.killers: List[List[Move]] = []  # per ply, moves that caused a cutoff in a sibling
+        self.nodes = 0
+        self.deadline = float("inf")
+
+    def run(self) -> SearchResult:
+        start = time.perf_counter()
+        if self.limits.time_ms is not None:
+            self.deadline = start + self.limits.time_ms / 1000
+        moves = self.board.generate_moves(self.board.next_player)
+        if not moves:
+            raise ValueError("There is no move to search, the game is over")
+
+        best = SearchResult(moves[0], 0, 0, 0, 0)
+        depth = 0
+        while self.limits.depth is None or depth < self.limits.depth:
+            depth += 1
+            try:
+                score, move = self._search_root(moves, depth)
+            except SearchTimeout:
+                break
+            best = SearchResult(move, score, depth, self.nodes, time.perf_counter() - start)
+            # Search the best move first in the next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+            if abs(score) >= WIN_SCORE - 1000:
+                break  # forced win or loss, deeper searches won't change it
+        best.nodes = self.nodes
+        best.seconds = time.perf_counter() - start
+        return best
+
+    def _search_root(self, moves: List[Move], depth: int) -> Tuple[int, Move]:
+        alpha = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            self.board.do_move(self.board.next_player, move)
+            try:
+                score = -self._negamax(depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                self.board.undo_move()
+            if score > alpha:
+                alpha, best_move = score, move
+        return alpha, best_move
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        board = self.board
+        if board.result:
+            if board.result.winner is None:
+                return 0
+            return WIN_SCORE - ply if board.result.winner == board.next_player else -(WIN_SCORE - ply)
+        if depth == 0:
+            return evaluate(board)
+
+        original_alpha = alpha
+        entry = self.table.get(board.hash)
+        table_move = None
+        if entry:
+            entry_depth, entry_score, bound, table_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_score
+                if bound == LOWER:
+                    alpha = max(alpha, entry_score)
+                elif bound == UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self._ordered_moves(ply, table_move):
+            board.do_move(board.next_player, move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.undo_move()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._add_killer(ply, move)
+                break
+
+        bound = UPPER if best_score <= original_alpha else (LOWER if best_score >= beta else EXACT)
+        if len(self.table) >= MAX_TT_ENTRIES:
+            self.table.clear()
+        self.table[board.hash] = (depth, best_score, bound, best_move)
+        return best_score
+
+    def _ordered_moves(self, ply: int, table_move: Optional[Move]) -> List[Move]:
+        moves = self.board.generate_moves(self.board.next_player)
+        moves.sort(key=order_key)
+        first = [table_move] if table_move else []
+        if ply < len(self.killers):
+            first += [killer for killer in self.killers[ply] if killer != table_move]
+        if not first:
+            return moves
+        # Killers come from other positions and may be illegal here
+        first = [move for move in first if move in moves]
+        return first + [move for move in moves if move not in first]
+
+    def _add_killer(self, ply: int, move: Move) -> None:
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+
+def search(board: Board, limits: SearchLimits) -> SearchResult:
+    return Search(board, limits).run()
+
+
+def search_tps(tak_config: TakConfig, tps: str, limits: SearchLimits) -> SearchResult:
+    """
+      Searches the position given as TPS, which is cheap to send to another process unlike a Board
+    """
+    return search(from_tps(tak_config, tps), limits)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from readconfig import Config
+
+    parser = argparse.ArgumentParser(description="Searches a position and reports the best move, depth and nodes/second")
+    parser.add_argument("tps", help='e.g. "x5/x5/x5/x5/x5 1 1"')
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--time", type=int, default=None, help="milliseconds")
+    parser.add_argument("--config", default="botsettings.json")
+    args = parser.parse_args()
+
+    print(search_tps(Config.load(args.config).tak, args.tps, SearchLimits(args.depth, args.time)))
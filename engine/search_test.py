@@ -0,0 +1,85 @@
+import pytest
+
+from board import Board
+from board.tps import from_tps, to_tps
+from moves import parse_move
+from readconfig.readconfig import BoardConfig, TakConfig
+
+from .search import (WIN_SCORE, Search, SearchLimits, evaluate, search,
+                     search_tps)
+
+tak_config = TakConfig({
+    3: BoardConfig(10, 0),
+    4: BoardConfig(15, 0),
+    5: BoardConfig(21, 1),
+})
+
+
+def minimax(board: Board, depth: int, ply: int = 0) -> int:
+    if board.result:
+        if board.result.winner is None:
+            return 0
+        return WIN_SCORE - ply if board.result.winner == board.next_player else -(WIN_SCORE - ply)
+    if depth == 0:
+        return evaluate(board)
+    best = -2 * WIN_SCORE
+    for move in board.generate_moves(board.next_player):
+        board.do_move(board.next_player, move)
+        best = max(best, -minimax(board, depth - 1, ply + 1))
+        board.undo_move()
+    return best
+
+
+def test_finds_road_in_one():
+    result = search_tps(tak_config, "x5/x5/2,2,x,2,x/x5/1,1,1,1,x 1 5", SearchLimits(depth=2))
+    assert result.move == parse_move("e1")
+    assert result.score == WIN_SCORE - 1
+    assert result.depth == 1  # a forced win ends the iterative deepening
+
+
+def test_blocks_road_in_one():
+    result = search_tps(tak_config, "x5/x5/2,2,x,1,x/x5/1,1,1,1,x 2 5", SearchLimits(depth=2))
+    assert result.move in [parse_move("e1"), parse_move("Se1"), parse_move("Ce1")]
+
+
+@pytest.mark.parametrize("tps, depth", [
+    ("x3/x3/x3 1 1", 3),
+    ("x3/x,1,x/2,x2 1 2", 3),
+    ("x4/x,2,1,x/x,1,2,x/x4 1 3", 2),
+])
+def test_alpha_beta_and_table_agree_with_minimax(tps: str, depth: int):
+    board = from_tps(tak_config, tps)
+    assert search(board, SearchLimits(depth=depth)).score == minimax(board, depth)
+
+
+def test_restores_the_board():
+    board = from_tps(tak_config, "x4/x,2,1,x/x,1,2,x/x4 1 3")
+    tps, hash = to_tps(board), board.hash
+    search(board, SearchLimits(depth=3))
+    assert to_tps(board) == tps and board.hash == hash and not board.history
+
+
+def test_time_limit_returns_a_legal_move():
+    board = from_tps(tak_config, "x5/x,2,1,x2/x,1,2,x2/x5/x5 1 3")
+    result = search(board, SearchLimits(time_ms=50))
+    assert result.depth >= 1
+    assert result.move in board.generate_moves(board.next_player)
+    assert result.seconds < 1
+    assert result.nodes > 0 and result.get_nodes_per_second() > 0
+
+
+def test_deeper_iterations_search_more_nodes():
+    board = from_tps(tak_config, "x4/x,2,1,x/x,1,2,x/x4 1 3")
+    nodes = [Search(board, SearchLimits(depth=depth)).run().nodes for depth in [1, 2, 3]]
+    assert nodes[0] < nodes[1] < nodes[2]
+
+
+@pytest.mark.parametrize("depth, time_ms", [(None, None), (0, None), (None, 0)])
+def test_invalid_limits_fail(depth, time_ms):
+    with pytest.raises(ValueError):
+        SearchLimits(depth, time_ms)
+
+
+def test_search_of_finished_game_fails():
+    with pytest.raises(ValueError):
+        search_tps(tak_config, "x3/1,1,1/2,2,x 2 3", SearchLimits(depth=1))
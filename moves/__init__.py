@@ -1 +1,4 @@
 from .moves import Move, MoveStack, PlaceStone, parse_move
+from .movetable import MoveTable, get_move_table
+from .ptn import (PtnGame, PtnMove, format_game, read_game, read_games,
+                  split_games)
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import re
-from typing import List, Tuple
+from abc import ABC, abstractmethod
+from typing import Sequence, Tuple
 
 from mytypes import Direction, ParseMoveError, StoneType
 
 
-class Move():
+class Move(ABC):
+    """
+    Immutable, so that one move can be shared, e.g. by the move tables of every game of a board size
+    """
+    __slots__ = ("x", "y")
+
+    x: str
+    y: int
+
     def __init__(self, x: str, y: str):
         if len(x) != 1:
             raise ValueError(f"x must be a single character but was '{x}'")
@@ -17,8 +26,11 @@ class Move():
         if iy not in range(1, 10):
             raise ValueError(f"y must be number in [1, 9] but was '{y}'")
 
-        self.x = x
-        self.y = iy
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "y", iy)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Moves are immutable, cannot set '{name}'")
 
     def get_xy(self) -> Tuple[int, int]:
         """
@@ -26,6 +38,12 @@ class Move():
         """
         return ord(self.x) - ord('a'), self.y - 1
 
+    @abstractmethod
+    def to_ptn(self) -> str:
+        """
+        Returns the move as written in PTN, parse_move reads it back
+        """
+
     def __eq__(self, other) -> bool:
         return isinstance(other, Move)\
             and self.x == other.x\
@@ -36,14 +54,26 @@ class Move():
 
 
 class PlaceStone(Move):
+    __slots__ = ("stoneType",)
+
+    stoneType: StoneType
+
     def __init__(self, x: str, y: str, stoneType: StoneType):
         super().__init__(x, y)
-        self.stoneType = stoneType
+        object.__setattr__(self, "stoneType", stoneType)
+
+    def __reduce__(self):
+        # The default would set the slots with setattr
+        return PlaceStone, (self.x, str(self.y), self.stoneType)
 
     def __str__(self):
         stoneType = "" if self.stoneType == StoneType.FLAT else self.stoneType.value
         return f"PLACE {stoneType}{self.x}{self.y}"
 
+    def to_ptn(self) -> str:
+        stoneType = "" if self.stoneType == StoneType.FLAT else self.stoneType.value
+        return f"{stoneType}{self.x}{self.y}"
+
     def __eq__(self, other) -> bool:
         return isinstance(other, PlaceStone)\
             and super().__eq__(other)\
@@ -51,21 +81,35 @@ class PlaceStone(Move):
 
 
 class MoveStack(Move):
-    def __init__(self, x: str, y: str, direction: Direction, pickup: int | None = None, droppings: List[int] | None = None):
+    __slots__ = ("direction", "pickup", "droppings")
+
+    direction: Direction
+    pickup: int | None
+    droppings: Tuple[int, ...] | None
+
+    def __init__(self, x: str, y: str, direction: Direction, pickup: int | None = None, droppings: Sequence[int] | None = None):
         """
         pickup=None means all/the entire stack
-        droppings=None means all carried
+        droppings=None means all carried, they are stored as tuple
         """
         super().__init__(x, y)
-        self.direction = direction
-        self.pickup = pickup
-        self.droppings = droppings
+        object.__setattr__(self, "direction", direction)
+        object.__setattr__(self, "pickup", pickup)
+        object.__setattr__(self, "droppings", tuple(droppings) if droppings is not None else None)
+
+    def __reduce__(self):
+        return MoveStack, (self.x, str(self.y), self.direction, self.pickup, self.droppings)
 
     def __str__(self):
         pickup = self.pickup if self.pickup else ""
         droppings = "".join(str(drop) for drop in self.droppings) if self.droppings else ""
         return f"MOVE {pickup}{self.x}{self.y}{self.direction.value}{droppings}"
 
+    def to_ptn(self) -> str:
+        pickup = self.pickup if self.pickup else ""
+        droppings = "".join(str(drop) for drop in self.droppings) if self.droppings else ""
+        return f"{pickup}{self.x}{self.y}{self.direction.value}{droppings}"
+
     def __eq__(self, other) -> bool:
         return isinstance(other, MoveStack)\
             and super().__eq__(other)\
@@ -80,9 +124,7 @@ REGEX_PICKUP = "(?P<pickup>[1-9])"  # Number of stones to pick up, never more th
 REGEX_DIRECTION = r"(?P<direction>[\<\>\+\-])"  # Direction of a move
 REGEX_DROPPINGS = "(?P<droppings>[0-9]+)"  # Number of stones dropped per field. Needs checking that 0 fails for accidental mistypes
 
-# TODO add parsing for remarks like ? (questionable move), ! (surprise/good move), ?? ? ?! !? ! !!
-#   ' (tak threat) and * (capstone flattens standing stone)
-#   { this is a comment } (comments in curly braces)
+# Remarks like ?! or ' (tak threat) and {comments} are parsed by moves.ptn for whole games
 REGEX_MOVE_STACK = re.compile(rf"^\s*{REGEX_PICKUP}?{REGEX_POSITION}{REGEX_DIRECTION}{REGEX_DROPPINGS}?")
 REGEX_PLACE_STONE = re.compile(rf"^\s*{REGEX_STONE_TYPE}?{REGEX_POSITION}")
 
@@ -93,7 +135,7 @@ def parse_move(command: str) -> Move:
         groups = match.groupdict()
 
         pickup = int(groups["pickup"]) if groups["pickup"] else None
-        droppings = list(map(lambda char: int(char), groups["droppings"])) if groups["droppings"] else None
+        droppings = tuple(int(char) for char in groups["droppings"]) if groups["droppings"] else None
         direction = Direction(groups["direction"])
 
         if droppings and 0 in droppings:
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from mytypes import Direction, ParseMoveError, StoneType
@@ -57,6 +59,12 @@ class TestParseMove:
         with pytest.raises(ParseMoveError):
             parse_move(f"b3>{droppings}")
 
+    @pytest.mark.parametrize("moveText", ["b3", "Cd4", "Se5", "b3<", "5b3<", "6b3>321", "b3-11"])
+    def test_to_ptn_round_trip(self, moveText: str):
+        move = parse_move(moveText)
+        assert move.to_ptn() == moveText
+        assert parse_move(move.to_ptn()) == move
+
 
 class TestMove:
     @pytest.mark.parametrize("x, y, expected_x, expected_y", [
@@ -68,29 +76,52 @@ class TestMove:
         ("i", "9", 8, 8), # on 9x9
     ])
     def test_get_xy(self, x: str, y: str, expected_x: int, expected_y: int):
-        assert Move(x, y).get_xy() == (expected_x, expected_y)
+        assert PlaceStone(x, y, StoneType.FLAT).get_xy() == (expected_x, expected_y)
 
-    def test_eq(self):
-        assert Move("a", "5") == Move("a", "5")
+    def test_is_abstract(self):
+        with pytest.raises(TypeError):
+            Move("a", "5")  # type: ignore
 
     @pytest.mark.parametrize("x", ["", "aa", "ab", "j", "k", "l", "m", "z", "A", "B", "0", "1", "2"])
     def test_invalid_x(self, x: str):
         with pytest.raises(BaseException):
-            Move(x, "1")
+            PlaceStone(x, "1", StoneType.FLAT)
 
     @pytest.mark.parametrize("y", ["a", "b", "0", "10", "11", ""])
     def test_invalid_y(self, y: str):
         with pytest.raises(BaseException):
-            Move("a", y)
+            PlaceStone("a", y, StoneType.FLAT)
+
+    @pytest.mark.parametrize("move", [PlaceStone("a", "5", StoneType.CAPSTONE), MoveStack("c", "3", Direction.RIGHT, 3, [1, 2])])
+    def test_is_immutable(self, move: Move):
+        with pytest.raises(AttributeError):
+            move.x = "b"
+        with pytest.raises(AttributeError):
+            move.new_attribute = 1  # type: ignore
+
+    @pytest.mark.parametrize("move", [PlaceStone("a", "5", StoneType.CAPSTONE), MoveStack("c", "3", Direction.RIGHT, 3, [1, 2]), MoveStack("c", "3", Direction.UP)])
+    def test_pickles(self, move: Move):
+        assert pickle.loads(pickle.dumps(move)) == move
 
 class TestPlaceStone:
     def test_eq(self):
         assert PlaceStone("a", "5", StoneType.CAPSTONE) == PlaceStone("a", "5", StoneType.CAPSTONE)
-        assert PlaceStone("a", "5", StoneType.CAPSTONE) != Move("a", "5")
+        assert PlaceStone("a", "5", StoneType.CAPSTONE) != MoveStack("a", "5", Direction.UP)
         assert PlaceStone("a", "5", StoneType.CAPSTONE) != MoveStack("a", "5", Direction.RIGHT)
 
 class TestMoveStack:
     def test_eq(self):
         assert MoveStack("a", "5", Direction.RIGHT) == MoveStack("a", "5", Direction.RIGHT)
-        assert MoveStack("a", "5", Direction.RIGHT) != Move("a", "5")
+        assert MoveStack("a", "5", Direction.RIGHT) != MoveStack("a", "5", Direction.LEFT)
         assert MoveStack("a", "5", Direction.RIGHT) != PlaceStone("a", "5", StoneType.CAPSTONE)
+
+    def test_droppings_are_a_tuple(self):
+        move = MoveStack("c", "3", Direction.RIGHT, 3, [1, 2])
+        assert move.droppings == (1, 2)
+        with pytest.raises(AttributeError):
+            move.droppings.append(1)  # type: ignore
+
+
+@pytest.mark.parametrize("move", [PlaceStone("a", "5", StoneType.FLAT), MoveStack("a", "5", Direction.RIGHT, 2, [1, 1])])
+def test_moves_are_slotted(move: Move):
+    assert not hasattr(move, "__dict__")
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from mytypes import Direction, ParseMoveError, StoneType
+
+from .moves import Move, MoveStack, PlaceStone, parse_move
+
+
+@lru_cache(maxsize=None)
+def compositions(total: int, parts: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+      Returns all ways to split total into exactly n=parts positive numbers, order matters.
+    """
+    if parts == 1:
+        return ((total,),) if total > 0 else ()
+    return tuple((first,) + rest for first in range(1, total - parts + 2) for rest in compositions(total - first, parts - 1))
+
+
+@lru_cache(maxsize=None)
+def drop_sequences(total: int, max_reach: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+      Returns all droppings of total stones onto at most n=max_reach consecutive fields
+    """
+    return tuple(droppings for parts in range(1, min(total, max_reach) + 1) for droppings in compositions(total, parts))
+
+
+def get_reach(board_size: int, x: int, y: int, direction: Direction) -> int:
+    """
+      Returns the number of fields between x/y and the edge of the board in direction
+    """
+    if direction == Direction.LEFT:
+        return x
+    if direction == Direction.RIGHT:
+        return board_size - 1 - x
+    if direction == Direction.UP:
+        return board_size - 1 - y
+    return y
+
+
+class MoveTable():
+    """
+    Every move that fits on a board of one size, as shared Move objects, so parsing a typed move is a dictionary lookup
+    and generating moves allocates no Move objects. Moves are immutable, so sharing them is safe.
+
+    A move fits if it starts on the board, picks up at most board_size stones and drops them on fields of the board.
+    Tokens are the moves' PTN as to_ptn writes it, plus the short forms players type: Fa1, a1> (carry as many as allowed
+    onto one field) and 3a1> (3 stones onto one field). A 8x8 table has about 35000 tokens, takes 6.5MB and 0.2s to build,
+    so tables are only built for the sizes that are played.
+    """
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.tokens: Dict[str, Move] = {}
+        self.placements: List[Dict[StoneType, PlaceStone]] = []  # by field index
+        # By field index, direction and droppings, which imply the pickup. The keys are the tuples of drop_sequences, so looking up allocates nothing.
+        self.stack_moves: List[Dict[Direction, Dict[Tuple[int, ...], MoveStack]]] = []
+
+        for index in range(board_size * board_size):
+            x, y = index % board_size, index // board_size
+            column, row = chr(ord('a') + x), str(y + 1)
+
+            placements = {stone_type: PlaceStone(column, row, stone_type) for stone_type in StoneType}
+            self.placements.append(placements)
+            for move in placements.values():
+                self.tokens[move.to_ptn()] = move
+            self.tokens[f"{StoneType.FLAT.value}{column}{row}"] = placements[StoneType.FLAT]
+
+            self.stack_moves.append({})
+            for direction in Direction:
+                spreads = self.stack_moves[index][direction] = {}
+                reach = get_reach(board_size, x, y, direction)
+                if reach == 0:
+                    continue
+                self.tokens[f"{column}{row}{direction.value}"] = MoveStack(column, row, direction)
+                for pickup in range(1, board_size + 1):
+                    self.tokens[f"{pickup}{column}{row}{direction.value}"] = MoveStack(column, row, direction, pickup)
+                    for droppings in drop_sequences(pickup, reach):
+                        move = spreads[droppings] = MoveStack(column, row, direction, pickup, droppings)
+                        self.tokens[move.to_ptn()] = move
+
+    def fits(self, move: Move) -> bool:
+        x, y = move.get_xy()
+        if x >= self.board_size or y >= self.board_size:
+            return False
+        if isinstance(move, MoveStack):
+            if move.pickup and move.pickup > self.board_size:
+                return False
+            drop_fields = len(move.droppings) if move.droppings else 1
+            return drop_fields <= get_reach(self.board_size, x, y, move.direction)
+        return True
+
+    def parse(self, token: str) -> Move:
+        """
+          Returns the shared move of the token. Other tokens, e.g. with whitespace or annotations like a1' are parsed by parse_move.
+          Raises ParseMoveError if the move doesn't fit on the board, before any Board sees it.
+        """
+        move = self.tokens.get(token)
+        if move is not None:
+            return move
+        move = parse_move(token)
+        if not self.fits(move):
+            raise ParseMoveError(f"Move {move.to_ptn()} doesn't fit on a {self.board_size}x{self.board_size} board")
+        return self.tokens.get(move.to_ptn(), move)
+
+
+@lru_cache(maxsize=None)
+def get_move_table(board_size: int) -> MoveTable:
+    return MoveTable(board_size)
@@ -0,0 +1,44 @@
+import pytest
+
+from mytypes import Direction, ParseMoveError, StoneType
+
+from . import MoveStack, PlaceStone, get_move_table, parse_move
+from .movetable import MoveTable
+
+
+@pytest.mark.parametrize("board_size", [3, 5])
+def test_tokens_parse_to_the_same_moves_as_parse_move(board_size: int):
+    for token, move in MoveTable(board_size).tokens.items():
+        assert move == parse_move(token), token
+
+
+def test_moves_are_shared():
+    table = get_move_table(5)
+    assert table.parse("a1") is table.parse("Fa1")
+    assert table.parse("3c3>12") is table.parse("3c3>12")
+    assert get_move_table(5) is table
+
+
+def test_short_forms():
+    table = get_move_table(5)
+    assert table.parse("a1") == PlaceStone("a", "1", StoneType.FLAT)
+    assert table.parse("Sa1") == PlaceStone("a", "1", StoneType.STANDING)
+    assert table.parse("a1>") == MoveStack("a", "1", Direction.RIGHT)
+    assert table.parse("3a1+") == MoveStack("a", "1", Direction.UP, 3)
+
+
+@pytest.mark.parametrize("token", ["a1'", "Ca1!?", " 3c3>12", "c3-*"])
+def test_annotated_tokens_fall_back_to_the_shared_move(token: str):
+    table = get_move_table(5)
+    assert table.parse(token) is table.tokens[parse_move(token).to_ptn()]
+
+
+def test_moves_that_fit_but_are_not_tabled_fall_back_to_parse_move():
+    move = get_move_table(5).parse("a1>12")  # without pickup
+    assert move == MoveStack("a", "1", Direction.RIGHT, None, [1, 2])
+
+
+@pytest.mark.parametrize("token", ["f1", "a6", "a1<", "a1-", "e1>", "3c3>111", "6a1+", "a5+'"])
+def test_rejects_moves_that_dont_fit_on_the_board(token: str):
+    with pytest.raises(ParseMoveError):
+        get_move_table(5).parse(token)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from mytypes import ParseMoveError
+
+from .moves import Move, parse_move
+
+RESULTS = ["R-0", "0-R", "F-0", "0-F", "1-0", "0-1", "1/2-1/2", "0-0"]
+
+REGEX_TAG = re.compile(r'^\s*\[(?P<key>\w+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\]\s*$')
+# Tokens of the move section. A comment may continue on the next lines, then only its start matches.
+REGEX_TOKEN = re.compile(r'\{(?P<comment>[^}]*)\}|\{(?P<open_comment>[^}]*)$|(?P<number>\d+\.)|(?P<word>[^\s{]+)')
+REGEX_ESCAPED = re.compile(r"\\(.)")
+REGEX_ANNOTATED_MOVE = re.compile(r"^(?P<move>[1-9]?[a-z][1-9][<>+-][1-9]*|[CSF]?[a-z][1-9])(?P<annotation>[!?'\"*]*)$")
+
+
+class PtnMove():
+    def __init__(self, move: Move, annotation: str = "", comments: Optional[List[str]] = None):
+        """
+        annotation: remarks like ' (tak threat), * (flattened a standing stone), ? or !!
+        comments: texts of the {comments} after the move
+        """
+        self.move = move
+        self.annotation = annotation
+        self.comments = comments if comments else []
+
+    def to_ptn(self) -> str:
+        return self.move.to_ptn() + self.annotation + "".join(f" {{{comment}}}" for comment in self.comments)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PtnMove)\
+            and self.move == other.move\
+            and self.annotation == other.annotation\
+            and self.comments == other.comments
+
+    def __repr__(self):
+        return self.to_ptn()
+
+
+class PtnGame():
+    def __init__(self, tags: Optional[Dict[str, str]] = None, moves: Optional[List[PtnMove]] = None, result: Optional[str] = None, comments: Optional[List[str]] = None):
+        """
+        tags: tag pairs like Size or Player1 in the order they are written
+        result: like R-0 or 1/2-1/2, None if the game isn't over
+        comments: comments before the first move
+        """
+        self.tags = tags if tags else {}
+        self.moves = moves if moves else []
+        self.comments = comments if comments else []
+        self.result = result
+
+    def get_size(self) -> int:
+        size = self.tags.get("Size")
+        if not size:
+            raise ParseMoveError("Game has no Size tag")
+        return int(size)
+
+
+def parse_annotated_move(token: str) -> PtnMove:
+    match = REGEX_ANNOTATED_MOVE.match(token)
+    if match is None:
+        raise ParseMoveError(f"Unrecognized move '{token}'")
+    return PtnMove(parse_cached_move(match.group("move")), match.group("annotation"))
+
+
+@lru_cache(maxsize=65536)
+def parse_cached_move(token: str) -> Move:
+    """
+      Archives repeat the same few thousand move tokens over and over, so games share their Move objects
+    """
+    return parse_move(token)
+
+
+def split_games(lines: Iterable[str]) -> Iterator[List[str]]:
+    """
+      Splits a stream of PTN lines into the lines of each game without parsing them, so that only one game is kept in memory.
+      A game starts with its tag pairs, so a tag after moves starts the next game.
+    """
+    game: List[str] = []
+    in_moves = False
+    in_comment = False
+    for line in lines:
+        if not in_comment and REGEX_TAG.match(line):
+            if in_moves:
+                yield game
+                game, in_moves = [], False
+        elif line.strip():
+            in_moves = True
+            # Comments can't be nested, the last brace of the line decides whether one is still open
+            in_comment = line.rfind("{") > line.rfind("}") if "{" in line or "}" in line else in_comment
+        game.append(line)
+    if any(line.strip() for line in game):
+        yield game
+
+
+def parse_game(lines: Iterable[str]) -> PtnGame:
+    game = PtnGame()
+    comment: Optional[List[str]] = None  # lines of a comment spanning multiple lines
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if comment is not None:
+            end = line.find("}")
+            if end < 0:
+                comment.append(line)
+                continue
+            comment.append(line[:end])
+            _add_comment(game, "\n".join(comment))
+            comment = None
+            line = line[end + 1:]
+        elif not game.moves and not game.comments and (tag := REGEX_TAG.match(line)):
+            game.tags[tag.group("key")] = REGEX_ESCAPED.sub(r"\1", tag.group("value"))
+            continue
+
+        if "{" not in line:
+            _add_words(game, line.split(), number)  # much faster than the regex and most lines have no comments
+            continue
+        for token in REGEX_TOKEN.finditer(line):
+            if token.group("comment") is not None:
+                _add_comment(game, token.group("comment"))
+            elif token.group("open_comment") is not None:
+                comment = [token.group("open_comment")]
+            elif token.group("word"):
+                _add_words(game, [token.group("word")], number)
+    if comment is not None:
+        raise ParseMoveError("Comment is not closed")
+    return game
+
+
+def _add_words(game: PtnGame, words: List[str], number: int) -> None:
+    """
+      Adds the moves and the result, skipping move numbers
+    """
+    for word in words:
+        if word[-1] == "." and word[:-1].isdigit():
+            continue
+        if game.result:
+            raise ParseMoveError(f"Line {number}: '{word}' after the result {game.result}")
+        if word in RESULTS:
+            game.result = word
+            continue
+        try:
+            game.moves.append(parse_annotated_move(word))
+        except ParseMoveError as error:
+            raise ParseMoveError(f"Line {number}: {error}")
+
+
+def _add_comment(game: PtnGame, comment: str) -> None:
+    if game.moves:
+        game.moves[-1].comments.append(comment)
+    else:
+        game.comments.append(comment)
+
+
+def read_games(lines: Iterable[str]) -> Iterator[PtnGame]:
+    """
+      Lazily parses every game of a PTN file, e.g. read_games(open("games.ptn")) keeps only one game in memory at a time
+    """
+    for game in split_games(lines):
+        yield parse_game(game)
+
+
+def read_game(text: str) -> PtnGame:
+    return parse_game(text.splitlines())
+
+
+def write_game(game: PtnGame) -> Iterator[str]:
+    """
+      Yields the lines of the game in PTN, read_game reads them back
+    """
+    for key, value in game.tags.items():
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        yield f'[{key} "{escaped}"]'
+    yield ""
+    for comment in game.comments:
+        yield f"{{{comment}}}"
+    for index in range(0, len(game.moves), 2):
+        pair = " ".join(move.to_ptn() for move in game.moves[index:index + 2])
+        ending = f" {game.result}" if game.result and index + 2 >= len(game.moves) else ""
+        yield f"{index // 2 + 1}. {pair}{ending}"
+    if game.result and not game.moves:
+        yield game.result
+
+
+def format_game(game: PtnGame) -> str:
+    return "\n".join(write_game(game)) + "\n"
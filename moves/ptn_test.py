@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+from mytypes import Direction, ParseMoveError, StoneType
+
+from . import (MoveStack, PlaceStone, PtnGame, PtnMove, format_game,
+               read_game, read_games, split_games)
+
+GAME = """[Site "PlayTak.com"]
+[Player1 "alice"]
+[Player2 "bob \\"the builder\\""]
+[Size "5"]
+[Result "R-0"]
+
+{opening comment}
+1. a1 e5
+2. Cc3 {center
+spanning lines} Sd4'
+3. 2c3>11* d4<?!
+4. c2 d3'' R-0
+"""
+
+
+def test_reads_tags():
+    game = read_game(GAME)
+    assert game.tags == {"Site": "PlayTak.com", "Player1": "alice", "Player2": 'bob "the builder"', "Size": "5", "Result": "R-0"}
+    assert game.get_size() == 5
+
+
+def test_reads_moves_annotations_and_comments():
+    game = read_game(GAME)
+    assert [move.move for move in game.moves] == [
+        PlaceStone("a", "1", StoneType.FLAT), PlaceStone("e", "5", StoneType.FLAT),
+        PlaceStone("c", "3", StoneType.CAPSTONE), PlaceStone("d", "4", StoneType.STANDING),
+        MoveStack("c", "3", Direction.RIGHT, 2, [1, 1]), MoveStack("d", "4", Direction.LEFT),
+        PlaceStone("c", "2", StoneType.FLAT), PlaceStone("d", "3", StoneType.FLAT),
+    ]
+    assert [move.annotation for move in game.moves] == ["", "", "", "'", "*", "?!", "", "''"]
+    assert game.moves[2].comments == ["center\nspanning lines"]
+    assert game.comments == ["opening comment"]
+    assert game.result == "R-0"
+
+
+def test_write_read_round_trip():
+    game = read_game(GAME)
+    text = format_game(game)
+    again = read_game(text)
+    assert again.tags == game.tags
+    assert again.moves == game.moves
+    assert again.comments == game.comments
+    assert again.result == game.result
+    assert format_game(again) == text
+
+
+def test_writes_move_pairs():
+    game = PtnGame({"Size": "3"}, [PtnMove(PlaceStone("a", "1", StoneType.FLAT)), PtnMove(PlaceStone("c", "3", StoneType.FLAT)),
+                                   PtnMove(MoveStack("a", "1", Direction.UP), "'")], "1/2-1/2")
+    assert format_game(game) == '[Size "3"]\n\n1. a1 c3\n2. a1+\' 1/2-1/2\n'
+
+
+def test_reads_games_lazily():
+    def lines():
+        for index in range(1000):
+            yield f'[Size "{3 + index % 6}"]\n'
+            yield "\n"
+            yield "1. a1 b1\n"
+        raise AssertionError("read past the games that were asked for")
+
+    games = read_games(lines())
+    assert [next(games).get_size() for _ in range(3)] == [3, 4, 5]
+
+
+def test_splits_games_at_tags_after_moves():
+    text = GAME + "\n" + GAME.replace("{center\n", "{center\n[Size \"6\"]\n")  # a tag within a comment doesn't start a game
+    games = list(split_games(io.StringIO(text)))
+    assert len(games) == 2
+    assert [len(read_game("".join(game)).moves) for game in games] == [8, 8]
+
+
+def test_game_without_result():
+    game = read_game('[Size "4"]\n\n1. a1 d4\n2. b1')
+    assert game.result is None
+    assert len(game.moves) == 3
+
+
+@pytest.mark.parametrize("text", [
+    '[Size "5"]\n\n1. a1 zz',
+    '[Size "5"]\n\n1. a1 b1x',
+    '[Size "5"]\n\n1. a1 {open',
+    '[Size "5"]\n\n1. a1 R-0 b1',
+])
+def test_invalid_games_fail(text: str):
+    with pytest.raises(ParseMoveError):
+        read_game(text)
@@ -1,4 +1,7 @@
+from __future__ import annotations
+
 from enum import Enum
+from typing import Optional
 
 
 class InvalidMoveError(BaseException):
@@ -31,3 +34,35 @@ class Direction(Enum):
     RIGHT = ">"
     UP = "+"
     DOWN = "-"
+
+
+class WinType(Enum):
+    ROAD = "R"
+    FLAT = "F"
+
+
+class GameResult():
+    def __init__(self, winner: Optional[PlayerType], win_type: WinType):
+        """
+        winner=None means a draw
+        """
+        self.winner = winner
+        self.win_type = win_type
+
+    def __str__(self):
+        """
+        Returns the result as used in PTN, e.g. R-0 for a road win by white or 1/2-1/2 for a draw
+        """
+        if self.winner is None:
+            return "1/2-1/2"
+        if self.winner == PlayerType.WHITE:
+            return f"{self.win_type.value}-0"
+        return f"0-{self.win_type.value}"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, GameResult)\
+            and self.winner == other.winner\
+            and self.win_type == other.win_type
+
+    def __repr__(self):
+        return self.__str__()
@@ -1 +1 @@
-from .readconfig import BoardConfig, Config, TakConfig
+from .readconfig import BoardConfig, Config, EngineConfig, MetricsConfig, RenderConfig, StoreConfig, TakConfig
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, TypeVar
+from typing import Any, Dict, List, Optional, TypeVar
 
 T = TypeVar("T")
 
@@ -27,21 +27,111 @@ class TakConfig():
         return f"[Tak Boards={self.boards}"
 
 
+class RenderConfig():
+    def __init__(self, executor: str = "thread", workers: int = 2, max_pending: int = 16, cache_bytes: int = 32 * 1024 * 1024, profile: str = "default"):
+        """
+        executor: "thread" or "process" pool that renders and encodes board images
+        max_pending: renders that may be queued or running at once before further requests wait
+        cache_bytes: total size of encoded images that are kept for positions that are shown again, 0 disables the cache
+        profile: name of the render profile in board.render.RENDER_PROFILES
+        """
+        if executor not in ["thread", "process"]:
+            raise ValueError(f"Render executor must be 'thread' or 'process' but was '{executor}'")
+        if workers < 1 or max_pending < 1:
+            raise ValueError(f"Render workers ({workers}) and max_pending ({max_pending}) must be positive")
+        self.executor = executor
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_bytes = cache_bytes
+        self.profile = profile
+
+    def __str__(self):
+        return f"[Render Executor={self.executor} Workers={self.workers} MaxPending={self.max_pending} CacheBytes={self.cache_bytes} Profile={self.profile}]"
+
+
+class StoreConfig():
+    def __init__(self, directory: str = "games", snapshot_every: int = 20, fsync: bool = False, max_resident: int = 1000, evict_idle_after: float = 3600):
+        """
+        directory: where the move logs and snapshots of running games are kept
+        snapshot_every: moves between snapshots of a game's position, 0 disables snapshots
+        fsync: force every write to disk, survives power loss but is slower
+        max_resident: games kept in memory, the least recently used game is evicted to disk beyond that
+        evict_idle_after: seconds after which a game without messages is evicted to disk, 0 disables it
+        """
+        if snapshot_every < 0 or evict_idle_after < 0:
+            raise ValueError(f"Store snapshot_every ({snapshot_every}) and evict_idle_after ({evict_idle_after}) must not be negative")
+        if max_resident < 1:
+            raise ValueError(f"Store max_resident must be positive but was {max_resident}")
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.max_resident = max_resident
+        self.evict_idle_after = evict_idle_after
+
+    def __str__(self):
+        return f"[Store Directory={self.directory} SnapshotEvery={self.snapshot_every} Fsync={self.fsync} MaxResident={self.max_resident} EvictIdleAfter={self.evict_idle_after}]"
+
+
+class EngineConfig():
+    def __init__(self, workers: int = 1, max_depth: int = 6, max_time_ms: int = 10000, default_time_ms: int = 3000, max_playouts: int = 100000):
+        """
+        workers: processes that search bot moves. An alpha-beta search uses one of them, MCTS all of them
+        max_depth/max_playouts/max_time_ms: upper bounds for what players may ask for with -depth, -playouts and -time
+        default_time_ms: thinking time if a game specifies neither
+        """
+        if workers < 1 or max_depth < 1 or max_time_ms < 1 or default_time_ms < 1 or max_playouts < 1:
+            raise ValueError(f"Engine workers ({workers}), max_depth ({max_depth}), max_time_ms ({max_time_ms}), default_time_ms ({default_time_ms}) "
+                             f"and max_playouts ({max_playouts}) must be positive")
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_playouts = max_playouts
+        self.max_time_ms = max_time_ms
+        self.default_time_ms = min(default_time_ms, max_time_ms)
+
+    def __str__(self):
+        return f"[Engine Workers={self.workers} MaxDepth={self.max_depth} MaxPlayouts={self.max_playouts} MaxTime={self.max_time_ms}ms DefaultTime={self.default_time_ms}ms]"
+
+
+class MetricsConfig():
+    def __init__(self, write_every: int = 60, prometheus_file: Optional[str] = None, admins: Optional[List[int]] = None):
+        """
+        prometheus_file: rewritten every write_every seconds in Prometheus' text format, e.g. for node-exporter's textfile collector. None disables it
+        admins: IDs of the users that may use $stats besides the server's administrators
+        """
+        if write_every < 1:
+            raise ValueError(f"Metrics write_every must be positive but was {write_every}")
+        self.write_every = write_every
+        self.prometheus_file = prometheus_file
+        self.admins = admins if admins else []
+
+    def __str__(self):
+        return f"[Metrics WriteEvery={self.write_every}s PrometheusFile={self.prometheus_file} Admins={len(self.admins)}]"
+
+
 class DiscordConfig():
-    def __init__(self, token: str):
+    def __init__(self, token: str, log_level: str = "INFO"):
+        """
+        log_level: DEBUG logs every command, INFO what the bot does, WARNING only problems
+        """
         self.token = token
+        self.log_level = log_level
 
     def __str__(self):
-        return f"[Discord Token={'*' * len(self.token)}]"
+        return f"[Discord Token={'*' * len(self.token)} LogLevel={self.log_level}]"
 
 
 class Config():
-    def __init__(self, discord: DiscordConfig, tak: TakConfig):
+    def __init__(self, discord: DiscordConfig, tak: TakConfig, render: RenderConfig | None = None, store: StoreConfig | None = None,
+                 engine: EngineConfig | None = None, metrics: MetricsConfig | None = None):
         self.discord = discord
         self.tak = tak
+        self.render = render if render else RenderConfig()
+        self.store = store if store else StoreConfig()
+        self.engine = engine if engine else EngineConfig()
+        self.metrics = metrics if metrics else MetricsConfig()
 
     def __str__(self):
-        return f"[Config {self.discord} {self.tak}"
+        return f"[Config {self.discord} {self.tak} {self.render} {self.store} {self.engine} {self.metrics}"
 
     @staticmethod
     def load(filename: str) -> Config:
@@ -50,6 +140,14 @@ class Config():
                 return DiscordConfig(**dct)
             if dct.get("flats"):
                 return BoardConfig(**dct)
+            if dct.get("executor"):
+                return RenderConfig(**dct)
+            if dct.get("directory"):
+                return StoreConfig(**dct)
+            if dct.get("max_depth"):
+                return EngineConfig(**dct)
+            if dct.get("write_every"):
+                return MetricsConfig(**dct)
             if dct.get("discord"):
                 return Config(**dct)
             boards = dct.get("boards")